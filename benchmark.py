@@ -0,0 +1,307 @@
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import recipes
+from recipes import RecipeCatalog, ShoppingList
+
+"""
+Benchmarks for the recipe catalog
+
+Generates synthetic catalogs from the real unit vocabulary and times each
+stage (load, lint, select, prepare, pprint, ...) at a range of catalog sizes,
+recording wall time and peak traced memory. Results are written as JSON so
+two runs can be compared.
+
+Run with: python benchmark.py --sizes 1000 10000 --output results.json
+Compare:  python benchmark.py --sizes 1000 10000 --compare results.json
+"""
+
+CATEGORIES = ['american', 'chinese', 'dessert', 'appetizer', 'mexican', 'italian',
+              'side', 'seafood', 'indian', 'english', 'thai', 'korean']
+WORDS = ['beef', 'chicken', 'pork', 'garlic', 'onion', 'tomato', 'cheese', 'rice', 'noodle', 'pepper',
+         'butter', 'milk', 'egg', 'flour', 'sugar', 'honey', 'lime', 'lemon', 'basil', 'ginger',
+         'potato', 'carrot', 'bean', 'corn', 'mushroom', 'spinach', 'salmon', 'shrimp', 'broth', 'sauce',
+         'red', 'green', 'smoked', 'fresh', 'dried', 'ground', 'sweet', 'spicy', 'roasted', 'crispy']
+SPICES = ['salt', 'pepper', 'paprika', 'cumin', 'oregano', 'cinnamon', 'garlic powder', 'onion powder',
+          'cayenne', 'thyme', 'olive oil', 'vegetable oil']
+
+
+def default_unit_mix():
+    # Roughly the mix in recipes.json
+    return {unit: (3 if unit in ShoppingList.get_unit_list(type_='convertable') else 2)
+            for unit in ShoppingList.get_unit_list()}
+
+
+def unit_weight(text):
+    """argparse type for a --unit-mix entry, UNIT=WEIGHT"""
+    unit, sep, weight = text.rpartition('=')
+    if not sep or unit not in ShoppingList.get_unit_list():
+        raise argparse.ArgumentTypeError(f"expected UNIT=WEIGHT with a unit from get_unit_list, got {text!r}")
+    try:
+        weight = float(weight)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{weight!r} is not a number")
+    if weight < 0:
+        raise argparse.ArgumentTypeError(f"{text!r} has a negative weight")
+    return unit, weight
+
+
+def generate_recipes(count, ingredients=(4, 12), unit_mix=None, vocabulary=5000, seed=0):
+    """
+    Yield count linted recipe dicts.
+
+    ingredients is the (min, max) ingredients per recipe, unit_mix a dict of
+    unit to relative weight over the units from get_unit_list, and
+    vocabulary the number of distinct ingredient names. Each ingredient name
+    keeps to one nonconvertable unit or to the convertable units, the same
+    as a real catalog, so any selection aggregates cleanly.
+    """
+    rng = random.Random(seed)
+    unit_mix = unit_mix or default_unit_mix()
+    units = list(unit_mix)
+    weights = [unit_mix[unit] for unit in units]
+    convertable = ShoppingList.get_unit_list(type_='convertable')
+
+    names = []
+    home_units = []
+    seen = set()
+    while len(names) < vocabulary:
+        name = ' '.join(rng.sample(WORDS, rng.choice((1, 2, 2, 3))))
+        if name in seen:
+            name = f"{name} {len(names)}"
+        seen.add(name)
+        names.append(name)
+        home_units.append(rng.choices(units, weights)[0])
+
+    for i in range(count):
+        recipe_ingredients = []
+        for index in rng.sample(range(vocabulary), rng.randint(*ingredients)):
+            unit = home_units[index]
+            if unit in convertable:
+                unit = rng.choice(convertable)
+            recipe_ingredients.append({names[index]: {'amount': round(rng.uniform(0.25, 8), 2), 'unit': unit}})
+
+        yield {'recipe': f"{' '.join(rng.sample(WORDS, 3)).title()} {i}",
+               'ingredients': recipe_ingredients,
+               'spices': rng.sample(SPICES, rng.randint(0, 5)),
+               'url': f"https://example.com/recipes/{i}",
+               'rating': round(rng.uniform(0, 10), 1),
+               'category': rng.choice(CATEGORIES),
+               'servings': rng.randint(1, 10)}
+
+
+def write_recipes(path, recipes_, jsonl=False):
+    """Write recipes to path one at a time, as {"recipes": [...]} or as JSON Lines"""
+    with open(path, 'w') as outfile:
+        if jsonl:
+            for recipe in recipes_:
+                outfile.write(json.dumps(recipe) + '\n')
+            return
+
+        outfile.write('{"recipes": [\n')
+        for i, recipe in enumerate(recipes_):
+            outfile.write((',\n' if i else '') + json.dumps(recipe))
+        outfile.write('\n]}\n')
+
+
+def synthetic_recipes(source='recipes.json', copies=100):
+    # Repeat the real catalog under new names, so the ingredient mix stays realistic
+    with open(source, 'r') as infile:
+        recipes_ = json.load(infile)['recipes']
+
+    for copy in range(copies):
+        for recipe in recipes_:
+            recipe = json.loads(json.dumps(recipe))
+            recipe['recipe'] = f"{recipe['recipe']} #{copy}"
+            yield recipe
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+
+def memory_benchmark(copies):
+    dict_form, dict_bytes = measure(lambda: list(synthetic_recipes(copies=copies)))
+    del dict_form
+    catalog, compact_bytes = measure(lambda: RecipeCatalog(synthetic_recipes(copies=copies)))
+    return {'recipes': len(catalog),
+            'ingredients': len(catalog.amounts),
+            'dict_bytes': dict_bytes,
+            'compact_bytes': compact_bytes,
+            'saving': 1 - compact_bytes / dict_bytes}
+
+
+def run_stage(stage, memory=True):
+    """Time stage() and, with memory=True, run it again under tracemalloc for its peak"""
+    gc.collect()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = stage()
+        seconds = time.perf_counter() - start
+
+        peak = None
+        if memory:
+            gc.collect()
+            tracemalloc.start()
+            stage()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+    return result, seconds, peak
+
+
+def benchmark_size(size, workdir, args):
+    rng = random.Random(args.seed)
+    path = os.path.join(workdir, f"recipes_{size}.json")
+    write_recipes(path, generate_recipes(size, ingredients=tuple(args.ingredients), unit_mix=args.unit_mix,
+                                         vocabulary=args.vocabulary, seed=args.seed))
+    results = []
+
+    def record(stage, func, memory=True):
+        result, seconds, peak = run_stage(func, memory=memory and not args.no_memory)
+        results.append({'size': size, 'stage': stage, 'seconds': seconds, 'peak_bytes': peak})
+        peak_text = '' if peak is None else f"{peak / 2 ** 20:10.1f} MiB"
+        print(f"{size:>9} {stage:<10} {seconds:10.4f} s {peak_text}", flush=True)
+        return result
+
+    shopping = record('load', lambda: ShoppingList(path))
+    record('stream', lambda: ShoppingList(path, stream=True))
+    record('lint', shopping._lint_recipes)
+    cache_path = path + '.cache'
+    record('cache', lambda: ShoppingList(path, cache=cache_path), memory=False)
+    record('warm', lambda: ShoppingList(path, cache=cache_path))
+
+    names = [recipe.name for recipe in shopping.catalog]
+    lookups = rng.sample(names, min(len(names), 1000))
+
+    def select():
+        for name in lookups:
+            shopping.print_recipe(name)
+        shopping.catalog.by_rating(8)
+        for category in CATEGORIES:
+            shopping.catalog.by_category(category)
+
+    record('select', select)
+    record('search', lambda: [shopping.search(name[:6]) for name in lookups[:200]])
+
+    selection = {RecipeCatalog.normalize(name) for name in rng.sample(names, min(len(names), 20))}
+
+    def prepare():
+        shopping.clear()
+        shopping.selected_recipes = set(selection)
+        shopping.prepare_list()
+
+    record('prepare', prepare)
+    record('pprint', shopping.pprint_shopping_list)
+
+    selections = [rng.sample(names, min(len(names), 5)) for _ in range(1000)]
+    record('batch', lambda: shopping.prepare_lists(selections))
+
+    # Every ingredient priced in the first unit it was seen in
+    table = recipes.CostTable(['price', 'calories'])
+    catalog = shopping.catalog
+    for ingredient, unit in zip(catalog.ingredient_col, catalog.unit_col):
+        table.add(catalog.ingredient_names[ingredient], recipes.UNITS.units[unit],
+                  [rng.uniform(0.1, 5), rng.uniform(0, 400)])
+    record('rollup', lambda: shopping.rollup_lists(selections, table))
+
+    # peak_bytes / 1000 is the memory per session, catalog not included
+    def session(selection):
+        session_ = shopping.session()
+        for name in selection:
+            session_.select(name)
+        session_.shopping_data()
+        return session_
+
+    def sessions():
+        with concurrent.futures.ThreadPoolExecutor(8) as pool:
+            return list(pool.map(session, selections))
+
+    record('sessions', sessions)
+    return results
+
+
+def compare(results, previous):
+    before = {(each['size'], each['stage']): each for each in previous['results']}
+    print(f"\n{'size':>9} {'stage':<10} {'before':>10} {'after':>10} {'change':>8}")
+    for each in results:
+        old = before.get((each['size'], each['stage']))
+        if old is None:
+            continue
+        change = each['seconds'] / old['seconds'] - 1 if old['seconds'] else 0
+        print(f"{each['size']:>9} {each['stage']:<10} {old['seconds']:10.4f} {each['seconds']:10.4f} {change:+8.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading, linting, selecting and aggregating recipes")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000, 1000000],
+                        help="catalog sizes to benchmark")
+    parser.add_argument('--ingredients', type=int, nargs=2, default=[4, 12], metavar=('MIN', 'MAX'),
+                        help="ingredients per recipe")
+    parser.add_argument('--vocabulary', type=int, default=5000, help="number of distinct ingredient names")
+    parser.add_argument('--unit-mix', type=unit_weight, nargs='+', metavar='UNIT=WEIGHT',
+                        help="relative weights of the units to generate, e.g. cup/solid=3 single=1 "
+                             "(default: roughly the mix in recipes.json)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc runs, which are slow")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', help="compare against the results in this JSON file")
+    parser.add_argument('--copies', type=int, help="instead, compare memory used by the dict and compact "
+                                                   "forms of this many copies of recipes.json")
+    args = parser.parse_args()
+    if args.unit_mix is not None:
+        args.unit_mix = dict(args.unit_mix)
+        if not any(args.unit_mix.values()):
+            parser.error("--unit-mix needs at least one unit with a positive weight")
+
+    if args.copies:
+        result = memory_benchmark(args.copies)
+        print(f"{result['recipes']} recipes, {result['ingredients']} ingredients")
+        print(f"Dict form:    {result['dict_bytes'] / 1024:.0f} KiB")
+        print(f"Compact form: {result['compact_bytes'] / 1024:.0f} KiB")
+        print(f"Saving:       {result['saving']:.0%}")
+        return
+
+    results = []
+    workdir = tempfile.mkdtemp(prefix='recipes-benchmark-')
+    try:
+        for size in args.sizes:
+            results.extend(benchmark_size(size, workdir, args))
+    finally:
+        shutil.rmtree(workdir)
+
+    report = {'meta': {'date': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'python': platform.python_version(),
+                       'numpy': recipes.np is not None,
+                       'ingredients': args.ingredients,
+                       'vocabulary': args.vocabulary,
+                       'unit_mix': args.unit_mix or default_unit_mix(),
+                       'seed': args.seed},
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as outfile:
+            json.dump(report, outfile, indent=2)
+    if args.compare:
+        with open(args.compare, 'r') as infile:
+            compare(results, json.load(infile))
+
+
+if __name__ == '__main__':
+    main()
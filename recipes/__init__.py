@@ -0,0 +1,3698 @@
+import bisect
+import collections
+import concurrent.futures
+import contextlib
+import csv
+import functools
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import math
+import mmap
+import os
+import pprint as pretty
+import re
+import struct
+import sys
+import threading
+import time
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Dictionary for Recipe File
+1. All ingredients should be lower case
+2. Each ingredient is the key, with the amount and unit amount as an associated value
+3. Possible units:
+    tsp, 
+    tbsp, 
+    cup/liquid, 
+    cup/solid, 
+    oz/liquid, 
+    oz/solid, 
+    lbs, 
+    single (used in reference to the ingredient itself e.g. tortilla == single),
+    clove,
+    bunch (used for vegetables such as cilantro and other herbs, or asparagus)
+"""
+
+UNIT_LIST = ('tsp', 'tbsp', 'cup/liquid', 'cup/solid', 'oz/liquid', 'oz/solid',
+             'lbs', 'single', 'clove', 'bunch', 'slice')
+CONVERTABLE_UNITS = ('tsp', 'tbsp', 'cup/liquid', 'cup/solid', 'oz/liquid', 'oz/solid', 'lbs')
+NONCONVERTABLE_UNITS = tuple(each for each in UNIT_LIST if each not in CONVERTABLE_UNITS)
+
+# Direct conversions only -- anything reachable by chaining these
+# together is filled in by UnitConverter
+CONVERSION_TABLE = {'oz/solid': {'cup/solid': 0.125,
+                                 'tbsp': 2,
+                                 'tsp': 6,
+                                 'lbs': 0.0624
+                                 },
+                    'oz/liquid': {'cup/liquid': 0.125,
+                                  'tbsp': 2,
+                                  'tsp': 6,
+                                  'pint': 1/16.0,
+                                  'quart': 1/64.0,
+                                  'gallon': 1/256.0
+                                  },
+                    'cup/solid': {'oz/solid': 8,
+                                  'tbsp': 16,
+                                  'tsp': 48,
+                                  'lbs': 0.5,
+                                  },
+                    'cup/liquid': {'oz/liquid': 8,
+                                   'tbsp': 16,
+                                   'tsp': 48,
+                                   'pint': 0.5,
+                                   'quart': 0.25,
+                                   'gallon': 0.25/4.0
+                                   },
+                    'tbsp': {'cup/solid': 1/16.0,
+                             'cup/liquid': 1/16.0,
+                             'oz/solid': 0.5,
+                             'tsp': 3,
+                             'lbs': 0.0315
+                             },
+                    'tsp': {'cup/solid': 1/48.0,
+                            'oz/liquid': 1/48.0,
+                            'tbsp': 0.3333,
+                            'oz/solid': 0.16667,
+                            'lbs': 0.0105
+                            },
+                    'lbs': {'cup/solid': 2,
+                            'tbsp': 32,
+                            'tsp': 96,
+                            'oz/solid': 16
+                            }
+                    }
+
+
+class UnitConverter(object):
+    """
+    Conversion graph compiled once from a conversion table.
+
+    Every unit is interned to a small integer ID and the transitive closure
+    of the table (direct edges, their inverses and any chain of the two) is
+    stored in a flat n x n matrix of factors, so any conversion is a single
+    index. Incompatible pairs are stored as NaN and reported as None.
+    """
+
+    def __init__(self, table, units=()):
+        self.units = []
+        self.unit_ids = {}
+        for unit in units:
+            self._intern(unit)
+        for start, targets in table.items():
+            self._intern(start)
+            for target in targets:
+                self._intern(target)
+
+        size = len(self.units)
+        self.size = size
+
+        # Table edges come first so that they win over inverted ones
+        edges = [{} for _ in range(size)]
+        for start, targets in table.items():
+            for target, factor in targets.items():
+                edges[self.unit_ids[start]][self.unit_ids[target]] = factor
+        for start, targets in table.items():
+            for target, factor in targets.items():
+                edges[self.unit_ids[target]].setdefault(self.unit_ids[start], 1.0 / factor)
+
+        # Breadth first from each unit, so the fewest hops (and so the
+        # least rounding) is always used for a given pair
+        self.matrix = array('d', [float('nan')]) * (size * size)
+        self.components = array('i', [-1]) * size
+        self.canonical = []
+        for source in range(size):
+            row = source * size
+            self.matrix[row + source] = 1.0
+            frontier = [source]
+            while frontier:
+                next_frontier = []
+                for node in frontier:
+                    node_factor = self.matrix[row + node]
+                    for target, factor in edges[node].items():
+                        if self.matrix[row + target] != self.matrix[row + target]:
+                            self.matrix[row + target] = node_factor * factor
+                            next_frontier.append(target)
+                frontier = next_frontier
+
+            if self.components[source] == -1:
+                # The first unit seen in a component is its canonical unit
+                component = len(self.canonical)
+                self.canonical.append(source)
+                for target in range(size):
+                    if self.matrix[row + target] == self.matrix[row + target]:
+                        self.components[target] = component
+
+    def _intern(self, unit):
+        if unit not in self.unit_ids:
+            self.unit_ids[unit] = len(self.units)
+            self.units.append(unit)
+
+        return self.unit_ids[unit]
+
+    def unit_id(self, unit):
+        return self.unit_ids.get(unit)
+
+    def factor_by_id(self, start, target):
+        factor = self.matrix[start * self.size + target]
+        if factor != factor:
+            return None
+
+        return factor
+
+    def factor(self, start, target):
+        start_id = self.unit_ids.get(start)
+        target_id = self.unit_ids.get(target)
+        if start_id is None or target_id is None:
+            return None
+
+        return self.factor_by_id(start_id, target_id)
+
+    def compatible(self, start, target):
+        return self.factor(start, target) is not None
+
+    def convert(self, amount, start, target):
+        factor = self.factor(start, target)
+        if factor is None:
+            return None
+
+        return amount * factor
+
+    def canonical_unit(self, unit):
+        return self.units[self.canonical[self.components[self.unit_ids[unit]]]]
+
+
+UNITS = UnitConverter(CONVERSION_TABLE, UNIT_LIST)
+
+# Bump whenever the linter's rules change, so cached catalogs are rebuilt
+LINT_VERSION = 3
+
+# Every catalog, and every change to one, gets a new version
+_CATALOG_VERSIONS = itertools.count(1)
+
+
+class Ingredient(object):
+    __slots__ = ('name', 'amount', 'unit')
+
+    def __init__(self, name, amount, unit):
+        self.name = name
+        self.amount = amount
+        self.unit = unit
+
+    def __repr__(self):
+        return f"Ingredient({self.name!r}, {self.amount!r}, {self.unit!r})"
+
+    def to_dict(self):
+        return {self.name: {'amount': ShoppingList.format_amount(self.amount), 'unit': self.unit}}
+
+
+class Recipe(object):
+    """
+    Compact recipe record.
+
+    Ingredients and spices are not stored on the record itself, only the
+    slice of the catalog's columns that holds them.
+    """
+    __slots__ = ('catalog', 'position', 'name', 'url', 'category', 'rating', 'servings',
+                 'start', 'stop', 'spice_start', 'spice_stop')
+
+    def __init__(self, catalog, position, name, url, category, rating, servings,
+                 start, stop, spice_start, spice_stop):
+        self.catalog = catalog
+        self.position = position
+        self.name = name
+        self.url = url
+        self.category = category
+        self.rating = rating
+        self.servings = servings
+        self.start = start
+        self.stop = stop
+        self.spice_start = spice_start
+        self.spice_stop = spice_stop
+
+    def __repr__(self):
+        return f"Recipe({self.name!r})"
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def scale(self, serving_size=None):
+        """Multiplier that takes this recipe from its own servings to serving_size"""
+        if serving_size is None or not self.servings:
+            return 1.0
+
+        return serving_size / self.servings
+
+    @property
+    def ingredients(self):
+        catalog = self.catalog
+        names = catalog.ingredient_names
+        units = UNITS.units
+        return [Ingredient(names[catalog.ingredient_col[i]], catalog.amounts[i], units[catalog.unit_col[i]])
+                for i in range(self.start, self.stop)]
+
+    @property
+    def spices(self):
+        names = self.catalog.spice_names
+        return [names[i] for i in self.catalog.spice_col[self.spice_start:self.spice_stop]]
+
+    def to_dict(self):
+        return {'recipe': self.name,
+                'ingredients': [ing.to_dict() for ing in self.ingredients],
+                'spices': self.spices,
+                'url': self.url,
+                'rating': ShoppingList.format_amount(self.rating),
+                'category': self.category,
+                'servings': ShoppingList.format_amount(self.servings)}
+
+
+class RecipeCatalog(object):
+    """
+    Recipes indexed once at load time.
+
+    Recipes are kept as Recipe records. Ingredient and spice names are
+    interned to integer IDs, units use the IDs from UNITS, and every
+    ingredient in the catalog sits in three contiguous columns (name ID,
+    amount, unit ID) that each recipe points into with a slice.
+
+    Holds a hash index on the normalized (lowercased) recipe name plus
+    secondary indexes on category, rating and ingredient, each mapping
+    to positions in the recipe list, so lookups never scan the catalog.
+    """
+
+    def __init__(self, recipes=()):
+        self.recipes = []
+        self.names = {}
+        self.categories = {}
+        self.ingredient_names = []
+        self.ingredient_ids = {}
+        self.ingredient_recipes = []
+        self.spice_names = []
+        self.spice_ids = {}
+        self.ingredient_col = array('i')
+        self.amounts = array('d')
+        self.unit_col = array('B')
+        self.spice_col = array('i')
+        self._rating_keys = []
+        self._rating_positions = []
+        self._ratings_sorted = True
+        self._shared = {}
+        self._lock = threading.Lock()
+        self.version = next(_CATALOG_VERSIONS)
+        for recipe in recipes:
+            self.add(recipe)
+
+    @staticmethod
+    def normalize(name):
+        if not isinstance(name, str):
+            raise TypeError(f"Recipe names are strings, not {name!r}")
+        return name.strip().lower()
+
+    def ingredient_id(self, ingredient):
+        ingredient_id = self.ingredient_ids.get(ingredient)
+        if ingredient_id is None:
+            ingredient_id = len(self.ingredient_names)
+            self.ingredient_ids[ingredient] = ingredient_id
+            self.ingredient_names.append(ingredient)
+            self.ingredient_recipes.append([])
+
+        return ingredient_id
+
+    def spice_id(self, spice):
+        spice_id = self.spice_ids.get(spice)
+        if spice_id is None:
+            spice_id = len(self.spice_names)
+            self.spice_ids[spice] = spice_id
+            self.spice_names.append(spice)
+
+        return spice_id
+
+    def add(self, recipe):
+        """Compact a linted recipe dict into the catalog"""
+        self._thaw()
+        name = RecipeCatalog.normalize(recipe['recipe'])
+        if name in self.names:
+            raise Exception(f"Duplicate recipe in catalog: {recipe['recipe']}")
+
+        position = len(self.recipes)
+        start = len(self.amounts)
+        for ing in recipe['ingredients']:
+            for key, value in ing.items():
+                ingredient_id = self.ingredient_id(key)
+                self.ingredient_col.append(ingredient_id)
+                self.amounts.append(value['amount'])
+                self.unit_col.append(UNITS.unit_ids[value['unit']])
+                recipes = self.ingredient_recipes[ingredient_id]
+                if not recipes or recipes[-1] != position:
+                    recipes.append(position)
+
+        spice_start = len(self.spice_col)
+        for spice in recipe.get('spices', ()):
+            self.spice_col.append(self.spice_id(spice))
+
+        record = Recipe(self, position, recipe['recipe'], recipe['url'], sys.intern(recipe['category']),
+                        float(recipe['rating']), float(recipe['servings']),
+                        start, len(self.amounts), spice_start, len(self.spice_col))
+        return self._index(record, name)
+
+    def derive(self):
+        """An empty catalog sharing this one's ingredient and spice IDs, to copy_recipe into"""
+        catalog = RecipeCatalog()
+        catalog.ingredient_names = list(self.ingredient_names)
+        catalog.ingredient_ids = dict(self.ingredient_ids)
+        catalog.ingredient_recipes = [[] for _ in self.ingredient_names]
+        catalog.spice_names = list(self.spice_names)
+        catalog.spice_ids = dict(self.spice_ids)
+        return catalog
+
+    def copy_recipe(self, recipe):
+        """Append a recipe from the catalog this one was derived from, its columns are copied as they are"""
+        self._thaw()
+        source = recipe.catalog
+        name = RecipeCatalog.normalize(recipe.name)
+        if name in self.names:
+            raise Exception(f"Duplicate recipe in catalog: {recipe.name}")
+
+        position = len(self.recipes)
+        start = len(self.amounts)
+        ingredients = source.ingredient_col[recipe.start:recipe.stop]
+        self.ingredient_col.extend(ingredients)
+        self.amounts.extend(source.amounts[recipe.start:recipe.stop])
+        self.unit_col.extend(source.unit_col[recipe.start:recipe.stop])
+        for ingredient_id in ingredients:
+            recipes = self.ingredient_recipes[ingredient_id]
+            if not recipes or recipes[-1] != position:
+                recipes.append(position)
+
+        spice_start = len(self.spice_col)
+        self.spice_col.extend(source.spice_col[recipe.spice_start:recipe.spice_stop])
+        record = Recipe(self, position, recipe.name, recipe.url, recipe.category, recipe.rating, recipe.servings,
+                        start, len(self.amounts), spice_start, len(self.spice_col))
+        return self._index(record, name)
+
+    def _index(self, record, name):
+        position = record.position
+        self.recipes.append(record)
+        self.names[name] = position
+        self.categories.setdefault(record.category, []).append(position)
+
+        # The rating index is only sorted again when it is next queried
+        self._rating_keys.append(record.rating)
+        self._rating_positions.append(position)
+        self._ratings_sorted = False
+        self.version = next(_CATALOG_VERSIONS)
+        return position
+
+    def fingerprint(self, position):
+        """Hash of everything stored for a recipe, equal to dict_fingerprint of the dict it came from"""
+        recipe = self.recipes[position]
+        return hash((recipe.name, tuple((ing.name, ing.amount, ing.unit) for ing in recipe.ingredients),
+                     tuple(recipe.spices), recipe.url, recipe.rating, recipe.category, recipe.servings))
+
+    @staticmethod
+    def dict_fingerprint(recipe):
+        """None if the dict isn't even shaped like a recipe"""
+        try:
+            if len(recipe) != 7:
+                return None
+            return hash((recipe['recipe'],
+                         tuple((name, float(value['amount']), value['unit'])
+                               for ing in recipe['ingredients'] for name, value in ing.items()),
+                         tuple(recipe['spices']), recipe['url'], float(recipe['rating']), recipe['category'],
+                         float(recipe['servings'])))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+
+    def _sort_ratings(self):
+        order = sorted(range(len(self._rating_keys)), key=self._rating_keys.__getitem__)
+        self._rating_keys = [self._rating_keys[i] for i in order]
+        self._rating_positions = [self._rating_positions[i] for i in order]
+        self._ratings_sorted = True
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def __iter__(self):
+        return iter(self.recipes)
+
+    def __contains__(self, name):
+        return RecipeCatalog.normalize(name) in self.names
+
+    def get(self, name, default=None):
+        position = self.names.get(RecipeCatalog.normalize(name))
+        if position is None:
+            return default
+
+        return self.recipes[position]
+
+    def by_category(self, category):
+        return [self.recipes[i] for i in self.categories.get(category, ())]
+
+    def by_rating(self, min_rating, max_rating=None):
+        """Recipes with min_rating <= rating (<= max_rating), highest rated first"""
+        if not self._ratings_sorted:
+            with self._lock:
+                if not self._ratings_sorted:
+                    self._sort_ratings()
+
+        lo = bisect.bisect_left(self._rating_keys, min_rating)
+        hi = len(self._rating_keys) if max_rating is None else bisect.bisect_right(self._rating_keys, max_rating)
+        return [self.recipes[self._rating_positions[i]] for i in range(hi - 1, lo - 1, -1)]
+
+    def with_ingredient(self, ingredient):
+        ingredient_id = self.ingredient_ids.get(ingredient)
+        if ingredient_id is None:
+            return []
+
+        return [self.recipes[i] for i in self.ingredient_recipes[ingredient_id]]
+
+    def whole(self):
+        """The catalog with every recipe in it, which a single file catalog already is"""
+        return self
+
+    def shared(self, key, build):
+        """build(catalog) the first time key is asked for, the same object after that, for every user of the catalog"""
+        value = self._shared.get(key)
+        if value is None:
+            with self._lock:
+                value = self._shared.get(key)
+                if value is None:
+                    value = self._shared[key] = build(self)
+
+        return value
+
+    def peek_shared(self, key):
+        """What shared() built for key, or None if nothing has asked for it yet"""
+        return self._shared.get(key)
+
+    # Binary cache layout: a fixed header, then one section per entry in
+    # _CACHE_SECTIONS, each an 8-byte aligned run of raw array data so the
+    # columns can be used straight out of a memory map. The header holds
+    # the source key and a sha256 of everything after the header
+    _CACHE_MAGIC = b'RCPC'
+    _CACHE_FORMAT = 2
+    _CACHE_HEADER = struct.Struct('<4sHH32s32s')
+    _CACHE_SECTION = struct.Struct('<c7xQ')
+    _CACHE_SECTIONS = (('recipe_names', 's'), ('urls', 's'), ('category_names', 's'),
+                       ('ingredient_names', 's'), ('spice_names', 's'),
+                       ('ratings', 'd'), ('servings', 'd'), ('ingredient_bounds', 'q'), ('spice_bounds', 'q'),
+                       ('ingredient_col', 'i'), ('amounts', 'd'), ('unit_col', 'B'), ('spice_col', 'i'),
+                       ('rating_order', 'i'), ('ingredient_recipe_bounds', 'q'), ('ingredient_recipe_positions', 'i'))
+    _COLUMNS = ('ingredient_col', 'amounts', 'unit_col', 'spice_col')
+
+    @staticmethod
+    def source_digest():
+        """Hash salted with everything that changes the compiled catalog, fed the recipe file's bytes by source_key"""
+        digest = hashlib.sha256()
+        digest.update(f"{RecipeCatalog._CACHE_FORMAT}:{LINT_VERSION}:{UNITS.units}\n".encode())
+        return digest
+
+    @staticmethod
+    def source_key(path):
+        """Content hash of a recipe file, salted with everything that changes the compiled catalog"""
+        digest = RecipeCatalog.source_digest()
+        with open(path, 'rb') as infile:
+            for chunk in iter(lambda: infile.read(1 << 20), b''):
+                digest.update(chunk)
+
+        return digest.digest()
+
+    def _thaw(self):
+        # Columns loaded from a cache are read-only views of the memory map
+        for name in RecipeCatalog._COLUMNS:
+            column = getattr(self, name)
+            if not isinstance(column, array):
+                setattr(self, name, array(column.format, column))
+
+    def save(self, path, key):
+        """Write the catalog to path, replacing it atomically"""
+        if not self._ratings_sorted:
+            self._sort_ratings()
+
+        ingredient_bounds = array('q', [0])
+        spice_bounds = array('q', [0])
+        for recipe in self.recipes:
+            ingredient_bounds.append(recipe.stop)
+            spice_bounds.append(recipe.spice_stop)
+
+        ingredient_recipe_bounds = array('q', [0])
+        ingredient_recipe_positions = array('i')
+        for positions in self.ingredient_recipes:
+            ingredient_recipe_positions.extend(positions)
+            ingredient_recipe_bounds.append(len(ingredient_recipe_positions))
+
+        sections = {'recipe_names': [recipe.name for recipe in self.recipes],
+                    'urls': [recipe.url for recipe in self.recipes],
+                    'category_names': [recipe.category for recipe in self.recipes],
+                    'ingredient_names': self.ingredient_names,
+                    'spice_names': self.spice_names,
+                    'ratings': array('d', [recipe.rating for recipe in self.recipes]),
+                    'servings': array('d', [recipe.servings for recipe in self.recipes]),
+                    'ingredient_bounds': ingredient_bounds,
+                    'spice_bounds': spice_bounds,
+                    'ingredient_col': self.ingredient_col,
+                    'amounts': self.amounts,
+                    'unit_col': self.unit_col,
+                    'spice_col': self.spice_col,
+                    'rating_order': array('i', self._rating_positions),
+                    'ingredient_recipe_bounds': ingredient_recipe_bounds,
+                    'ingredient_recipe_positions': ingredient_recipe_positions}
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        body = hashlib.sha256()
+        with open(tmp_path, 'wb') as outfile:
+            # The header is written again once the body's hash is known
+            outfile.write(b'\0' * RecipeCatalog._CACHE_HEADER.size)
+            for name, typecode in RecipeCatalog._CACHE_SECTIONS:
+                if typecode == 's':
+                    if any('\0' in each for each in sections[name]):
+                        raise Exception(f"Cannot cache {name} containing a NUL character")
+                    data = '\0'.join(sections[name]).encode()
+                else:
+                    data = memoryview(sections[name]).cast('B')
+                for part in (RecipeCatalog._CACHE_SECTION.pack(typecode.encode(), len(data)), data,
+                             b'\0' * (-len(data) % 8)):
+                    body.update(part)
+                    outfile.write(part)
+            outfile.seek(0)
+            outfile.write(RecipeCatalog._CACHE_HEADER.pack(RecipeCatalog._CACHE_MAGIC, RecipeCatalog._CACHE_FORMAT,
+                                                           LINT_VERSION, key, body.digest()))
+
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, key):
+        """Load a catalog saved with the same key, or None if it is missing or stale"""
+        try:
+            with open(path, 'rb') as infile:
+                mapped = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+
+        view = memoryview(mapped)
+        if len(view) < cls._CACHE_HEADER.size:
+            return None
+        magic, format_, lint_version, cached_key, body = cls._CACHE_HEADER.unpack_from(view)
+        if (magic, format_, lint_version, cached_key) != (cls._CACHE_MAGIC, cls._CACHE_FORMAT, LINT_VERSION, key):
+            return None
+        # Damage the structure checks can't see, a flipped amount or ID, is
+        # caught here rather than turning up as a wrong list later
+        if hashlib.sha256(view[cls._CACHE_HEADER.size:]).digest() != body:
+            return None
+
+        try:
+            return cls._from_view(view)
+        except (struct.error, ValueError, TypeError, IndexError, UnicodeDecodeError):
+            # Truncated or corrupt behind a valid header, the caller rebuilds it
+            return None
+
+    @classmethod
+    def _from_view(cls, view):
+        sections = {}
+        offset = cls._CACHE_HEADER.size
+        for name, typecode in cls._CACHE_SECTIONS:
+            if offset + cls._CACHE_SECTION.size > len(view):
+                raise ValueError(f"Cache ends before section {name}")
+            stored_typecode, length = cls._CACHE_SECTION.unpack_from(view, offset)
+            if stored_typecode != typecode.encode():
+                raise ValueError(f"Cache section {name} has the wrong type")
+            offset += cls._CACHE_SECTION.size
+            if offset + length > len(view):
+                raise ValueError(f"Cache section {name} runs past the end of the file")
+            data = view[offset:offset + length]
+            if typecode == 's':
+                text = bytes(data).decode()
+                sections[name] = text.split('\0') if text else []
+            else:
+                sections[name] = data.cast(typecode)
+            offset += length + (-length % 8)
+
+        # Every index has to line up with the sections it points into
+        recipe_count = len(sections['recipe_names'])
+        if (len(sections['ingredient_bounds']) != recipe_count + 1
+                or sections['ingredient_bounds'][-1] != len(sections['ingredient_col'])
+                or len(sections['spice_bounds']) != recipe_count + 1
+                or sections['spice_bounds'][-1] != len(sections['spice_col'])
+                or len(sections['ingredient_recipe_bounds']) != len(sections['ingredient_names']) + 1
+                or not (len(sections['urls']) == len(sections['category_names']) == len(sections['ratings'])
+                        == len(sections['servings']) == len(sections['rating_order']) == recipe_count)
+                or not len(sections['ingredient_col']) == len(sections['amounts']) == len(sections['unit_col'])):
+            raise ValueError("Cache sections don't line up")
+
+        catalog = cls()
+        for name in ('ingredient_names', 'spice_names') + cls._COLUMNS:
+            setattr(catalog, name, sections[name])
+        catalog.ingredient_ids = {name: i for i, name in enumerate(catalog.ingredient_names)}
+        catalog.spice_ids = {name: i for i, name in enumerate(catalog.spice_names)}
+        bounds = sections['ingredient_recipe_bounds']
+        positions = sections['ingredient_recipe_positions']
+        catalog.ingredient_recipes = [positions[bounds[i]:bounds[i + 1]].tolist()
+                                      for i in range(len(catalog.ingredient_names))]
+
+        ingredient_bounds = sections['ingredient_bounds']
+        spice_bounds = sections['spice_bounds']
+        ratings = sections['ratings']
+        servings = sections['servings']
+        urls = sections['urls']
+        for position, (name, category) in enumerate(zip(sections['recipe_names'], sections['category_names'])):
+            category = sys.intern(category)
+            catalog.recipes.append(Recipe(catalog, position, name, urls[position], category,
+                                          ratings[position], servings[position],
+                                          ingredient_bounds[position], ingredient_bounds[position + 1],
+                                          spice_bounds[position], spice_bounds[position + 1]))
+            catalog.names[RecipeCatalog.normalize(name)] = position
+            catalog.categories.setdefault(category, []).append(position)
+
+        catalog._rating_positions = sections['rating_order'].tolist()
+        catalog._rating_keys = [ratings[i] for i in catalog._rating_positions]
+        return catalog
+
+
+class ShardedCatalog(object):
+    """
+    A catalog split over several recipe files (shards), e.g. one per category.
+
+    Only the manifest is read up front: each shard's recipe names, ratings
+    and categories, and the mtime and size of the file they came from.
+    Shards whose file changed, or that are new, are scanned again and the
+    manifest rewritten. A shard is loaded and linted the first time one of
+    its recipes is needed, and loaded shards are evicted least recently
+    used first once they are estimated to take more than memory_budget
+    bytes, so memory follows the working set. Recipe positions and the
+    names index are global, in shard order, so anything that orders by
+    catalog position works the same as with one file.
+
+    Search, pantry queries and batch aggregation need every recipe, so
+    they use whole(), one merged catalog built when it's needed. It is kept
+    in the same LRU as the shards and counted against the same budget, so
+    it is evicted (and built again later) like any shard; with a budget
+    smaller than the whole catalog that is each time a shard pushes it out.
+    A shard file that changed since the catalog was opened is an error, for
+    whole() as for any shard, rather than a quietly stale result.
+
+    Shards are loaded outside the catalog's lock, so lookups in loaded
+    shards never wait on a cold one. Two threads after the same shard
+    share one load.
+    """
+
+    MANIFEST = 'manifest.json'
+    MANIFEST_FORMAT = 1
+    SHARD_EXTENSIONS = ('.json', '.jsonl')
+
+    def __init__(self, path, memory_budget=256 << 20, stream=False, cache=False):
+        if os.path.isdir(path):
+            self.directory = path
+            self.manifest_path = os.path.join(path, ShardedCatalog.MANIFEST)
+        else:
+            self.directory = os.path.dirname(path)
+            self.manifest_path = path
+        self.memory_budget = memory_budget
+        self.stream = stream
+        self.cache = bool(cache)
+        self.shards = self._read_manifest(listed=not os.path.isdir(path))
+
+        self.offsets = []
+        self.names = {}
+        for index, shard in enumerate(self.shards):
+            self.offsets.append(len(self.names))
+            for name in shard['recipes']:
+                normalized = RecipeCatalog.normalize(name)
+                if normalized in self.names:
+                    raise Exception(f"Duplicate recipe in catalog: {name}")
+                self.names[normalized] = len(self.names)
+
+        # Keyed on shard index, and WHOLE for the merged catalog
+        self.loaded = collections.OrderedDict()
+        self.bytes = 0
+        self.loads = 0
+        self.evictions = 0
+        self.merges = 0
+        self.version = next(_CATALOG_VERSIONS)
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    @staticmethod
+    def _scan(path, stream=False):
+        # Only what the manifest needs, linting waits until the shard is loaded
+        recipes = []
+        ratings = []
+        categories = set()
+        for each in iter_recipes(path, stream=stream):
+            if not isinstance(each, dict) or not isinstance(each.get('recipe'), str):
+                raise Exception(f"Recipe without a name in {path}")
+            recipes.append(each['recipe'])
+            ratings.append(each['rating'] if ShoppingList.check_number(each.get('rating')) else None)
+            categories.add(str(each.get('category')))
+
+        return {'recipes': recipes, 'ratings': ratings, 'categories': sorted(categories)}
+
+    def _read_manifest(self, listed=False):
+        manifest = {}
+        try:
+            with open(self.manifest_path, 'r') as infile:
+                manifest = json.load(infile)
+        except FileNotFoundError:
+            if listed:
+                raise Exception(f"No manifest at {self.manifest_path}")
+        except ValueError:
+            pass
+        if manifest.get('format') != ShardedCatalog.MANIFEST_FORMAT:
+            manifest = {}
+        known = {shard['path']: shard for shard in manifest.get('shards', ())}
+
+        # An explicit manifest names its shards, a directory is every recipe file in it
+        if listed:
+            paths = list(known)
+        else:
+            paths = sorted(name for name in os.listdir(self.directory)
+                           if name.endswith(ShardedCatalog.SHARD_EXTENSIONS) and name != ShardedCatalog.MANIFEST)
+
+        shards = []
+        changed = set(known) != set(paths)
+        for name in paths:
+            stat = os.stat(os.path.join(self.directory, name))
+            shard = known.get(name)
+            if shard is None or (shard['mtime_ns'], shard['size']) != (stat.st_mtime_ns, stat.st_size):
+                shard = dict(ShardedCatalog._scan(os.path.join(self.directory, name), stream=self.stream),
+                             path=name, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                changed = True
+            shards.append(shard)
+
+        if changed:
+            tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as outfile:
+                json.dump({'format': ShardedCatalog.MANIFEST_FORMAT, 'shards': shards}, outfile)
+            os.replace(tmp_path, self.manifest_path)
+
+        return shards
+
+    @staticmethod
+    def split(path, directory, key='category', stream=False):
+        """Write one shard per value of key (category by default) from a single recipe file, returns the ShardedCatalog"""
+        groups = {}
+        for each in iter_recipes(path, stream=stream):
+            groups.setdefault(str(each.get(key)), []).append(each)
+
+        os.makedirs(directory, exist_ok=True)
+        for value, recipes in groups.items():
+            name = re.sub(r'[^a-z0-9]+', '-', value.lower()).strip('-') or 'shard'
+            with open(os.path.join(directory, f"{name}.json"), 'w') as outfile:
+                json.dump({'recipes': recipes}, outfile, indent=4)
+
+        return ShardedCatalog(directory, stream=stream)
+
+    @staticmethod
+    def _footprint(catalog):
+        # An estimate: the columns exactly, a flat allowance for each recipe
+        # record and ingredient name with its index entries
+        columns = sum(len(column) * column.itemsize for column in
+                      (catalog.ingredient_col, catalog.amounts, catalog.unit_col, catalog.spice_col))
+        return columns + 600 * len(catalog.recipes) + 150 * len(catalog.ingredient_names)
+
+    WHOLE = 'whole'
+
+    def _cached(self, key, build):
+        # The LRU entry for key, built by build() outside the lock if it
+        # isn't there. Whoever builds it holds key's own lock meanwhile, so
+        # anyone else after it waits for that rather than building it again
+        with self._lock:
+            entry = self.loaded.get(key)
+            if entry is not None:
+                self.loaded.move_to_end(key)
+                return entry[0]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                entry = self.loaded.get(key)
+                if entry is not None:
+                    self.loaded.move_to_end(key)
+                    return entry[0]
+
+            catalog = build()
+            size = ShardedCatalog._footprint(catalog)
+            with self._lock:
+                self.loaded[key] = (catalog, size)
+                self.bytes += size
+                while self.bytes > self.memory_budget and len(self.loaded) > 1:
+                    _, (_, evicted) = self.loaded.popitem(last=False)
+                    self.bytes -= evicted
+                    self.evictions += 1
+
+        return catalog
+
+    def _read_shard(self, index):
+        shard = self.shards[index]
+        path = os.path.join(self.directory, shard['path'])
+        stat = os.stat(path)
+        if (stat.st_mtime_ns, stat.st_size) != (shard['mtime_ns'], shard['size']):
+            raise Exception(f"{shard['path']} changed since the catalog was opened, open it again")
+        catalog = ShoppingList.load_catalog(path, stream=self.stream, cache=self.cache)
+        if [recipe.name for recipe in catalog] != shard['recipes']:
+            raise Exception(f"{shard['path']} changed since the catalog was opened, open it again")
+
+        with self._lock:
+            self.loads += 1
+        return catalog
+
+    def shard(self, index):
+        """The loaded catalog for one shard, loading and linting it if needed"""
+        return self._cached(index, lambda: self._read_shard(index))
+
+    def stats(self):
+        return {'shards': len(self.shards),
+                'loaded': len(self.loaded),
+                'bytes': self.bytes,
+                'loads': self.loads,
+                'evictions': self.evictions,
+                'merges': self.merges}
+
+    def _recipe(self, position):
+        index = bisect.bisect_right(self.offsets, position) - 1
+        return self.shard(index).recipes[position - self.offsets[index]]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        for index in range(len(self.shards)):
+            yield from self.shard(index)
+
+    def __contains__(self, name):
+        return RecipeCatalog.normalize(name) in self.names
+
+    def get(self, name, default=None):
+        position = self.names.get(RecipeCatalog.normalize(name))
+        if position is None:
+            return default
+
+        return self._recipe(position)
+
+    def by_category(self, category):
+        found = []
+        for index, shard in enumerate(self.shards):
+            if category in shard['categories']:
+                found.extend(self.shard(index).by_category(category))
+
+        return found
+
+    def by_rating(self, min_rating, max_rating=None):
+        """Recipes with min_rating <= rating (<= max_rating), highest rated first"""
+        found = []
+        for index, shard in enumerate(self.shards):
+            # A shard with a rating that isn't a number has to be loaded (and linted) to know
+            if any(rating is None or (rating >= min_rating and (max_rating is None or rating <= max_rating))
+                   for rating in shard['ratings']):
+                offset = self.offsets[index]
+                found.extend((recipe.rating, offset + recipe.position, recipe)
+                             for recipe in self.shard(index).by_rating(min_rating, max_rating))
+
+        found.sort(key=lambda each: each[:2], reverse=True)
+        return [recipe for _, _, recipe in found]
+
+    def with_ingredient(self, ingredient):
+        found = []
+        for index in range(len(self.shards)):
+            found.extend(self.shard(index).with_ingredient(ingredient))
+
+        return found
+
+    def whole(self):
+        """Every recipe in one RecipeCatalog, built from the shards the first time and after it is evicted"""
+        return self._cached(ShardedCatalog.WHOLE, self._merge)
+
+    def _merge(self):
+        # Shards already loaded are used as they are, the rest are read
+        # without being kept, so merging doesn't churn the LRU
+        def recipes():
+            for index in range(len(self.shards)):
+                with self._lock:
+                    entry = self.loaded.get(index)
+                catalog = entry[0] if entry is not None else self._read_shard(index)
+                for recipe in catalog:
+                    yield recipe.to_dict()
+
+        merged = RecipeCatalog(recipes())
+        with self._lock:
+            self.merges += 1
+        return merged
+
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+class _DigestReader(io.RawIOBase):
+    """Raw file that feeds every byte read from it into digest"""
+
+    def __init__(self, raw, digest):
+        self.raw = raw
+        self.digest = digest
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.raw.readinto(buffer)
+        if count:
+            self.digest.update(memoryview(buffer)[:count])
+        return count
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def iter_recipes(path, stream=False, chunk_size=1 << 16, digest=None):
+    """
+    Yield recipes from a recipe file one at a time.
+
+    Files ending in .jsonl hold one recipe per line and are always streamed.
+    Otherwise the file is the usual {"recipes": [...]} document, which is
+    either loaded whole or, with stream=True, decoded item by item out of the
+    "recipes" array so only the recipe being read is held in memory.
+
+    With a digest (see RecipeCatalog.source_digest) every byte of the file is
+    fed into it as it is read, so once the recipes are exhausted the digest
+    is of exactly the contents they were parsed from.
+    """
+    if digest is None:
+        infile = open(path, 'r')
+    else:
+        infile = io.TextIOWrapper(io.BufferedReader(_DigestReader(open(path, 'rb', buffering=0), digest)))
+
+    with infile:
+        if path.endswith('.jsonl'):
+            for line in infile:
+                if line.strip():
+                    yield json.loads(line)
+        elif stream:
+            yield from _stream_recipe_array(infile, chunk_size)
+        else:
+            yield from json.load(infile)['recipes']
+
+        if digest is not None:
+            # Anything after the recipes is part of the contents too
+            while infile.read(1 << 20):
+                pass
+
+
+def _stream_recipe_array(infile, chunk_size):
+    # Walks the top level object key by key rather than searching for
+    # "recipes", so a key split across reads or one nested in another value
+    # can't throw it off. Values of other keys are decoded and dropped. The
+    # file is held to the same grammar json.load holds it to, so streaming
+    # never accepts a file the default mode would reject
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def read():
+        nonlocal buffer, pos, eof
+        # A value straddling the buffer reads at least as much again as is
+        # buffered, to keep large recipes linear
+        chunk = infile.read(max(chunk_size, len(buffer) - pos))
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def peek():
+        # Past any whitespace, returning the next character ('' at the end of the file)
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or eof:
+                return buffer[pos:pos + 1]
+            read()
+
+    def expect(chars, where, consume=True):
+        nonlocal pos
+        char = peek()
+        if not char or char not in chars:
+            found = repr(char) if char else 'the end of the file'
+            raise Exception(f"Malformed recipe file, expected {' or '.join(map(repr, chars))} {where} but found {found}")
+        pos += consume
+        return char
+
+    def decode():
+        nonlocal pos
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+                error = None
+            except ValueError as e:
+                end, error = None, e
+            # A number at the end of the buffer may carry on in the next read
+            if end is not None and (end < len(buffer) or eof):
+                pos = end
+                return value
+            if eof:
+                raise Exception(f"Malformed recipe file -- {getattr(error, 'msg', error)}")
+            read()
+
+    found = False
+    expect('{', "at the start")
+    if peek() == '}':
+        raise Exception("No \"recipes\" list found in recipe file")
+    while True:
+        expect('"', "to start a key", consume=False)
+        key = decode()
+        expect(':', f"after {key!r}")
+        if key == 'recipes' and not found:
+            expect('[', "to start the \"recipes\" list")
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield decode()
+                    if expect(',]', "in the \"recipes\" list") == ']':
+                        break
+            found = True
+        else:
+            decode()
+        if expect(',}', "between keys") == '}':
+            break
+
+    if not found:
+        raise Exception("No \"recipes\" list found in recipe file")
+    if peek():
+        raise Exception("Malformed recipe file, more after the end of the document")
+
+
+class Diagnostic(object):
+    """A single linter finding, located by recipe, ingredient and field"""
+    __slots__ = ('recipe', 'ingredient', 'field', 'rule', 'message')
+
+    def __init__(self, recipe, rule, message, field=None, ingredient=None):
+        self.recipe = recipe
+        self.ingredient = ingredient
+        self.field = field
+        self.rule = rule
+        self.message = message
+
+    def __repr__(self):
+        return f"Diagnostic({self.recipe!r}, {self.rule!r}, {self.message!r}, field={self.field!r}, ingredient={self.ingredient!r})"
+
+    def __str__(self):
+        location = ' / '.join(str(each) for each in (self.recipe, self.ingredient, self.field) if each is not None)
+        return f"{location}: [{self.rule}] {self.message}"
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in Diagnostic.__slots__}
+
+
+def _is_lower(word):
+    return isinstance(word, str) and word == word.lower()
+
+
+def lint_recipe(recipe):
+    """Check a single recipe dict, returns a list of Diagnostics (empty if it is fine)"""
+    if not isinstance(recipe, dict):
+        return [Diagnostic(None, 'invalid-recipe', f"Recipe is not an object: {recipe!r}")]
+
+    name = recipe.get('recipe')
+    diagnostics = []
+    expected = ShoppingList.get_recipe_key_list()
+    for key in expected:
+        if key not in recipe:
+            diagnostics.append(Diagnostic(name, 'missing-key', f"Missing key: {key}", field=key))
+    for key in recipe:
+        if key not in expected:
+            diagnostics.append(Diagnostic(name, 'unknown-key', f"Invalid key name: {key}", field=key))
+
+    if 'recipe' in recipe and (not isinstance(name, str) or not name.strip()):
+        diagnostics.append(Diagnostic(name, 'invalid-name', f"Invalid recipe name: {name!r}", field='recipe'))
+
+    for key in ('rating', 'servings'):
+        if key in recipe:
+            try:
+                float(recipe[key])
+            except (TypeError, ValueError):
+                diagnostics.append(Diagnostic(name, 'invalid-number', f"Not a number: {recipe[key]!r}", field=key))
+
+    for key in ('category', 'url'):
+        if key in recipe and not _is_lower(recipe[key]):
+            diagnostics.append(Diagnostic(name, 'invalid-case', f"Invalid Case: {recipe[key]}", field=key))
+
+    spices = recipe.get('spices', [])
+    if not isinstance(spices, list):
+        diagnostics.append(Diagnostic(name, 'invalid-list', f"Spices are not a list: {spices!r}", field='spices'))
+    else:
+        for spice in spices:
+            if not isinstance(spice, str):
+                diagnostics.append(Diagnostic(name, 'invalid-spice', f"Spice is not a string: {spice!r}", field='spices'))
+            elif not _is_lower(spice):
+                diagnostics.append(Diagnostic(name, 'invalid-case', f"Invalid Case: {spice}", field='spices'))
+
+    ingredients = recipe.get('ingredients', [])
+    if not isinstance(ingredients, list):
+        diagnostics.append(Diagnostic(name, 'invalid-list', f"Ingredients are not a list: {ingredients!r}",
+                                      field='ingredients'))
+        ingredients = []
+
+    for ing in ingredients:
+        if not isinstance(ing, dict):
+            diagnostics.append(Diagnostic(name, 'invalid-ingredient', f"Ingredient is not an object: {ing!r}",
+                                          field='ingredients'))
+            continue
+
+        for key, value in ing.items():
+            if not _is_lower(key):
+                diagnostics.append(Diagnostic(name, 'invalid-case', f"Invalid Case: {key}", ingredient=key))
+            if not isinstance(value, dict):
+                diagnostics.append(Diagnostic(name, 'invalid-ingredient', f"Ingredient value is not an object: {value!r}",
+                                              ingredient=key))
+                continue
+
+            # These are the allowable ingredient keys
+            for k in value:
+                if k not in ('amount', 'unit'):
+                    diagnostics.append(Diagnostic(name, 'unknown-key', f"Invalid key name: {k}", field=k, ingredient=key))
+            if value.get('unit') not in UNIT_LIST:
+                diagnostics.append(Diagnostic(name, 'invalid-unit', f"Invalid unit name: {value.get('unit')}",
+                                              field='unit', ingredient=key))
+            if not isinstance(value.get('amount'), (int, float)):
+                diagnostics.append(Diagnostic(name, 'invalid-amount', f"Invalid amount type: {type(value.get('amount'))}",
+                                              field='amount', ingredient=key))
+
+    return diagnostics
+
+
+def _lint_chunk(recipes, fail_fast=False):
+    # (index in the chunk, diagnostics) for each recipe with any, so they
+    # can be merged back in recipe order with the duplicates found outside
+    found = []
+    for index, recipe in enumerate(recipes):
+        diagnostics = lint_recipe(recipe)
+        if diagnostics:
+            found.append((index, diagnostics))
+            if fail_fast:
+                break
+
+    return found
+
+
+def lint_recipes(recipes, workers=None, fail_fast=False, chunk_size=1000):
+    """
+    Lint every recipe and return all of the Diagnostics, in recipe order.
+
+    With workers > 1 the recipes are linted in chunks of chunk_size on a
+    process pool, with at most two chunks per worker in flight so a streamed
+    catalog is never held in memory whole. Duplicate names are checked here,
+    as they span chunks. fail_fast stops at the first recipe with a problem.
+    """
+    seen = set()
+
+    def duplicates(chunk):
+        # By index in the chunk, like _lint_chunk
+        found = {}
+        for index, recipe in enumerate(chunk):
+            if isinstance(recipe, dict) and isinstance(recipe.get('recipe'), str):
+                name = RecipeCatalog.normalize(recipe['recipe'])
+                if name in seen:
+                    found[index] = [Diagnostic(recipe['recipe'], 'duplicate-recipe',
+                                               f"Duplicate recipe name: {recipe['recipe']}", field='recipe')]
+                seen.add(name)
+
+        return found
+
+    def merge(linted, found):
+        # Returns True once fail_fast has what it needs
+        linted = dict(linted)
+        for index in sorted(linted.keys() | found.keys()):
+            diagnostics.extend(linted.get(index, []) + found.get(index, []))
+            if fail_fast:
+                return True
+
+        return False
+
+    def chunks():
+        chunk = []
+        for recipe in recipes:
+            chunk.append(recipe)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    diagnostics = []
+    if not workers or workers <= 1:
+        for recipe in recipes:
+            diagnostics.extend(lint_recipe(recipe) + duplicates((recipe,)).get(0, []))
+            if fail_fast and diagnostics:
+                break
+
+        return diagnostics
+
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = collections.deque()
+        for chunk in chunks():
+            pending.append((pool.submit(_lint_chunk, chunk, fail_fast), duplicates(chunk)))
+            while len(pending) >= workers * 2 or (pending and pending[0][0].done()):
+                future, found = pending.popleft()
+                if merge(future.result(), found):
+                    return diagnostics
+
+        while pending:
+            future, found = pending.popleft()
+            if merge(future.result(), found):
+                return diagnostics
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return diagnostics
+
+
+def lint_file(path, workers=None, fail_fast=False, stream=False, chunk_size=1000):
+    return lint_recipes(iter_recipes(path, stream=stream), workers=workers, fail_fast=fail_fast, chunk_size=chunk_size)
+
+
+def summarize(diagnostics):
+    """Count of diagnostics per rule, most common first"""
+    return dict(collections.Counter(each.rule for each in diagnostics).most_common())
+
+
+class BatchAggregator(object):
+    """
+    Aggregates the ingredients for many selections at once.
+
+    A selection is either a dict of recipe name to serving multiplier or an
+    iterable of recipe names (multiplier 1). With servings=True the dict
+    values are serving sizes instead, scaled against each recipe's servings.
+    Every ingredient row of every selection is flattened into ingredient ID,
+    amount and unit ID columns, grouped on (selection, ingredient, unit
+    dimension) and summed in one go, with numpy when it is installed and a
+    plain loop over the same columns when it is not. Each result matches what
+    prepare_list builds for the same recipes: amounts are in the first unit
+    seen for each ingredient, and convertable and nonconvertable units are
+    kept apart.
+    """
+
+    def __init__(self, catalog, converter=UNITS):
+        self.catalog = catalog
+        self.converter = converter
+        self.convertable = [unit in CONVERTABLE_UNITS for unit in converter.units]
+
+    @staticmethod
+    def multiplier(recipe, value, servings=False):
+        """
+        The multiplier for recipe, value being a serving size with
+        servings=True. Anything but a positive number is a ValueError
+        """
+        if not ShoppingList.check_number(value) or isinstance(value, bool) or not value > 0:
+            kind = 'serving size' if servings else 'multiplier'
+            raise ValueError(f"Invalid {kind} for {recipe.name} -- {value}")
+
+        return recipe.scale(value) if servings else value
+
+    def _plan(self, selections, servings=False):
+        # Flatten into one entry per (selection, recipe), in catalog order so
+        # the first unit seen for an ingredient is the same as prepare_list's
+        entry_selections = array('i')
+        positions = array('i')
+        starts = array('i')
+        stops = array('i')
+        multipliers = array('d')
+        spices = []
+        scales = []
+        for index, selection in enumerate(selections):
+            if isinstance(selection, str):
+                selection = {selection: 1.0}
+            elif not isinstance(selection, dict):
+                selection = dict.fromkeys(selection, 1.0)
+
+            recipes = []
+            for name, multiplier in selection.items():
+                recipe = self.catalog.get(name)
+                if recipe is None:
+                    raise ValueError(f"{name} not found in Recipes list!")
+                multiplier = BatchAggregator.multiplier(recipe, multiplier, servings=servings)
+                recipes.append((recipe.position, recipe, multiplier))
+
+            recipes.sort(key=lambda each: each[0])
+            selection_spices = set()
+            selection_scales = {}
+            for _, recipe, multiplier in recipes:
+                entry_selections.append(index)
+                positions.append(recipe.position)
+                starts.append(recipe.start)
+                stops.append(recipe.stop)
+                multipliers.append(multiplier)
+                selection_spices.update(recipe.spices)
+                selection_scales[recipe.name] = multiplier
+            spices.append(selection_spices)
+            scales.append(selection_scales)
+
+        return entry_selections, positions, starts, stops, multipliers, spices, scales
+
+    @staticmethod
+    def _rows_numpy(starts, stops):
+        # Row indexes into the catalog columns for every entry's slice, with the entry each belongs to
+        starts = np.frombuffer(starts, dtype=np.int32).astype(np.int64)
+        lengths = np.frombuffer(stops, dtype=np.int32) - starts
+        entries = np.repeat(np.arange(len(starts)), lengths)
+        offsets = np.cumsum(lengths) - lengths
+        rows = np.arange(lengths.sum()) - offsets[entries] + starts[entries]
+        return entries, rows
+
+    def _groups_numpy(self, entry_selections, starts, stops, multipliers):
+        catalog = self.catalog
+        converter = self.converter
+        entries, rows = self._rows_numpy(starts, stops)
+        if not len(rows):
+            return []
+
+        ingredients = np.frombuffer(catalog.ingredient_col, dtype=np.int32)[rows].astype(np.int64)
+        units = np.frombuffer(catalog.unit_col, dtype=np.uint8)[rows].astype(np.int64)
+        amounts = np.frombuffer(catalog.amounts)[rows] * np.frombuffer(multipliers)[entries]
+        components = np.frombuffer(converter.components, dtype=np.int32)[units]
+        selections = np.frombuffer(entry_selections, dtype=np.int32)[entries].astype(np.int64)
+
+        component_count = len(converter.canonical)
+        keys = (selections * len(catalog.ingredient_names) + ingredients) * component_count + components
+        keys, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+
+        # Every row is converted straight into its group's first unit, the
+        # same single factor prepare_list would use
+        targets = units[first]
+        factors = np.frombuffer(converter.matrix)[units * converter.size + targets[inverse]]
+        totals = np.bincount(inverse, weights=amounts * factors, minlength=len(keys))
+
+        order = np.argsort(first, kind='stable')
+        return zip(selections[first][order].tolist(), ingredients[first][order].tolist(),
+                   targets[order].tolist(), totals[order].tolist())
+
+    def _groups_python(self, entry_selections, starts, stops, multipliers):
+        catalog = self.catalog
+        converter = self.converter
+        size = converter.size
+        matrix = converter.matrix
+        components = converter.components
+        ingredient_col = catalog.ingredient_col
+        unit_col = catalog.unit_col
+        amounts = catalog.amounts
+        groups = {}
+        for selection, start, stop, multiplier in zip(entry_selections, starts, stops, multipliers):
+            for row in range(start, stop):
+                unit = unit_col[row]
+                ingredient = ingredient_col[row]
+                key = (selection, ingredient, components[unit])
+                group = groups.get(key)
+                if group is None:
+                    groups[key] = [selection, ingredient, unit, amounts[row] * multiplier]
+                else:
+                    group[3] += amounts[row] * multiplier * matrix[unit * size + group[2]]
+
+        return groups.values()
+
+    def aggregate(self, selections, servings=False):
+        """
+        Returns one {'convertable', 'nonconvertable', 'spices', 'scale'} result
+        per selection, where 'scale' is the multiplier used for each recipe
+        """
+        entry_selections, _, starts, stops, multipliers, spices, scales = self._plan(selections, servings=servings)
+        if np is not None:
+            groups = self._groups_numpy(entry_selections, starts, stops, multipliers)
+        else:
+            groups = self._groups_python(entry_selections, starts, stops, multipliers)
+
+        return self._results(groups, spices, scales)
+
+    def _results(self, groups, spices, scales):
+        # groups are (selection, ingredient ID, unit ID, total) in the order each was first seen
+        results = [{'convertable': {}, 'nonconvertable': {}, 'spices': each, 'scale': scale}
+                   for each, scale in zip(spices, scales)]
+        names = self.catalog.ingredient_names
+        units = self.converter.units
+        for selection, ingredient, unit, total in groups:
+            name = names[ingredient]
+            if self.convertable[unit]:
+                results[selection]['convertable'][name] = {'amount': total, 'unit': units[unit]}
+            elif name in results[selection]['nonconvertable']:
+                raise ValueError("Multiple nonconvertable types --> solve how to do please :)")
+            else:
+                results[selection]['nonconvertable'][name] = {'amount': total, 'unit': units[unit]}
+
+        return results
+
+    def _rollup_numpy(self, table, starts, stops, multipliers):
+        catalog = self.catalog
+        converter = self.converter
+        width = len(table.columns)
+        entry_totals = np.zeros((len(starts), width))
+        entries, rows = self._rows_numpy(starts, stops)
+        if not len(rows):
+            return entry_totals.tolist(), []
+
+        ingredients = np.frombuffer(catalog.ingredient_col, dtype=np.int32)[rows].astype(np.int64)
+        units = np.frombuffer(catalog.unit_col, dtype=np.uint8)[rows].astype(np.int64)
+        amounts = np.frombuffer(catalog.amounts)[rows] * np.frombuffer(multipliers)[entries]
+        components = np.frombuffer(converter.components, dtype=np.int32)[units]
+        join = np.frombuffer(table.join(catalog), dtype=np.int32)
+        table_rows = join[ingredients * table.dimensions + components]
+
+        priced = table_rows >= 0
+        if priced.any():
+            table_rows = table_rows[priced]
+            row_units = np.frombuffer(table.row_unit, dtype=np.uint8)[table_rows].astype(np.int64)
+            amounts = amounts[priced] * np.frombuffer(converter.matrix)[units[priced] * converter.size + row_units]
+            values = np.frombuffer(table.values).reshape(-1, width)[table_rows]
+            for column in range(width):
+                entry_totals[:, column] = np.bincount(entries[priced], weights=amounts * values[:, column],
+                                                      minlength=len(starts))
+
+        # One (entry, ingredient ID) for each ingredient with no price
+        keys = np.unique(entries[~priced] * len(catalog.ingredient_names) + ingredients[~priced])
+        missing = zip(*divmod(keys, len(catalog.ingredient_names)))
+        return entry_totals.tolist(), [(int(entry), int(ingredient)) for entry, ingredient in missing]
+
+    def _rollup_python(self, table, starts, stops, multipliers):
+        catalog = self.catalog
+        size = self.converter.size
+        matrix = self.converter.matrix
+        components = self.converter.components
+        ingredient_col = catalog.ingredient_col
+        unit_col = catalog.unit_col
+        amounts = catalog.amounts
+        join = table.join(catalog)
+        dimensions = table.dimensions
+        row_unit = table.row_unit
+        values = table.values
+        width = len(table.columns)
+        entry_totals = []
+        missing = []
+        for entry, (start, stop, multiplier) in enumerate(zip(starts, stops, multipliers)):
+            totals = [0.0] * width
+            for row in range(start, stop):
+                unit = unit_col[row]
+                ingredient = ingredient_col[row]
+                table_row = join[ingredient * dimensions + components[unit]]
+                if table_row == -1:
+                    missing.append((entry, ingredient))
+                    continue
+                amount = amounts[row] * multiplier * matrix[unit * size + row_unit[table_row]]
+                for column in range(width):
+                    totals[column] += amount * values[table_row * width + column]
+            entry_totals.append(totals)
+
+        return entry_totals, missing
+
+    def rollup(self, selections, table, servings=False):
+        """
+        Cost each selection against a CostTable, returns one table.result()
+        per selection, with totals for the whole list and for each recipe.
+        Rows are joined to the table through table.join(catalog) and priced
+        in one go, with numpy when it is installed
+        """
+        entry_selections, positions, starts, stops, multipliers, _, scales = self._plan(selections, servings=servings)
+        if np is not None:
+            entry_totals, missing = self._rollup_numpy(table, starts, stops, multipliers)
+        else:
+            entry_totals, missing = self._rollup_python(table, starts, stops, multipliers)
+
+        width = len(table.columns)
+        totals = [[0.0] * width for _ in scales]
+        recipe_totals = [{} for _ in scales]
+        missing_names = [set() for _ in scales]
+        recipes = self.catalog.recipes
+        for selection, position, entry in zip(entry_selections, positions, entry_totals):
+            # The same recipe named twice in a selection is counted twice, as aggregate does
+            name = recipes[position].name
+            previous = recipe_totals[selection].get(name)
+            recipe_totals[selection][name] = entry if previous is None else [a + b for a, b in zip(previous, entry)]
+            totals[selection] = [a + b for a, b in zip(totals[selection], entry)]
+        names = self.catalog.ingredient_names
+        for entry, ingredient in missing:
+            missing_names[entry_selections[entry]].add(names[ingredient])
+
+        return [table.result(*each) for each in zip(totals, recipe_totals, missing_names)]
+
+
+def _sizeof(value):
+    # Strings are left out, the ones in results are shared with the catalog
+    if isinstance(value, str):
+        return 0
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_sizeof(key) + _sizeof(each) for key, each in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(each) for each in value)
+
+    return size
+
+
+class AggregationCache(object):
+    """
+    LRU memo in front of a BatchAggregator, for selections that are asked
+    for over and over.
+
+    A selection's signature is the catalog version plus the frozenset of
+    (recipe position, multiplier) pairs, so the same menu hits whichever
+    way it was spelled or ordered. Entries are evicted least recently used
+    first once there are more than max_entries or they take more than
+    max_bytes. Everything is dropped when the catalog's version changes.
+
+    A missed selection is built from per-recipe contributions (each
+    recipe's ingredients summed per unit, before scaling), which are cached
+    as well, so a selection that shares recipes with earlier ones only
+    reads the new recipes' columns. A large batch of misses goes straight
+    to the aggregator's vectorized path instead.
+
+    Results are shared between hits, so treat them as read only.
+    """
+
+    def __init__(self, aggregator, max_entries=10000, max_bytes=64 << 20, max_contributions=50000, vectorize=64):
+        self.aggregator = aggregator
+        self.catalog = aggregator.catalog
+        self.converter = aggregator.converter
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_contributions = max_contributions
+        self.vectorize = vectorize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.contribution_hits = 0
+        self.contribution_misses = 0
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.entries = collections.OrderedDict()
+        self.contributions = collections.OrderedDict()
+        self.bytes = 0
+        self.version = self.catalog.version
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.bytes,
+                'evictions': self.evictions,
+                'contributions': len(self.contributions),
+                'contribution_hits': self.contribution_hits,
+                'contribution_misses': self.contribution_misses}
+
+    def signature(self, selection, servings=False):
+        """The selection's cache key, None if it names a recipe twice (that isn't memoized)"""
+        if isinstance(selection, str):
+            selection = {selection: 1.0}
+        elif not isinstance(selection, dict):
+            selection = dict.fromkeys(selection, 1.0)
+
+        entries = []
+        for name, multiplier in selection.items():
+            recipe = self.catalog.get(name)
+            if recipe is None:
+                raise ValueError(f"{name} not found in Recipes list!")
+            entries.append((recipe.position, float(BatchAggregator.multiplier(recipe, multiplier, servings=servings))))
+
+        key = frozenset(entries)
+        if len(key) != len(entries):
+            return None
+        return self.catalog.version, key
+
+    def _contribution(self, position):
+        contribution = self.contributions.get(position)
+        if contribution is not None:
+            self.contributions.move_to_end(position)
+            self.contribution_hits += 1
+            return contribution
+
+        catalog = self.catalog
+        components = self.converter.components
+        groups = {}
+        recipe = catalog.recipes[position]
+        for row in range(recipe.start, recipe.stop):
+            unit = catalog.unit_col[row]
+            subtotals = groups.setdefault((catalog.ingredient_col[row], components[unit]), {})
+            subtotals[unit] = subtotals.get(unit, 0.0) + catalog.amounts[row]
+
+        # (ingredient ID, unit dimension, first unit seen, ((unit, amount), ...))
+        contribution = tuple((ingredient, component, next(iter(subtotals)), tuple(subtotals.items()))
+                             for (ingredient, component), subtotals in groups.items())
+        self.contributions[position] = contribution
+        self.contribution_misses += 1
+        while len(self.contributions) > self.max_contributions:
+            self.contributions.popitem(last=False)
+        return contribution
+
+    def _combine(self, key):
+        # Catalog order, so the first unit seen for an ingredient matches the aggregator's
+        size = self.converter.size
+        matrix = self.converter.matrix
+        groups = {}
+        spices = set()
+        scale = {}
+        for position, multiplier in sorted(key):
+            for ingredient, component, first, subtotals in self._contribution(position):
+                group = groups.get((ingredient, component))
+                if group is None:
+                    group = groups[(ingredient, component)] = (first, [])
+                target = group[0]
+                group[1].extend(amount * multiplier * matrix[unit * size + target] for unit, amount in subtotals)
+            recipe = self.catalog.recipes[position]
+            spices.update(recipe.spices)
+            scale[recipe.name] = multiplier
+
+        return [(ingredient, target, math.fsum(parts)) for (ingredient, _), (target, parts) in groups.items()], spices, scale
+
+    def _store(self, key, result):
+        size = _sizeof(result)
+        if size > self.max_bytes:
+            return
+
+        self.entries[key] = (result, size)
+        self.bytes += size
+        while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+            _, (_, evicted) = self.entries.popitem(last=False)
+            self.bytes -= evicted
+            self.evictions += 1
+
+    def aggregate(self, selections, servings=False):
+        """Same results as BatchAggregator.aggregate, from the memo where possible"""
+        selections = list(selections)
+        results = [None] * len(selections)
+        misses = {}
+        uncached = []
+        with self._lock:
+            if self.version != self.catalog.version:
+                self.clear()
+            for index, selection in enumerate(selections):
+                key = self.signature(selection, servings=servings)
+                entry = None if key is None else self.entries.get(key)
+                if key is None:
+                    uncached.append(index)
+                elif entry is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    results[index] = entry[0]
+                elif key in misses:
+                    self.hits += 1
+                    misses[key].append(index)
+                else:
+                    self.misses += 1
+                    misses[key] = [index]
+
+            keys = list(misses)
+            vectorized = np is not None and len(keys) >= self.vectorize
+            computed = []
+            if keys and not vectorized:
+                groups = []
+                spices = []
+                scales = []
+                for index, key in enumerate(keys):
+                    key_groups, key_spices, key_scale = self._combine(key[1])
+                    groups.extend((index, ingredient, unit, total) for ingredient, unit, total in key_groups)
+                    spices.append(key_spices)
+                    scales.append(key_scale)
+                computed = self.aggregator._results(groups, spices, scales)
+
+        if vectorized:
+            recipes = self.catalog.recipes
+            computed = self.aggregator.aggregate([{recipes[position].name: multiplier for position, multiplier in key[1]}
+                                                  for key in keys])
+        if uncached:
+            for index, result in zip(uncached, self.aggregator.aggregate([selections[i] for i in uncached],
+                                                                         servings=servings)):
+                results[index] = result
+
+        with self._lock:
+            for key, result in zip(keys, computed):
+                if key[0] == self.version:
+                    self._store(key, result)
+                for index in misses[key]:
+                    results[index] = result
+
+        return results
+
+
+def _aggregation_cache(catalog):
+    return AggregationCache(BatchAggregator(catalog))
+
+
+class CostTable(object):
+    """
+    Prices and nutrients per ingredient, per unit.
+
+    Each row holds the values (price, calories, ...) of one unit of one
+    ingredient. Ingredient names are interned to IDs like the catalog's,
+    and rows are found through a flat array over (ingredient ID, unit
+    dimension), so an ingredient is priced in any unit it can be converted
+    to. For an ingredient with several rows in one unit dimension the first
+    one is used.
+
+    join(catalog) maps the catalog's own ingredient IDs to rows in the same
+    way. It is built once per catalog version and lets a batch of selections
+    be costed straight from the catalog's columns.
+    """
+
+    def __init__(self, columns, rows=(), converter=UNITS):
+        self.columns = tuple(columns)
+        self.converter = converter
+        self.dimensions = len(converter.canonical)
+        self.ingredient_names = []
+        self.ingredient_ids = {}
+        self.row_index = array('i')
+        self.row_unit = array('B')
+        self.values = array('d')
+        self._joins = collections.OrderedDict()
+        self._lock = threading.Lock()
+        for ingredient, unit, values in rows:
+            self.add(ingredient, unit, values)
+
+    def __len__(self):
+        return len(self.row_unit)
+
+    def add(self, ingredient, unit, values):
+        """values is one number per column, for one unit of the ingredient"""
+        ingredient = RecipeCatalog.normalize(ingredient)
+        unit_id = self.converter.unit_id(unit)
+        if unit_id is None:
+            raise Exception(f"Invalid unit supplied for {ingredient} -- {unit}")
+        values = [float(value) for value in values]
+        if len(values) != len(self.columns):
+            raise Exception(f"Expected {len(self.columns)} values for {ingredient} -- got {len(values)}")
+
+        ingredient_id = self.ingredient_ids.get(ingredient)
+        if ingredient_id is None:
+            ingredient_id = self.ingredient_ids[ingredient] = len(self.ingredient_names)
+            self.ingredient_names.append(ingredient)
+            self.row_index.extend([-1] * self.dimensions)
+
+        slot = ingredient_id * self.dimensions + self.converter.components[unit_id]
+        if self.row_index[slot] == -1:
+            self.row_index[slot] = len(self.row_unit)
+            self.row_unit.append(unit_id)
+            self.values.extend(values)
+            self._joins.clear()
+
+    @staticmethod
+    def load(path):
+        """
+        Bulk load a CSV table with an ingredient and a unit column, every
+        other column is a value column. Empty values count as 0
+        """
+        with open(path, 'r', newline='') as infile:
+            reader = csv.reader(infile)
+            header = next(reader, None)
+            if header is None or header[:2] != ['ingredient', 'unit']:
+                raise Exception(f"{path} should start with an ingredient,unit,... header")
+
+            table = CostTable(header[2:])
+            for line, row in enumerate(reader, 2):
+                if not row:
+                    continue
+                try:
+                    table.add(row[0], row[1], [value or 0 for value in row[2:]])
+                except (ValueError, IndexError):
+                    raise Exception(f"{path}:{line} -- invalid row {row}")
+
+        return table
+
+    def row(self, ingredient, unit):
+        """Table row that prices ingredient in unit, None if there isn't one"""
+        ingredient_id = self.ingredient_ids.get(RecipeCatalog.normalize(ingredient))
+        unit_id = self.converter.unit_id(unit)
+        if ingredient_id is None or unit_id is None:
+            return None
+
+        row = self.row_index[ingredient_id * self.dimensions + self.converter.components[unit_id]]
+        return None if row == -1 else row
+
+    def join(self, catalog):
+        """Table row for every (catalog ingredient ID, unit dimension), -1 where there's no price"""
+        with self._lock:
+            join = self._joins.get(catalog.version)
+            if join is not None:
+                return join
+
+            join = array('i')
+            empty = [-1] * self.dimensions
+            for name in catalog.ingredient_names:
+                ingredient_id = self.ingredient_ids.get(name)
+                if ingredient_id is None:
+                    join.extend(empty)
+                else:
+                    start = ingredient_id * self.dimensions
+                    join.extend(self.row_index[start:start + self.dimensions])
+
+            # A few catalogs at once, the shards of a sharded catalog
+            self._joins[catalog.version] = join
+            while len(self._joins) > 16:
+                self._joins.popitem(last=False)
+
+        return join
+
+    def _add_row(self, totals, row, unit_id, amount):
+        width = len(self.columns)
+        amount *= self.converter.matrix[unit_id * self.converter.size + self.row_unit[row]]
+        for column in range(width):
+            totals[column] += amount * self.values[row * width + column]
+
+    def totals(self, items):
+        """Totals for items of (ingredient, amount, unit), and the set of ingredients that had no price"""
+        totals = [0.0] * len(self.columns)
+        missing = set()
+        for ingredient, amount, unit in items:
+            row = self.row(ingredient, unit)
+            if row is None:
+                missing.add(ingredient)
+            else:
+                self._add_row(totals, row, self.converter.unit_ids[unit], amount)
+
+        return totals, missing
+
+    def recipe_totals(self, recipe, scale=1.0):
+        """totals() of a recipe's ingredients, read straight from its catalog's columns"""
+        catalog = recipe.catalog
+        join = self.join(catalog)
+        components = self.converter.components
+        totals = [0.0] * len(self.columns)
+        missing = set()
+        for position in range(recipe.start, recipe.stop):
+            ingredient = catalog.ingredient_col[position]
+            unit = catalog.unit_col[position]
+            row = join[ingredient * self.dimensions + components[unit]]
+            if row == -1:
+                missing.add(catalog.ingredient_names[ingredient])
+            else:
+                self._add_row(totals, row, unit, catalog.amounts[position] * scale)
+
+        return totals, missing
+
+    def result(self, totals, recipes, missing):
+        """{'totals': {column: value}, 'recipes': {name: {column: value}}, 'missing': [ingredient, ...]}"""
+        return {'totals': dict(zip(self.columns, totals)),
+                'recipes': {name: dict(zip(self.columns, each)) for name, each in recipes.items()},
+                'missing': sorted(missing)}
+
+
+class IncrementalAggregator(object):
+    """
+    Running shopping list totals, kept up to date one contribution at a time.
+
+    Each selected recipe is tracked with the scale it was added at, so
+    adding, removing or rescaling it only touches that recipe's own
+    ingredients. Manually added items are tracked as contributions too, one
+    per ingredient and unit however many times it is added. Totals are kept
+    per ingredient and unit dimension as the amount each contribution put in
+    for each unit, summed with math.fsum when read, so removing a
+    contribution leaves no rounding behind. Amounts are reported in the
+    first unit still contributing, the same rule prepare_list has always
+    used.
+
+    lists() only recomputes the ingredients changed since it was last
+    called, and hands back the same two dicts each time, so treat them as
+    read only.
+    """
+
+    def __init__(self, catalog, converter=UNITS):
+        self.catalog = catalog
+        self.converter = converter
+        self.convertable = [unit in CONVERTABLE_UNITS for unit in converter.units]
+        self.version = 0
+        self.clear()
+
+    def clear(self):
+        # version keeps counting up, so anything cached against it goes stale
+        self.contributions = {}
+        self.items = {}
+        self.totals = {}
+        self.components = {}
+        self.nonconvertable_units = {}
+        self.spices = collections.Counter()
+        self.convertable_list = {}
+        self.nonconvertable_list = {}
+        self.conversions = 0
+        self._dirty = set()
+        self.version += 1
+
+    def _rows(self, recipe, scale):
+        # The recipe's own catalog, which is one shard of a sharded catalog
+        catalog = recipe.catalog
+        names = catalog.ingredient_names
+        for row in range(recipe.start, recipe.stop):
+            yield names[catalog.ingredient_col[row]], catalog.unit_col[row], catalog.amounts[row] * scale
+
+    def _check(self, rows):
+        # Same rule as prepare_list, an ingredient can only have one
+        # nonconvertable unit. Checked up front so a failed add changes nothing
+        units = {}
+        for name, unit, _ in rows:
+            if not self.convertable[unit]:
+                existing = units.setdefault(name, self.nonconvertable_units.get(name, unit))
+                if existing != unit:
+                    raise ValueError("Multiple nonconvertable types --> solve how to do please :)")
+
+    def _apply(self, source, rows, sign):
+        components = self.converter.components
+        for name, unit, amount in rows:
+            component = components[unit]
+            key = (name, component)
+            subtotals = self.totals.get(key)
+            if sign > 0:
+                if subtotals is None:
+                    subtotals = self.totals[key] = {}
+                    self.components.setdefault(name, {})[component] = None
+                    if not self.convertable[unit]:
+                        self.nonconvertable_units[name] = unit
+                amounts = subtotals.setdefault(unit, {})
+                amounts[source] = amounts.get(source, 0) + amount
+            else:
+                # A recipe listing an ingredient twice in one unit has both
+                # rows under one source, gone with the first of them
+                amounts = None if subtotals is None else subtotals.get(unit)
+                if amounts is None or amounts.pop(source, None) is None:
+                    continue
+                if not amounts:
+                    del subtotals[unit]
+                    if not subtotals:
+                        del self.totals[key]
+                        del self.components[name][component]
+                        if not self.components[name]:
+                            del self.components[name]
+                        if not self.convertable[unit]:
+                            del self.nonconvertable_units[name]
+            self._dirty.add(name)
+
+        self.version += 1
+
+    def add(self, name, scale=1.0):
+        """Add a recipe at the given scale, or rescale it if it is already added"""
+        recipe = self.catalog.get(name)
+        if recipe is None:
+            raise ValueError(f"{name} not found in Recipes list!")
+
+        name = RecipeCatalog.normalize(name)
+        previous = self.contributions.get(name)
+        if previous is not None:
+            if previous[1] == scale:
+                return
+            self.remove(name)
+
+        rows = list(self._rows(recipe, scale))
+        try:
+            self._check(rows)
+        except Exception:
+            if previous is not None:
+                self.add(name, previous[1])
+            raise
+
+        self._apply(name, rows, 1)
+        self.spices.update(recipe.spices)
+        self.contributions[name] = (recipe, scale)
+
+    def remove(self, name):
+        name = RecipeCatalog.normalize(name)
+        recipe, scale = self.contributions[name]
+        self._apply(name, self._rows(recipe, scale), -1)
+        del self.contributions[name]
+        for spice in recipe.spices:
+            self.spices[spice] -= 1
+            if not self.spices[spice]:
+                del self.spices[spice]
+
+    def add_item(self, name, amount, unit):
+        unit = self.converter.unit_ids[unit]
+        rows = [(name, unit, amount)]
+        self._check(rows)
+        self._apply(('item', name, unit), rows, 1)
+        self.items[name, unit] = self.items.get((name, unit), 0) + amount
+
+    def scale_factors(self):
+        return {recipe.name: scale for recipe, scale in self.contributions.values()}
+
+    def lists(self):
+        """Current totals as (convertable_list, nonconvertable_list)"""
+        units = self.converter.units
+        size = self.converter.size
+        matrix = self.converter.matrix
+        convertable_list = self.convertable_list
+        nonconvertable_list = self.nonconvertable_list
+        # Only what was converted this time is counted
+        self.conversions = 0
+        for name in self._dirty:
+            convertable_list.pop(name, None)
+            nonconvertable_list.pop(name, None)
+            for component in self.components.get(name, ()):
+                subtotals = self.totals[name, component]
+                target = next(iter(subtotals))
+                amount = math.fsum(subtotal if unit == target else subtotal * matrix[unit * size + target]
+                                   for unit, amounts in subtotals.items() for subtotal in amounts.values())
+                entry = {'amount': amount, 'unit': units[target]}
+                if self.convertable[target]:
+                    convertable_list[name] = entry
+                else:
+                    nonconvertable_list[name] = entry
+                self.conversions += len(subtotals) - 1
+        self._dirty.clear()
+
+        return convertable_list, nonconvertable_list
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it is known to be over limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if len(a) > len(b):
+        a, b = b, a
+
+    previous = list(range(len(a) + 1))
+    for j, char_b in enumerate(b, 1):
+        current = [j]
+        for i, char_a in enumerate(a, 1):
+            current.append(min(previous[i] + 1, current[i - 1] + 1, previous[i - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+
+    return previous[-1]
+
+
+class _RangeMin(object):
+    """
+    Segment tree over an array of values, for the position of the smallest
+    value in any range of it. smallest() walks a range in increasing order
+    of value with one O(log n) lookup per position, so the best few of a
+    large range are found without reading the rest of it.
+    """
+
+    def __init__(self, values):
+        self.values = values
+        size = 1
+        while size < len(values):
+            size <<= 1
+        self.size = size
+        self.tree = tree = array('i', [-1]) * (2 * size)
+        tree[size:size + len(values)] = array('i', range(len(values)))
+        for node in range(size - 1, 0, -1):
+            # Padding is only ever on the right, so a missing left means both are
+            left, right = tree[2 * node], tree[2 * node + 1]
+            tree[node] = left if right == -1 or values[left] <= values[right] else right
+
+    def argmin(self, lo, hi):
+        values = self.values
+        tree = self.tree
+        best = -1
+        lo += self.size
+        hi += self.size
+        while lo < hi:
+            if lo & 1:
+                node = tree[lo]
+                if best == -1 or values[node] < values[best]:
+                    best = node
+                lo += 1
+            if hi & 1:
+                hi -= 1
+                node = tree[hi]
+                if best == -1 or values[node] < values[best]:
+                    best = node
+            lo >>= 1
+            hi >>= 1
+
+        return best
+
+    def smallest(self, lo, hi):
+        """Yield (value, position) for every position in [lo, hi), smallest value first"""
+        heap = []
+        if lo < hi:
+            position = self.argmin(lo, hi)
+            heap.append((self.values[position], position, lo, hi))
+        while heap:
+            value, position, lo, hi = heapq.heappop(heap)
+            yield value, position
+            for start, stop in ((lo, position), (position + 1, hi)):
+                if start < stop:
+                    best = self.argmin(start, stop)
+                    heapq.heappush(heap, (self.values[best], best, start, stop))
+
+
+class SearchIndex(object):
+    """
+    Completion and typo tolerant search over recipe and ingredient names.
+
+    Prefix completion uses a sorted array (per kind) of every name and every
+    suffix of a name that starts at a word, so 'chick' completes to 'honey
+    garlic chicken' as well as 'chicken breast', with a bisect per lookup (a
+    sorted array does the job of a trie here with a fraction of the memory).
+    The keys matching a prefix are a range of that array, and a _RangeMin
+    over it hands them out best first, so a common prefix costs about as
+    much as a rare one.
+
+    Typos are matched per word through a trigram index over the word
+    vocabulary, with candidates checked by a bounded edit distance: none for
+    words under 3 letters and for numbers, one under 6 letters and two
+    otherwise. Each word's entries are kept in ranking order, so typo
+    matches are also read best first and only until there are enough.
+
+    Within a rank, shorter names come first and then names in order.
+    """
+    KINDS = ('recipe', 'ingredient')
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.entries = []
+        keys = {kind: [] for kind in SearchIndex.KINDS}
+        words = {}
+        for recipe in catalog:
+            self._add_entry(recipe.name, 'recipe', keys, words)
+        for ingredient, recipes in zip(catalog.ingredient_names, catalog.ingredient_recipes):
+            # A reloaded catalog can keep names no recipe uses any more
+            if recipes:
+                self._add_entry(ingredient, 'ingredient', keys, words)
+
+        # Every entry's place in the tie break order, and the entry at each place
+        self.by_order = array('i', sorted(range(len(self.entries)),
+                                          key=lambda entry: (len(self.entries[entry][0]), self.entries[entry][0])))
+        self.order = array('i', [0]) * len(self.entries)
+        for order, entry in enumerate(self.by_order):
+            self.order[entry] = order
+
+        # A key's value is its rank (1 for a whole name, 2 for a later
+        # suffix) then the entry's order, which is how they are ranked
+        span = self.span = len(self.entries)
+        self.keys = {}
+        for kind, kind_keys in keys.items():
+            kind_keys.sort()
+            values = array('q', [(rank - 1) * span + self.order[entry] for _, rank, entry in kind_keys])
+            self.keys[kind] = ([key for key, _, _ in kind_keys],
+                               array('i', [entry for _, _, entry in kind_keys]),
+                               _RangeMin(values))
+
+        # Each word's entries by kind, as sorted orders
+        self.words = list(words)
+        self.word_orders = {kind: [] for kind in SearchIndex.KINDS}
+        for entries in words.values():
+            for kind, postings in self.word_orders.items():
+                postings.append(array('i', sorted(self.order[entry] for entry in entries
+                                                  if self.entries[entry][1] == kind)))
+        self.word_ids = {word: i for i, word in enumerate(self.words)}
+        self.grams = {}
+        for word_id, word in enumerate(self.words):
+            for gram in SearchIndex.trigrams(word):
+                self.grams.setdefault(gram, array('i')).append(word_id)
+
+    def _add_entry(self, name, kind, keys, words):
+        entry = len(self.entries)
+        self.entries.append((name, kind))
+        tokens = SearchIndex.tokenize(name)
+        for i in range(len(tokens)):
+            keys[kind].append((' '.join(tokens[i:]), 1 if i == 0 else 2, entry))
+        for token in set(tokens):
+            words.setdefault(token, []).append(entry)
+
+    @staticmethod
+    def tokenize(text):
+        return re.findall(r'[a-z0-9]+', text.lower())
+
+    @staticmethod
+    def trigrams(word):
+        padded = f"^^{word}$$"
+        return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+    @staticmethod
+    def max_distance(word):
+        # Words under 3 letters have to match exactly, so 'ox' doesn't match
+        # half the catalog, and so do numbers, a typo in one is another number.
+        # One typo under 6 letters, two after that
+        if len(word) < 3 or word.isdigit():
+            return 0
+        return 1 if len(word) < 6 else 2
+
+    def _complete(self, prefix, limit, kinds=None):
+        # Exact names rank 0, names starting with prefix 1 and names with a
+        # later word starting with it 2, as {entry: rank} with at most limit
+        # entries, the best ones
+        found = {}
+        if not prefix:
+            return found
+
+        walks = []
+        for kind in SearchIndex.KINDS:
+            if kinds is not None and kind not in kinds:
+                continue
+            keys, key_entries, ranges = self.keys[kind]
+            lo = bisect.bisect_left(keys, prefix)
+            hi = bisect.bisect_left(keys, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+            i = lo
+            while i < hi and keys[i] == prefix:
+                if ranges.values[i] < self.span:
+                    found.setdefault(key_entries[i], 0)
+                i += 1
+            walks.append(self._walk(kind, lo, hi))
+
+        for value, entry in heapq.merge(*walks):
+            if len(found) >= limit:
+                break
+            if entry not in found:
+                found[entry] = value // self.span + 1
+
+        return found
+
+    def _walk(self, kind, lo, hi):
+        _, key_entries, ranges = self.keys[kind]
+        for value, position in ranges.smallest(lo, hi):
+            yield value, key_entries[position]
+
+    def complete(self, prefix, limit=10, kinds=None):
+        """Names with a word starting with prefix, best first"""
+        return self._ranked(self._complete(' '.join(SearchIndex.tokenize(prefix)), limit, kinds=kinds), limit)
+
+    def _fuzzy_word(self, word):
+        """Vocabulary words within the bounded edit distance of word, as {word_id: distance}"""
+        limit = SearchIndex.max_distance(word)
+        exact = self.word_ids.get(word)
+        if limit == 0:
+            return {} if exact is None else {exact: 0}
+
+        grams = SearchIndex.trigrams(word)
+        counts = collections.Counter()
+        for gram in grams:
+            counts.update(self.grams.get(gram, ()))
+
+        # Each edit can break at most three trigrams
+        threshold = len(grams) - 3 * limit
+        matches = {}
+        for word_id, common in counts.items():
+            if common >= threshold:
+                distance = edit_distance(word, self.words[word_id], limit)
+                if distance <= limit:
+                    matches[word_id] = distance
+
+        return matches
+
+    def _intersect(self, word_ids, kind, walk=128):
+        # (order, entry) for every entry of kind with all of the words, best
+        # first. The start of the shortest posting is walked, bisecting into
+        # the others, which is enough when the words often go together. Past
+        # walk entries the rest is intersected in one go instead, with numpy
+        # when it is installed
+        postings = sorted((self.word_orders[kind][word_id] for word_id in word_ids), key=len)
+        rest = postings[1:]
+        for order in postings[0][:walk]:
+            for posting in rest:
+                i = bisect.bisect_left(posting, order)
+                if i == len(posting) or posting[i] != order:
+                    break
+            else:
+                yield order, self.by_order[order]
+
+        if len(postings[0]) <= walk:
+            return
+        if np is not None:
+            common = np.frombuffer(postings[0], dtype=np.int32)[walk:]
+            for posting in rest:
+                common = np.intersect1d(common, np.frombuffer(posting, dtype=np.int32), assume_unique=True)
+            common = common.tolist()
+        else:
+            common = set(postings[0][walk:])
+            for posting in rest:
+                common.intersection_update(posting)
+            common = sorted(common)
+        for order in common:
+            yield order, self.by_order[order]
+
+    def _fuzzy(self, tokens, limit, kinds, found):
+        # Typo matches rank 3 plus the total edit distance. Every way of
+        # picking one close word per token is tried, lowest total first, and
+        # the entries for one total are merged best first until found is full
+        choices = []
+        for token in tokens:
+            matches = self._fuzzy_word(token)
+            if not matches:
+                return found
+            choices.append(sorted(matches.items(), key=lambda each: each[1]))
+
+        for total in range(sum(each[-1][1] for each in choices) + 1):
+            walks = [self._intersect([word_id for word_id, _ in combination], kind)
+                     for combination in itertools.product(*choices)
+                     if sum(distance for _, distance in combination) == total
+                     for kind in SearchIndex.KINDS if kinds is None or kind in kinds]
+            for _, entry in heapq.merge(*walks):
+                if len(found) >= limit:
+                    return found
+                found.setdefault(entry, total + 3)
+
+        return found
+
+    def search(self, query, limit=10, kinds=None):
+        """
+        Ranked matches for query: exact names, then prefix completions, then
+        names where every word of the query matches a word within the typo
+        limit. Returns a list of {'name', 'kind', 'rank'} dicts, where rank
+        is 0-2 for exact and prefix matches and 3 plus the edit distance for
+        typo matches.
+        """
+        tokens = SearchIndex.tokenize(query)
+        found = self._complete(' '.join(tokens), limit, kinds=kinds)
+        if tokens and len(found) < limit:
+            self._fuzzy(tokens, limit, kinds, found)
+
+        return self._ranked(found, limit)
+
+    def _ranked(self, found, limit):
+        order = sorted(found, key=lambda entry: (found[entry], self.order[entry]))
+        return [{'name': self.entries[entry][0], 'kind': self.entries[entry][1], 'rank': found[entry]}
+                for entry in order[:limit]]
+
+
+class PantryIndex(object):
+    """
+    Answers "what can I cook" for a pantry of ingredients on hand.
+
+    Candidates come from the catalog's inverted ingredient index: counting
+    the pantry's posting lists gives how many of each recipe's ingredients
+    are on hand without looking at any recipe that shares none. Category
+    and required ingredient filters are recipe bitsets (plain ints) that
+    are intersected before any recipe is looked at, and only the recipes
+    left are checked amount by amount, after unit conversion.
+
+    The index never changes after it is built, so it can be shared by any
+    number of concurrent queries.
+    """
+
+    def __init__(self, catalog, converter=UNITS):
+        self.catalog = catalog
+        self.converter = converter
+        self.distinct = array('H', (len(set(catalog.ingredient_col[recipe.start:recipe.stop])) for recipe in catalog))
+        # Recipes by number of distinct ingredients, as a recipe with few
+        # enough can qualify without anything on hand
+        self.by_size = sorted(range(len(catalog)), key=self.distinct.__getitem__)
+        self.sizes = [self.distinct[position] for position in self.by_size]
+        self.category_bits = {category: self._bits(positions) for category, positions in catalog.categories.items()}
+        self.ingredient_bits = functools.lru_cache(maxsize=4096)(self._ingredient_bits)
+
+    def _bits(self, positions):
+        bits = bytearray((len(self.catalog) + 7) // 8)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+
+        return int.from_bytes(bits, 'little')
+
+    def _ingredient_bits(self, ingredient_id):
+        return self._bits(self.catalog.ingredient_recipes[ingredient_id])
+
+    def _filter(self, candidates, mask):
+        # The mask is turned into bytes once, in C, and each candidate costs
+        # one byte lookup, so the bitset is never walked bit by bit
+        data = mask.to_bytes((len(self.catalog) + 7) // 8, 'little')
+        return {position for position in candidates if data[position >> 3] >> (position & 7) & 1}
+
+    def _pantry(self, pantry):
+        # {name: '2 lbs'}, {name: {'amount': 2, 'unit': 'lbs'}} or {name: (2, 'lbs')}
+        parsed = {}
+        for name, value in pantry.items():
+            if isinstance(value, str):
+                amount, unit = value.split(' ', 1)
+                amount = float(amount)
+            elif isinstance(value, dict):
+                amount, unit = value['amount'], value['unit']
+            else:
+                amount, unit = value
+            if unit not in self.converter.unit_ids:
+                raise Exception(f"Invalid unit supplied for {name} -- {amount} {unit}")
+
+            ingredient_id = self.catalog.ingredient_ids.get(ShoppingList.lint_case(name.strip(), case_type='lower'))
+            if ingredient_id is not None:
+                parsed.setdefault(ingredient_id, []).append((amount, self.converter.unit_ids[unit]))
+
+        return parsed
+
+    def query(self, pantry, max_missing=2, limit=20, servings=None, category=None, require=()):
+        """
+        Recipes that can be made from pantry with at most max_missing
+        ingredients short, ranked by how much is missing. An ingredient
+        counts as short by the fraction of the recipe's amount that isn't on
+        hand, and as wholly missing if it isn't in the pantry in a unit that
+        converts. Returns a list of {'recipe', 'missing', 'shortfall',
+        'have', 'total'} dicts, best first.
+        """
+        catalog = self.catalog
+        pantry = self._pantry(pantry)
+
+        counts = collections.Counter()
+        for ingredient_id in pantry:
+            counts.update(catalog.ingredient_recipes[ingredient_id])
+
+        candidates = {position for position, have in counts.items() if self.distinct[position] - have <= max_missing}
+        candidates.update(self.by_size[:bisect.bisect_right(self.sizes, max_missing)])
+
+        mask = None
+        if category is not None:
+            mask = self.category_bits.get(category, 0)
+        for name in require:
+            # Named the same way as the pantry
+            ingredient_id = catalog.ingredient_ids.get(ShoppingList.lint_case(name.strip(), case_type='lower'))
+            bits = 0 if ingredient_id is None else self.ingredient_bits(ingredient_id)
+            mask = bits if mask is None else mask & bits
+        if mask is not None:
+            candidates = self._filter(candidates, mask)
+
+        results = []
+        for position in candidates:
+            result = self._check(catalog.recipes[position], pantry, servings)
+            if len(result['missing']) <= max_missing:
+                results.append(((result['shortfall'], len(result['missing']), -catalog.recipes[position].rating, position),
+                                result))
+
+        results.sort(key=lambda each: each[0])
+        return [result for _, result in results[:limit]]
+
+    def _check(self, recipe, pantry, servings):
+        catalog = self.catalog
+        units = self.converter.units
+        scale = recipe.scale(servings)
+        remaining = {}
+        missing = []
+        shortfall = 0.0
+        for row in range(recipe.start, recipe.stop):
+            ingredient_id = catalog.ingredient_col[row]
+            unit = catalog.unit_col[row]
+            need = catalog.amounts[row] * scale
+            # Use up what's on hand in any unit that converts to the recipe's
+            short = need
+            stock = remaining.setdefault(ingredient_id, [list(each) for each in pantry.get(ingredient_id, ())])
+            for each in stock:
+                factor = self.converter.factor_by_id(each[1], unit)
+                if factor is None or short <= 0:
+                    continue
+                used = min(short, each[0] * factor)
+                short -= used
+                each[0] -= used / factor
+
+            if short > 1e-9:
+                missing.append({'ingredient': catalog.ingredient_names[ingredient_id],
+                                'amount': short, 'unit': units[unit]})
+                shortfall += short / need if need else 1.0
+
+        return {'recipe': recipe.name,
+                'missing': missing,
+                'shortfall': shortfall,
+                'have': len(recipe) - len(missing),
+                'total': len(recipe)}
+
+
+class Metrics(object):
+    """
+    Timers and counters for the hot paths, sent to any number of sinks.
+
+    A sink is any callable that takes one event dict, {'kind', 'name',
+    'value'} plus any tags, where kind is 'timer' (value in seconds) or
+    'counter'. A plain function works as a callback sink. With no sinks a
+    Metrics is falsy and every call returns straight away, so instrumented
+    code costs a method call and nothing more when it is switched off.
+    """
+
+    def __init__(self, *sinks):
+        self.sinks = list(sinks)
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def emit(self, kind, name, value, tags):
+        event = {'kind': kind, 'name': name, 'value': value}
+        event.update(tags)
+        for sink in self.sinks:
+            sink(event)
+
+    def count(self, name, value=1, **tags):
+        if self.sinks:
+            self.emit('counter', name, value, tags)
+
+    def timer(self, name, **tags):
+        if not self.sinks:
+            return _NO_TIMER
+        return _Timer(self, name, tags)
+
+    def record(self, name, seconds, **tags):
+        """A timer the caller measured itself, e.g. summed over a loop too tight to time each pass of"""
+        if self.sinks:
+            self.emit('timer', name, seconds, tags)
+
+
+class _Timer(object):
+    __slots__ = ('metrics', 'name', 'tags', 'start')
+
+    def __init__(self, metrics, name, tags):
+        self.metrics = metrics
+        self.name = name
+        self.tags = tags
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.emit('timer', self.name, time.perf_counter() - self.start, self.tags)
+        return False
+
+
+_NO_TIMER = contextlib.nullcontext()
+
+
+class MetricsRegistry(object):
+    """
+    In-memory sink, keeps the calls, total and slowest time of every timer
+    and the total of every counter. Each name and set of tags is kept
+    apart, as 'name{tag=value,...}' with the tags sorted, so for instance
+    the hits of each cache are counted separately.
+    """
+
+    def __init__(self):
+        self.timers = {}
+        self.counters = collections.Counter()
+
+    @staticmethod
+    def key(event):
+        tags = sorted((tag, value) for tag, value in event.items() if tag not in ('kind', 'name', 'value'))
+        if not tags:
+            return event['name']
+        return f"{event['name']}{{{','.join(f'{tag}={value}' for tag, value in tags)}}}"
+
+    def __call__(self, event):
+        key = MetricsRegistry.key(event)
+        if event['kind'] == 'timer':
+            timer = self.timers.get(key)
+            if timer is None:
+                timer = self.timers[key] = {'calls': 0, 'seconds': 0.0, 'max': 0.0}
+            timer['calls'] += 1
+            timer['seconds'] += event['value']
+            timer['max'] = max(timer['max'], event['value'])
+        else:
+            self.counters[key] += event['value']
+
+    def report(self):
+        return {'timers': {name: dict(timer) for name, timer in self.timers.items()},
+                'counters': dict(self.counters)}
+
+    def print_report(self):
+        for name, timer in sorted(self.timers.items(), key=lambda each: -each[1]['seconds']):
+            print(f"{name:<32} {timer['calls']:>8} calls {timer['seconds']:10.4f} s total {timer['max']:10.4f} s max")
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:<32} {ShoppingList.format_amount(value):>8}")
+
+
+class JsonLinesSink(object):
+    """Appends every event to a JSON Lines file, stamped with the wall clock time"""
+
+    def __init__(self, path):
+        self.file = open(path, 'a')
+
+    def __call__(self, event):
+        self.file.write(json.dumps(dict(event, time=time.time())) + '\n')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+class Renderer(object):
+    """
+    Turns shopping lists, recipes and lint diagnostics into text, JSON, CSV
+    or Markdown.
+
+    Everything is first built as structured data (plain lists and dicts),
+    then serialized into one string, so writing it out is a single write
+    call however many lines it has.
+    """
+
+    FORMATS = ('text', 'json', 'csv', 'markdown')
+
+    @staticmethod
+    def _check_format(format):
+        if format not in Renderer.FORMATS:
+            raise Exception(f"Supplied format -- {format} -- not in {list(Renderer.FORMATS)}")
+
+    @staticmethod
+    def _csv(header, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(header)
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _markdown(header, rows):
+        def cells(row):
+            return '| ' + ' | '.join(str(cell).replace('|', '\\|') for cell in row) + ' |\n'
+
+        return cells(header) + '|' + '---|' * len(header) + '\n' + ''.join(cells(row) for row in rows)
+
+    @staticmethod
+    def shopping_data(shopping_list, spices):
+        """A merged shopping list as {'items': [{'name', 'amount', 'unit'}], 'spices': [...]}"""
+        return {'items': [{'name': name, 'amount': ShoppingList.format_amount(value['amount']), 'unit': value['unit']}
+                          for name, value in shopping_list.items()],
+                'spices': sorted(spices)}
+
+    @staticmethod
+    def aggregate_data(result):
+        """One BatchAggregator result in the shopping_data shape, plus its 'scale'"""
+        data = Renderer.shopping_data(ShoppingList.merge_lists(result['convertable'], result['nonconvertable']),
+                                      result['spices'])
+        data['scale'] = result['scale']
+        return data
+
+    @staticmethod
+    def shopping_list(data, format='text'):
+        Renderer._check_format(format)
+        if format == 'json':
+            return json.dumps(data) + '\n'
+        if format == 'csv':
+            return Renderer._csv(['name', 'amount', 'unit'],
+                                 [[item['name'], item['amount'], item['unit']] for item in data['items']]
+                                 + [[spice, '', 'spice'] for spice in data['spices']])
+
+        lines = []
+        if format == 'markdown':
+            if data['items']:
+                lines.append("## Main ingredients / items\n\n")
+                lines.append(Renderer._markdown(['Ingredient', 'Amount', 'Unit'],
+                                                [[ShoppingList.name_case(item['name']), item['amount'], item['unit']]
+                                                 for item in data['items']]))
+            if data['spices']:
+                lines.append("\n## Spices\n\n" if lines else "## Spices\n\n")
+                lines.extend(f"- {ShoppingList.name_case(spice)}\n" for spice in data['spices'])
+            return ''.join(lines)
+
+        if data['items']:
+            lines.append("MAIN INGREDIENTS / ITEMS\n\n")
+            lines.extend(f"{ShoppingList.name_case(item['name'])} - {item['amount']} {item['unit']}\n"
+                         for item in data['items'])
+        if data['spices']:
+            lines.append("\nSPICE LIST :D\n\n")
+            lines.extend(f"{ShoppingList.name_case(spice)}\n" for spice in data['spices'])
+        return ''.join(lines)
+
+    @staticmethod
+    def recipes(recipes, format='text', ingredients=False, verbose=False, fields=()):
+        """fields are any of rating, spices, category, url and servings, in the order given"""
+        Renderer._check_format(format)
+        fields = [field for field in fields if field in ('rating', 'spices', 'category', 'url', 'servings')]
+        if format == 'text':
+            lines = []
+            for each in recipes:
+                lines.append(f"Recipe: {each.name}\n")
+                if ingredients:
+                    lines.append("Ingredients:\n")
+                    for ing in each.ingredients:
+                        lines.append(f"    {ing.name}\n")
+                        if verbose:
+                            lines.append(f"        amount: {ShoppingList.format_amount(ing.amount)}\n")
+                            lines.append(f"        unit: {ing.unit}\n")
+                    lines.append(f"Spices: {each.spices}\n")
+                for field in fields:
+                    lines.append(f"    {ShoppingList.name_case(field)}: "
+                                 f"{ShoppingList.name_case(ShoppingList.format_amount(getattr(each, field)))}\n")
+            return ''.join(lines)
+
+        data = []
+        for each in recipes:
+            entry = {'recipe': each.name}
+            if ingredients:
+                entry['ingredients'] = [{'name': ing.name, 'amount': ShoppingList.format_amount(ing.amount), 'unit': ing.unit}
+                                        if verbose else ing.name for ing in each.ingredients]
+                entry['spices'] = each.spices
+            for field in fields:
+                entry[field] = ShoppingList.format_amount(getattr(each, field))
+            data.append(entry)
+
+        if format == 'json':
+            return json.dumps(data) + '\n'
+
+        # Lists are flattened into one cell
+        header = ['recipe'] + (['ingredients', 'spices'] if ingredients else []) + [f for f in fields if f != 'spices' or not ingredients]
+        rows = []
+        for entry in data:
+            row = []
+            for column in header:
+                value = entry[column]
+                if column == 'ingredients' and verbose:
+                    value = [f"{ing['name']} {ing['amount']} {ing['unit']}" for ing in value]
+                row.append('; '.join(value) if isinstance(value, list) else value)
+            rows.append(row)
+
+        return Renderer._csv(header, rows) if format == 'csv' else Renderer._markdown(header, rows)
+
+    @staticmethod
+    def diagnostics(diagnostics, format='text'):
+        Renderer._check_format(format)
+        if format == 'json':
+            return json.dumps([each.to_dict() for each in diagnostics]) + '\n'
+        if format in ('csv', 'markdown'):
+            rows = [[getattr(each, slot) if getattr(each, slot) is not None else '' for slot in Diagnostic.__slots__]
+                    for each in diagnostics]
+            return Renderer._csv(Diagnostic.__slots__, rows) if format == 'csv' else Renderer._markdown(Diagnostic.__slots__, rows)
+
+        # Each recipe name is only written once
+        lines = []
+        current = None
+        for each in diagnostics:
+            if each.recipe != current:
+                lines.append(f"Recipe: {each.recipe}\n")
+                current = each.recipe
+            if each.ingredient is not None:
+                lines.append(f"    Ingredient: {each.ingredient} -- {each.message}\n")
+            else:
+                lines.append(f"    {each.message}\n")
+        return ''.join(lines)
+
+
+class ShoppingSession(object):
+    """
+    One user's shopping list over a shared catalog.
+
+    Holds nothing but the selected recipes with their serving sizes and
+    the running totals built from them (an IncrementalAggregator, made on
+    first use), so an idle session is a few hundred bytes and any number
+    of them can share one catalog and its indexes. The catalog is only
+    ever read. Every method takes the session's lock, so a session can be
+    used from any thread.
+    """
+
+    __slots__ = ('catalog', 'selected', 'aggregator', '_lock')
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.selected = {}
+        self.aggregator = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"ShoppingSession({len(self.selected)} recipes)"
+
+    def select(self, name, servings=None):
+        """Select a recipe, for servings or else its own serving size"""
+        if name not in self.catalog:
+            raise ValueError(f"{name} not found in Recipes list!")
+        if servings is not None and (not ShoppingList.check_number(servings) or servings <= 0):
+            raise ValueError(f"Invalid serving size for {name} -- {servings}")
+
+        with self._lock:
+            self.selected[RecipeCatalog.normalize(name)] = servings
+
+    def unselect(self, name):
+        """Returns False if the recipe wasn't selected"""
+        name = RecipeCatalog.normalize(name)
+        with self._lock:
+            if name not in self.selected:
+                return False
+            del self.selected[name]
+            return True
+
+    def add_item(self, name, amount, unit):
+        if not isinstance(name, str):
+            raise TypeError(f"Ingredient names are strings, not {name!r}")
+        name = ShoppingList.lint_case(name.strip(), case_type='lower')
+        if not ShoppingList.check_number(amount):
+            raise ValueError(f"Invalid ingredient amount for {name} -- {amount} {unit}")
+        if unit not in UNITS.unit_ids:
+            raise ValueError(f"Invalid unit supplied for {name} -- {amount} {unit}")
+
+        with self._lock:
+            self._aggregator().add_item(name, amount, unit)
+
+    def _aggregator(self):
+        if self.aggregator is None:
+            self.aggregator = IncrementalAggregator(self.catalog)
+        return self.aggregator
+
+    def prepare(self):
+        """Bring the totals up to date with the selection, only recipes that changed are touched"""
+        with self._lock:
+            self._prepare()
+
+    def _prepare(self):
+        aggregator = self._aggregator()
+        for name in [each for each in aggregator.contributions if each not in self.selected]:
+            aggregator.remove(name)
+        for name in sorted(self.selected, key=self.catalog.names.get):
+            scale = self.catalog.get(name).scale(self.selected[name])
+            if aggregator.contributions.get(name, (None, None))[1] != scale:
+                aggregator.add(name, scale)
+
+    def shopping_data(self):
+        """The prepared list as {'items', 'spices', 'scale'}, see Renderer.shopping_data"""
+        with self._lock:
+            self._prepare()
+            convertable_list, nonconvertable_list = self.aggregator.lists()
+            data = Renderer.shopping_data(ShoppingList.merge_lists(convertable_list, nonconvertable_list),
+                                          self.aggregator.spices)
+            data['scale'] = self.aggregator.scale_factors()
+
+        return data
+
+    def render(self, format='text'):
+        return Renderer.shopping_list(self.shopping_data(), format=format)
+
+    def clear(self):
+        with self._lock:
+            self.selected = {}
+            self.aggregator = None
+
+
+class _LintTally(object):
+    """Lints recipes one at a time as they are read, totting up the time, recipes and diagnostics"""
+    __slots__ = ('seconds', 'recipes', 'diagnostics')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.recipes = 0
+        self.diagnostics = 0
+
+    def lint(self, each):
+        start = time.perf_counter()
+        diagnostics = ShoppingList._lint_recipe(each)
+        self.seconds += time.perf_counter() - start
+        self.recipes += 1
+        self.diagnostics += len(diagnostics)
+        return diagnostics
+
+    def report(self, metrics, stage):
+        metrics.record('lint', self.seconds, stage=stage)
+        metrics.count('recipes_linted', self.recipes, stage=stage)
+        metrics.count('diagnostics', self.diagnostics, stage=stage)
+
+
+class ShoppingList(object):
+
+    def __init__(self, recipe, stream=False, cache=False, metrics=None, memory_budget=None):
+        # recipe is a path to load, or a catalog another list already
+        # loaded, which is then shared rather than copied
+        self.metrics = Metrics() if metrics is None else metrics
+        self._stream = stream
+        self._cache = cache
+        self._fingerprints = None
+        if isinstance(recipe, (RecipeCatalog, ShardedCatalog)):
+            self.recipe_path = None
+            self._stat = None
+            self.catalog = recipe
+        else:
+            self.recipe_path = recipe
+            self._stat = ShoppingList._file_stat(recipe)
+            with self.metrics.timer('load'):
+                self.catalog = ShoppingList.load_catalog(recipe, stream=stream, cache=cache, metrics=self.metrics,
+                                                         memory_budget=memory_budget)
+
+        self.selected_recipes = set()
+        self.serving_sizes = {}
+        self.scale_factors = {}
+        self.shopping_list = {}
+        self.convertable_list = {}
+        self.nonconvertable_list = {}
+        self.manual_list = {}
+        self.spice_list = set()
+        self.aggregator = IncrementalAggregator(self.catalog)
+        self._lists_version = self.aggregator.version
+        self._sorted_from = None
+        # _lock guards the catalog, aggregator and lists as one, so a reload
+        # can't swap them out from under a change. _reload_lock keeps
+        # reloads (say watch and an explicit call) from overlapping
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        print("Recipe list has been loaded! Call \"help\" for more instructions :)")
+
+    @staticmethod
+    def _file_stat(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self, force=False, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.reload.__name__,
+                                      params=['force -- compare every recipe even if the file looks untouched'],
+                                      notes="Picks up edits to the recipe file without starting over. Only recipes that changed are linted,\n"
+                                            "selected recipes and added items are kept, and returns True if anything changed.\n"
+                                            "If the new file doesn't pass linting the current recipes are kept")
+            return
+
+        if isinstance(self.catalog, ShardedCatalog):
+            raise Exception("A sharded catalog picks up changed shards when it is opened again")
+        if self.recipe_path is None:
+            raise Exception("This list shares a catalog, reload the list that loaded it")
+
+        with self._reload_lock:
+            return self._reload(force)
+
+    def _reload(self, force):
+        stat = ShoppingList._file_stat(self.recipe_path)
+        if stat == self._stat and not force:
+            return False
+
+        with self.metrics.timer('reload'):
+            catalog = self.catalog
+            if self._fingerprints is None:
+                self._fingerprints = {RecipeCatalog.normalize(recipe.name): catalog.fingerprint(recipe.position)
+                                      for recipe in catalog}
+
+            # Unchanged recipes are copied over from the current catalog
+            # column by column, only the rest are linted and parsed
+            fingerprints = {}
+            plan = []
+            changed = 0
+            invalid = False
+            linter = _LintTally()
+            digest = RecipeCatalog.source_digest()
+            for each in iter_recipes(self.recipe_path, stream=self._stream, digest=digest):
+                fingerprint = RecipeCatalog.dict_fingerprint(each)
+                name = RecipeCatalog.normalize(each['recipe']) if fingerprint is not None else None
+                if fingerprint is not None and self._fingerprints.get(name) == fingerprint:
+                    plan.append(catalog.get(name))
+                elif linter.lint(each):
+                    invalid = True
+                    continue
+                else:
+                    plan.append(each)
+                    changed += 1
+                if fingerprint is not None:
+                    fingerprints[name] = fingerprint
+
+            linter.report(self.metrics, stage='reload')
+            if invalid:
+                print("Fix recipe list before proceeding, the current recipes are kept")
+                raise Exception("Did not pass linting test")
+
+            removed = len(self._fingerprints.keys() - fingerprints.keys())
+            self.metrics.count('recipes_changed', changed)
+            self.metrics.count('recipes_removed', removed, stage='reload')
+            if not changed and len(plan) == len(catalog) and all(recipe is catalog.recipes[i] for i, recipe in enumerate(plan)):
+                self._stat = stat
+                self._fingerprints = fingerprints
+                return False
+
+            new = catalog.derive()
+            for each in plan:
+                if isinstance(each, Recipe):
+                    new.copy_recipe(each)
+                else:
+                    new.add(each)
+
+            if self._cache:
+                new.save(self.recipe_path + '.cache' if self._cache is True else self._cache, digest.digest())
+
+            # In-flight selections move over to the new catalog. The replay
+            # and the swap happen under the lock, so a change made meanwhile
+            # either lands before the replay or waits for the new state
+            with self._lock:
+                for name in list(self.selected_recipes):
+                    if name not in new:
+                        print(f"{ShoppingList.name_case(name)} is no longer in the recipe list and was unselected")
+                        self.selected_recipes.discard(name)
+                        self.serving_sizes.pop(RecipeCatalog.normalize(name), None)
+                aggregator = IncrementalAggregator(new)
+                for name in sorted((name for name in self.aggregator.contributions if name in new), key=new.names.get):
+                    aggregator.add(name, new.get(name).scale(self.serving_sizes.get(name)))
+                for (name, unit), amount in self.aggregator.items.items():
+                    aggregator.add_item(name, amount, UNITS.units[unit])
+
+                self.aggregator = aggregator
+                self.catalog = new
+                self._fingerprints = fingerprints
+                self._stat = stat
+                self._lists_version = None
+                self._sorted_from = None
+                self._refresh_lists()
+
+        print(f"Recipe list has been reloaded! {changed} changed, {removed} removed")
+        return True
+
+    def watch(self, interval=1.0, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.watch.__name__,
+                                      params=['interval -- seconds between checks of the recipe file'],
+                                      notes="Calls reload in a background thread whenever the recipe file changes.\n"
+                                            "Returns a threading.Event, set it to stop watching")
+            return
+
+        stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.reload()
+                except Exception as e:
+                    print(f"Reload failed: {e}")
+
+        threading.Thread(target=run, name='recipes-watch', daemon=True).start()
+        return stop
+
+    @staticmethod
+    def load_catalog(recipe, stream=False, cache=False, metrics=None, memory_budget=None):
+        # A cache is reused only if it was built from the same file contents
+        # by the same linter, anything else is rebuilt and written back
+        metrics = metrics or Metrics()
+        if os.path.isdir(recipe) or os.path.basename(recipe) == ShardedCatalog.MANIFEST:
+            # Shards are loaded (and cached) one by one when first used
+            if memory_budget is None:
+                return ShardedCatalog(recipe, stream=stream, cache=cache)
+            return ShardedCatalog(recipe, memory_budget=memory_budget, stream=stream, cache=cache)
+        if cache:
+            cache_path = recipe + '.cache' if cache is True else cache
+            cache_key = RecipeCatalog.source_key(recipe)
+            catalog = RecipeCatalog.load(cache_path, cache_key)
+            if catalog is not None:
+                metrics.count('cache_hits', cache='catalog')
+                return catalog
+            metrics.count('cache_misses', cache='catalog')
+
+        # The cache is keyed on the bytes actually parsed, which may be newer than the ones looked up
+        digest = RecipeCatalog.source_digest() if cache else None
+        catalog = ShoppingList._load_catalog(recipe, stream=stream, digest=digest, metrics=metrics)
+        metrics.count('recipes_scanned', len(catalog), stage='load')
+        if cache:
+            catalog.save(cache_path, digest.digest())
+
+        return catalog
+
+    @staticmethod
+    def _load_catalog(recipe, stream=False, digest=None, metrics=None):
+        # Each recipe is linted as it is read and goes straight into the
+        # catalog, so a streamed file is never held in memory all at once
+        metrics = metrics or Metrics()
+        catalog = RecipeCatalog()
+        invalid = False
+        linter = _LintTally()
+        for each in iter_recipes(recipe, stream=stream, digest=digest):
+            if linter.lint(each):
+                invalid = True
+            elif not invalid:
+                catalog.add(each)
+        linter.report(metrics, stage='load')
+
+        if invalid:
+            print("Fix recipe list before proceeding")
+            raise Exception("Did not pass linting test")
+
+        return catalog
+
+    @staticmethod
+    def check_number(val):
+        if isinstance(val, float) or isinstance(val, int):
+            return True
+
+        return False
+
+    @staticmethod
+    def check_list(list_):
+        for item in list_:
+            if not ShoppingList.check_number(item):
+                passed_check, fail_string = ShoppingList.check_case(item, case_type='lower')
+                if passed_check:
+                    continue
+                else:
+                    print(f"List check failed for {item}")
+                    return False
+            else:
+                continue
+
+        return True
+
+    @staticmethod
+    def format_amount(amount):
+        # Amounts are stored as floats, show whole numbers without the .0
+        if isinstance(amount, float) and amount.is_integer():
+            return int(amount)
+
+        return amount
+
+    @staticmethod
+    def name_case(word):
+        if not isinstance(word, str):
+            return word
+
+        return word[0].upper() + word[1:].lower()
+
+    @staticmethod
+    def lint_case(word, case_type='lower'):
+        if ShoppingList.check_case(word=word, case_type=case_type)[0]:
+            return word
+        else:
+            map_ = {'lower': word.lower(),
+                    'upper': word.upper(),
+                    'name_case': ShoppingList.name_case(word=word)}
+            return map_[case_type]
+
+    @staticmethod
+    def check_case(word, case_type='lower'):
+        CASE_TYPES = ['lower', 'upper', 'name']
+        if case_type not in CASE_TYPES:
+            return False, f"Invalid case type comparison: {case_type}!"
+
+        if (case_type == 'lower' and word != word.lower()) or \
+           (case_type == 'upper' and word != word.upper()) or \
+           (case_type == 'name' and word != ShoppingList.name_case(word)):
+            print_str = f"Invalid Case: {word}"
+            return False, print_str
+        else:
+            return True, ''
+
+    @classmethod
+    def convert_unit(cls, amount, start, target):
+        factor = UNITS.factor(start, target)
+        if factor is None:
+            print('Error converting units')
+            return False
+        else:
+            return amount * factor
+
+    @classmethod
+    def get_unit_list(cls, type_='all'):
+        accepted_types = ['all', 'convertable', 'nonconvertable']
+        if type_ not in accepted_types:
+            raise Exception(f"Supplied type -- {type_} -- not in {accepted_types}")
+
+        return_map = {'all': UNIT_LIST,
+                      'convertable': CONVERTABLE_UNITS,
+                      'nonconvertable': NONCONVERTABLE_UNITS}
+        return list(return_map[type_])
+
+    @classmethod
+    def get_recipe_key_list(cls):
+        recipe_keys = ['recipe', 'ingredients', 'rating', 'spices', 'url', 'category', 'servings']
+        return recipe_keys
+
+    @classmethod
+    def get_conversion_table(cls):
+        return {start: dict(targets) for start, targets in CONVERSION_TABLE.items()}
+
+    def _lint_recipes(self, workers=None, fail_fast=False):
+        # Any diagnostics mean something is wrong, and nothing else
+        # should continue until corrected
+        with self.metrics.timer('lint', stage='catalog'):
+            diagnostics = lint_recipes((each.to_dict() for each in self.catalog), workers=workers, fail_fast=fail_fast)
+        self.metrics.count('recipes_linted', len(self.catalog), stage='catalog')
+        self.metrics.count('diagnostics', len(diagnostics), stage='catalog')
+        ShoppingList._print_diagnostics(diagnostics)
+        return diagnostics
+
+    @staticmethod
+    def _lint_recipe(each):
+        """Lint a single recipe, returns its diagnostics (none if nothing is wrong with it)"""
+        diagnostics = lint_recipe(each)
+        ShoppingList._print_diagnostics(diagnostics)
+        return diagnostics
+
+    @staticmethod
+    def _print_diagnostics(diagnostics):
+        if diagnostics:
+            sys.stdout.write(Renderer.diagnostics(diagnostics))
+
+    def print_recipes(self, ingredients=False, verbose=False, help=False, *args, format='text', **kwargs):
+        """kwargs = [rating, url, spices, category]"""
+        """args = [pared] for pared down list"""
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.print_recipes.__name__,
+                                      params=['ingredients -- if set to True then it will print out all the ingredients with the recipe',
+                                              'verbose -- if set to True then amounts will be printed out alongside ingredients (ingredients must be True)',
+                                              'kwargs -- can print out other specific information if desired such as '
+                                              '"rating", "spices", "category", "url", "servings" which serve as the keyword, and T/F for the value.',
+                                              f"format -- one of {', '.join(Renderer.FORMATS)}"],
+                                      notes="Use to look at all recipes :)")
+            return
+
+        sys.stdout.write(Renderer.recipes(self.catalog, format=format, ingredients=ingredients, verbose=verbose,
+                                          fields=[kwarg for kwarg in kwargs if kwargs[kwarg] == True]))
+
+    def select_recipes(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.select_recipes.__name__,
+                                      notes="Used to select recipes to make for the shopping list :D\nNOTE: this doesn't actually add the ingredients. You need to call \"prepare_list\" to do that!")
+            return
+
+        print("Select recipes you wish to order or search with the following commands!")
+        print("1. 'all' -- print out all available recipes by name")
+        print("2. 'rating x' -- print out all available recipes that have a rating >= to x")
+        print("3. 'category y' -- print out all available recipes that fall in category y")
+        print("4. 'remove z' -- remove recipe z from the selected list")
+        print("5. 'current' -- print current list")
+        print("6. 'add b' -- add recipe b to the list")
+        print("7. 'servings c n' -- make n servings of recipe c")
+        print("8. 'search q' -- search recipes and ingredients for q")
+        print("9. 'done' -- finish adding all of the recipes")
+        while True:
+            action = input("Either enter recipe or select a command: ")
+            print('')
+            primary = ShoppingList.lint_case(action.split(' ')[0], case_type='lower')
+            # Add to the list
+            if primary == 'add':
+                selected_recipe = ' '.join(action.lower().split(' ')[1:])
+                for sr in selected_recipe.split(','):
+                    sr = sr.lstrip().rstrip()
+                    if sr not in self.catalog:
+                        print("Your recipe is not in the recipe list. Add it to the list before adding. Choose next recipe :)")
+                        suggestions = self.search(sr, limit=5, kinds=('recipe',))
+                        if suggestions:
+                            print(f"Did you mean: {', '.join(each['name'] for each in suggestions)}?")
+                        continue
+                    else:
+                        self.selected_recipes.add(sr)
+
+            # Remove from list
+            if primary == 'remove':
+                selected_recipe = ' '.join(action.lower().split(' ')[1:]).strip()
+                if selected_recipe in self.selected_recipes:
+                    self.selected_recipes.remove(selected_recipe)
+                else:
+                    print(f"{selected_recipe} not in {self.selected_recipes}!")
+
+            # Search recipes and ingredients
+            if primary == 'search':
+                k = 1
+                for result in self.search(' '.join(action.split(' ')[1:])):
+                    print(f"{k}. {result['name']} ({result['kind']})")
+                    k += 1
+
+            # Print out all recipes
+            if primary == 'all':
+                self.print_recipes()
+
+            # Set the serving size for a recipe
+            if primary == 'servings':
+                try:
+                    servings = float(action.split(' ')[-1])
+                except Exception:
+                    print("Please enter a valid number of servings!")
+                    continue
+
+                self.adjust_serving_size(recipe=' '.join(action.lower().split(' ')[1:-1]), servings=servings)
+
+            # Print out current recipes
+            if primary == 'current':
+                k = 1
+                for recipe in self.selected_recipes:
+                    if recipe in self.serving_sizes:
+                        print(f"{k}. {recipe} -- {ShoppingList.format_amount(self.serving_sizes[recipe])} servings")
+                    else:
+                        print(f"{k}. {recipe}")
+                    k += 1
+
+            # Print out based on rating
+            if primary == 'rating':
+                try:
+                    min_score = float(action.lower().split(' ')[1])
+                except Exception:
+                    print("Please enter a valid rating!")
+                    continue
+
+                i = 1
+                for recipe in self.catalog.by_rating(min_score):
+                    print(f"{i}. {recipe.name} -- {ShoppingList.format_amount(recipe.rating)}/10")
+                    i += 1
+
+            # Print out based on category
+            if primary == 'category':
+                cat = ' '.join(action.lower().split(' ')[1:])
+                j = 1
+                for recipe in self.catalog.by_category(cat):
+                    print(f"{j}. {recipe.name}")
+                    j += 1
+
+            # Done
+            if primary == 'done':
+                break
+
+            # Clear the terminal without starting a shell for it
+            if sys.stdout.isatty():
+                print('\033[2J\033[H', end='', flush=True)
+
+        return True
+
+    def search(self, query, limit=10, kinds=None, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.search.__name__,
+                                      params=['query -- full or partial name, typos are ok',
+                                              'limit -- most results to return',
+                                              'kinds -- only return these kinds of result, "recipe" and/or "ingredient"'],
+                                      notes="Returns a ranked list of {'name', 'kind', 'rank'} dicts, best match first")
+            return
+
+        with self.metrics.timer('select', op='search'):
+            # Shared by everyone using the catalog, a reload brings a new one
+            index = self._shared_index('search', SearchIndex)
+            return index.search(query, limit=limit, kinds=kinds)
+
+    def what_can_i_cook(self, pantry, max_missing=2, limit=20, servings=None, category=None, require=(), help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.what_can_i_cook.__name__,
+                                      params=['pantry -- dict of ingredient to what is on hand, e.g. {"egg": "6 single", "milk": "2 cup/liquid"}',
+                                              'max_missing -- most ingredients a recipe can be short of',
+                                              'limit -- most recipes to return',
+                                              'servings -- scale every recipe to this many servings first',
+                                              'category -- only recipes in this category',
+                                              'require -- only recipes using all of these ingredients'],
+                                      notes="Returns recipes ranked by how much of them is missing from the pantry")
+            return
+
+        with self.metrics.timer('select', op='pantry'):
+            index = self._shared_index('pantry', PantryIndex)
+            return index.query(pantry, max_missing=max_missing, limit=limit, servings=servings,
+                               category=category, require=require)
+
+    def _shared_index(self, key, build):
+        # A cache hit when the catalog already holds the index, whichever list built it
+        catalog = self.catalog.whole()
+        self.metrics.count('cache_misses' if catalog.peek_shared(key) is None else 'cache_hits', cache=key)
+        return catalog.shared(key, build)
+
+    def _gather_ingredients(self, ingredients, scale=1.0):
+        # Scaling is applied to each amount as it is added, the recipe itself is never copied
+        with self._lock:
+            with self.metrics.timer('gather'):
+                for ingredient in ingredients:
+                    self.aggregator.add_item(ingredient.name, ingredient.amount * scale, ingredient.unit)
+            self.metrics.count('ingredients_gathered', len(ingredients))
+
+            self._refresh_lists()
+
+    def _refresh_lists(self):
+        # Nothing to redo if the aggregation hasn't changed since last time
+        if self.aggregator.version == self._lists_version:
+            return
+
+        self._lists_version = self.aggregator.version
+        with self.metrics.timer('convert'):
+            self.convertable_list, self.nonconvertable_list = self.aggregator.lists()
+        # Every unit other than the one an ingredient is reported in was converted
+        self.metrics.count('conversions', self.aggregator.conversions)
+        self.spice_list = set(self.aggregator.spices)
+        self.scale_factors = self.aggregator.scale_factors()
+
+    def prepare_list(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.prepare_list.__name__,
+                                      notes="Call this once you've chosen your recipes to add all the appropriate\ningredients to the shopping list :)")
+            return
+
+        # Only recipes that were added, removed or rescaled since the last
+        # call are touched. Catalog order keeps the first unit seen for each
+        # ingredient stable
+        with self._lock, self.metrics.timer('gather'):
+            selected = {RecipeCatalog.normalize(name) for name in self.selected_recipes}
+            removed = [each for each in self.aggregator.contributions if each not in selected]
+            for name in removed:
+                self.aggregator.remove(name)
+            added = 0
+            # Names not in the catalog are skipped, as they always have been
+            for name in sorted((name for name in selected if name in self.catalog), key=self.catalog.names.get):
+                scale = self.catalog.get(name).scale(self.serving_sizes.get(name))
+                if self.aggregator.contributions.get(name, (None, None))[1] != scale:
+                    self.aggregator.add(name, scale)
+                    added += 1
+        self.metrics.count('recipes_removed', len(removed))
+        self.metrics.count('recipes_added', added)
+
+        with self._lock:
+            self._refresh_lists()
+        return True
+
+    def prepare_lists(self, selections, servings=False, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.prepare_lists.__name__,
+                                      params=['selections -- list of selections, each a dict of recipe name to serving multiplier or a list of recipe names',
+                                              'servings -- if set to True the dict values are serving sizes instead of multipliers'],
+                                      notes="Builds the ingredients for many selections in one batch, without touching the current shopping list.\n"
+                                            "Returns one dict of 'convertable', 'nonconvertable', 'spices' and 'scale' per selection.\n"
+                                            "Results are memoized, so treat them as read only")
+            return
+
+        batch = self.catalog.whole().shared('aggregate', _aggregation_cache)
+        hits, misses = batch.hits, batch.misses
+        with self.metrics.timer('batch'):
+            results = batch.aggregate(selections, servings=servings)
+        self.metrics.count('selections', len(results))
+        self.metrics.count('cache_hits', batch.hits - hits, cache='aggregate')
+        self.metrics.count('cache_misses', batch.misses - misses, cache='aggregate')
+        return results
+
+    def rollup(self, table, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.rollup.__name__,
+                                      params=['table -- a CostTable of prices and nutrients, see CostTable.load'],
+                                      notes="Call after \"prepare_list\" to total up the shopping list against the table.\n"
+                                            "Returns {'totals', 'recipes', 'missing'}, with a total per column for the list and for each recipe,\n"
+                                            "and the ingredients the table has no row for. Added items only count towards the list's totals")
+            return
+
+        with self._lock, self.metrics.timer('rollup'):
+            self._refresh_lists()
+            totals, missing = table.totals((name, value['amount'], value['unit'])
+                                           for each in (self.convertable_list, self.nonconvertable_list)
+                                           for name, value in each.items())
+            recipes = {recipe.name: table.recipe_totals(recipe, scale)[0]
+                       for recipe, scale in self.aggregator.contributions.values()}
+
+        return table.result(totals, recipes, missing)
+
+    def rollup_lists(self, selections, table, servings=False, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.rollup_lists.__name__,
+                                      params=['selections -- list of selections, the same as for prepare_lists',
+                                              'table -- a CostTable of prices and nutrients, see CostTable.load',
+                                              'servings -- if set to True the dict values are serving sizes instead of multipliers'],
+                                      notes="\"rollup\" for many selections in one batch, without touching the current shopping list")
+            return
+
+        batch = self.catalog.whole().shared('aggregate', _aggregation_cache)
+        with self.metrics.timer('rollup'):
+            results = batch.aggregator.rollup(selections, table, servings=servings)
+        self.metrics.count('selections', len(results))
+        return results
+
+    def cache_stats(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.cache_stats.__name__,
+                                      notes="Hit and miss counts for the memo behind prepare_lists")
+            return
+
+        return self.catalog.whole().shared('aggregate', _aggregation_cache).stats()
+
+    def _sort_lists(self):
+        # The merged list is kept until either list is replaced
+        # The lists are updated in place, so the version says when they changed
+        if self._sorted_from is not None and self._sorted_from == self._lists_version:
+            self.metrics.count('cache_hits', cache='sort')
+            return
+        self.metrics.count('cache_misses', cache='sort')
+
+        with self.metrics.timer('sort'):
+            self.shopping_list = ShoppingList.merge_lists(self.convertable_list, self.nonconvertable_list)
+        self._sorted_from = self._lists_version
+
+    @staticmethod
+    def merge_lists(convertable_list, nonconvertable_list):
+        """One sorted shopping list, an ingredient in both lists gets a trailing _ the second time"""
+        shopping_list = {}
+        all_keys = sorted(set(list(convertable_list.keys()) + list(nonconvertable_list.keys())))
+        lists = [convertable_list, nonconvertable_list]
+        for key in all_keys:
+            i = 0
+            for l in lists:
+                if key in l:
+                    if i == 0:
+                        shopping_list[key] = l[key]
+                        i += 1
+                    else:
+                        key_rep = key + i * '_'
+                        shopping_list[key_rep] = l[key]
+
+        return shopping_list
+
+    def pprint_shopping_list(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.pprint_shopping_list.__name__,
+                                      notes="Print out the current shopping list, prettily :P")
+            return
+
+        self.render(file=sys.stdout)
+
+    def shopping_data(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.shopping_data.__name__,
+                                      notes="Returns the current shopping list as {'items': [{'name', 'amount', 'unit'}], 'spices': [...]}")
+            return
+
+        with self._lock:
+            self._sort_lists()
+            return Renderer.shopping_data(self.shopping_list, self.spice_list)
+
+    def render(self, format='text', file=None, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.render.__name__,
+                                      params=[f"format -- one of {', '.join(Renderer.FORMATS)}",
+                                              'file -- file object to write to, otherwise the rendered list is returned'],
+                                      notes="Render the current shopping list, pprint_shopping_list is the same as render(file=sys.stdout)")
+            return
+
+        output = Renderer.shopping_list(self.shopping_data(), format=format)
+        if file is None:
+            return output
+        file.write(output)
+
+    def add_items(self, help=False, **kwargs):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.add_items.__name__,
+                                      params=['**kwargs -- the keyword acts as the ingredient and the value is the amount followed by a space and then the unit'],
+                                      notes="Use to add single ingredients or items as opposed to a recipe.\nTo see allowable units, call \"get_unit_list\"")
+            return
+
+        for ingredient, amounts in kwargs.items():
+            ingredient = ShoppingList.lint_case(word=ingredient, case_type='lower')
+            try:
+                amount = float(amounts.split(' ')[0])
+            except TypeError:
+                raise TypeError(f"Cannot cast {amount} to a float!")
+
+            unit = amounts.split(' ')[1]
+            if not ShoppingList.check_number(amount):
+                raise Exception(f"Invalid ingredient amount for {ingredient} -- {amount} {unit}")
+            elif unit not in ShoppingList.get_unit_list(type_='all'):
+                raise Exception(f"Invalid unit supplied for {ingredient} -- {amount} {unit}")
+
+            self._gather_ingredients(ingredients=[Ingredient(ingredient, amount, unit)])
+
+    def adjust_serving_size(self, recipe=None, servings=None, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.adjust_serving_size.__name__,
+                                      params=['recipe -- name of a selected recipe',
+                                              'servings -- number of servings to make, None goes back to the recipe\'s own servings'],
+                                      notes="Ingredients are scaled when the list is prepared, so call this before \"prepare_list\"")
+            return
+
+        recipe = RecipeCatalog.normalize(recipe)
+        if recipe not in self.catalog:
+            print(f"{ShoppingList.name_case(recipe)} not found in Recipes list!")
+            return
+        if servings is None:
+            with self._lock:
+                self.serving_sizes.pop(recipe, None)
+        elif not ShoppingList.check_number(servings) or servings <= 0:
+            raise Exception(f"Invalid serving size for {recipe} -- {servings}")
+        else:
+            with self._lock:
+                self.serving_sizes[recipe] = servings
+
+    def clear(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=self.clear.__name__,
+                                      notes="Call this method to empty the shopping list")
+            return
+
+        with self._lock:
+            self.selected_recipes = set()
+            self.serving_sizes = {}
+            self.aggregator.clear()
+            self.shopping_list = {}
+            self._refresh_lists()
+
+    def session(self, help=False):
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.session.__name__,
+                                      notes="Returns a new ShoppingSession sharing this list's catalog.\n"
+                                            "Sessions only hold their own selections, and are safe to use from any thread")
+            return
+
+        return ShoppingSession(self.catalog)
+
+    def profile(self, *sinks, help=False):
+        """Instrument everything run inside a with block, which gets a MetricsRegistry of the results"""
+        if help:
+            ShoppingList._method_help(method_name=ShoppingList.profile.__name__,
+                                      params=['*sinks -- more sinks to send events to, e.g. a JsonLinesSink or any function taking one event dict'],
+                                      notes="Use as \"with shopping_list.profile() as registry:\" then call registry.print_report()\n"
+                                            "Covers lint, select, gather, convert, sort and batch. To include load, pass metrics=Metrics(...) when creating the list")
+            return
+
+        return self._profile(sinks)
+
+    @contextlib.contextmanager
+    def _profile(self, sinks):
+        registry = MetricsRegistry()
+        previous = self.metrics
+        self.metrics = Metrics(registry, *previous.sinks, *sinks)
+        try:
+            yield registry
+        finally:
+            self.metrics = previous
+
+    def print_recipe(self, recipe=None, help=False):
+        if help:
+            ShoppingList._method_help(method_name=self.print_recipe.__name__,
+                                      params=['recipe - name of recipe to get'],
+                                      notes="Only returns one full recipe object at a time")
+            return
+
+        while not recipe:
+            recipe = input("Please select a recipe! ")
+
+        with self.metrics.timer('select', op='recipe'):
+            rec = self.catalog.get(recipe)
+        if rec is None:
+            print(f"{ShoppingList.name_case(recipe)} not found in Recipes list!")
+        else:
+            print(rec.to_dict())
+
+    @staticmethod
+    def _method_help(method_name, params=None, notes=None):
+        print(f"========== {method_name} ==========\n")
+        if params:
+            print("Parameters")
+            i = 1
+            for param in params:
+                print(f"{i}. {param}")
+                i += 1
+
+        if notes:
+            print("\nNotes / Comments")
+            print(notes)
+
+        if not params and not notes:
+            print("No parameters possible!")
+
+        print("\n========== END ==========")
+
+    def help(self):
+        print("========== HELP WINDOW ==========\n")
+        print("Current methods:")
+        print("\n N.B. \"help\" can be called with all methods below to explain usage in depth!\n")
+        print("1. print_recipes @params [ingredients, verbose] -- used to view all recipes")
+        print("2. select_recipes @params [] -- used to select recipes")
+        print("3. prepare_list @params []  -- used to gather ingredients for selected recipes")
+        print("4. pprint_shopping_list @params [] -- print out the final list of ingredients")
+        print("5. add_items @params [help, **kwargs] -- add specific items")
+        print("6. clear @params [] -- clear the entire shopping list")
+        print("7. print_recipe @params [recipe] -- fetch the recipe object for a given recipe")
+        print("8. adjust_serving_size @params [recipe, servings] -- scale a recipe to a number of servings")
+        print("9. prepare_lists @params [selections, servings] -- gather ingredients for many selections at once")
+        print("10. search @params [query, limit, kinds] -- search recipes and ingredients, typos are ok")
+        print("11. what_can_i_cook @params [pantry, max_missing, limit, servings, category, require] -- find recipes to make from what is on hand")
+        print("12. profile @params [*sinks] -- time and count everything run in a with block")
+        print("13. render @params [format, file] -- the shopping list as text, json, csv or markdown")
+        print("14. shopping_data @params [] -- the shopping list as plain lists and dicts")
+        print("15. cache_stats @params [] -- hit and miss counts for the prepare_lists memo")
+        print("16. reload @params [force] -- pick up edits to the recipe file, only changed recipes are linted")
+        print("17. watch @params [interval] -- reload in the background whenever the recipe file changes")
+        print("18. session @params [] -- a lightweight, thread safe shopping list sharing this catalog")
+        print("19. rollup @params [table] -- price and nutrient totals for the prepared list and each recipe")
+        print("20. rollup_lists @params [selections, table, servings] -- rollup for many selections at once")
+        print("\n========== END WINDOW ==========\n")
@@ -0,0 +1,221 @@
+"""
+Batch command line entry point -- python -m recipes
+"""
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import json
+import os
+import sys
+
+from recipes import (AggregationCache, BatchAggregator, CostTable, JsonLinesSink, Metrics, Renderer,
+                     ShardedCatalog, ShoppingList, lint_file, summarize)
+from recipes.service import RecipeService, _aggregate_json
+
+
+_CLI_AGGREGATOR = None
+_CLI_COSTS = None
+
+
+def _cli_init(recipe, stream=False, cache=False, costs=None):
+    global _CLI_AGGREGATOR, _CLI_COSTS
+    if _CLI_AGGREGATOR is None:
+        # Anything the loader prints goes to stderr, stdout is for results only
+        with contextlib.redirect_stdout(sys.stderr):
+            catalog = ShoppingList.load_catalog(recipe, stream=stream, cache=cache)
+            _CLI_AGGREGATOR = AggregationCache(BatchAggregator(catalog.whole()))
+        if costs:
+            _CLI_COSTS = CostTable.load(costs)
+
+
+def _cli_request(line):
+    """
+    A request line is either {"id": ..., "recipes": ..., "servings": bool}
+    or just the recipes: a list of names, a dict of name to multiplier or
+    a single name
+    """
+    request = json.loads(line)
+    request_id, selection, servings = None, request, False
+    if isinstance(request, dict) and 'recipes' in request:
+        request_id, selection, servings = request.get('id'), request['recipes'], bool(request.get('servings', False))
+
+    if isinstance(selection, str):
+        selection = [selection]
+    elif not isinstance(selection, (list, dict)):
+        raise ValueError(f"expected a recipe name, a list of names or a dict of names to multipliers, "
+                         f"got {json.dumps(selection)}")
+    return request_id, selection, servings
+
+
+def _cli_result(request_id, result, costs=None):
+    output = {} if request_id is None else {'id': request_id}
+    if isinstance(result, Exception):
+        output['error'] = str(result)
+        return output
+
+    output.update(Renderer.aggregate_data(result))
+    if costs is not None:
+        output['costs'] = costs
+    return output
+
+
+def _cli_aggregate(selections, servings=False):
+    # (result, rollup) pairs, the rollup is None unless a cost table is loaded
+    results = _CLI_AGGREGATOR.aggregate(selections, servings=servings)
+    if _CLI_COSTS is None:
+        return [(result, None) for result in results]
+
+    return list(zip(results, _CLI_AGGREGATOR.aggregator.rollup(selections, _CLI_COSTS, servings=servings)))
+
+
+def _cli_batch(lines):
+    """Aggregate a batch of request lines, returns the output lines in the same order"""
+    outputs = [None] * len(lines)
+    groups = {False: [], True: []}
+    for i, line in enumerate(lines):
+        try:
+            request_id, selection, servings = _cli_request(line)
+        except ValueError as e:
+            outputs[i] = {'error': f"Invalid request: {e}"}
+            continue
+        groups[servings].append((i, request_id, selection))
+
+    for servings, group in groups.items():
+        if not group:
+            continue
+
+        try:
+            results = _cli_aggregate([selection for _, _, selection in group], servings=servings)
+        except Exception:
+            # Go one at a time so a bad request only fails itself
+            results = []
+            for _, _, selection in group:
+                try:
+                    results.extend(_cli_aggregate([selection], servings=servings))
+                except Exception as e:
+                    results.append((e, None))
+
+        for (i, request_id, _), (result, costs) in zip(group, results):
+            outputs[i] = _cli_result(request_id, result, costs)
+
+    return ''.join(json.dumps(output) + '\n' for output in outputs)
+
+
+def _cli_aggregate_json(selections, servings=False):
+    return _aggregate_json(_CLI_AGGREGATOR, selections, servings=servings)
+
+
+def _cli_lint(args):
+    paths = [args.recipes]
+    if os.path.isdir(args.recipes) or os.path.basename(args.recipes) == ShardedCatalog.MANIFEST:
+        sharded = ShardedCatalog(args.recipes, stream=args.stream)
+        paths = [os.path.join(sharded.directory, shard['path']) for shard in sharded.shards]
+
+    diagnostics = []
+    for path in paths:
+        diagnostics.extend(lint_file(path, workers=args.workers, fail_fast=args.fail_fast, stream=args.stream))
+        if diagnostics and args.fail_fast:
+            break
+    sys.stdout.write(''.join(f"{each}\n" for each in diagnostics))
+    for rule, count in summarize(diagnostics).items():
+        print(f"{rule}: {count}", file=sys.stderr)
+    print(f"{len(diagnostics)} problems found", file=sys.stderr)
+    return 1 if diagnostics else 0
+
+
+def _cli_serve(args):
+    host, _, port = args.serve.rpartition(':')
+    with contextlib.redirect_stdout(sys.stderr):
+        catalog = ShoppingList.load_catalog(args.recipes, stream=args.stream, cache=args.cache)
+
+    executor = None
+    aggregate = None
+    if args.workers > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=_cli_init,
+                                                          initargs=(args.recipes, args.stream, args.cache))
+        aggregate = _cli_aggregate_json
+
+    service = RecipeService(catalog, ttl=args.ttl, executor=executor, aggregate=aggregate)
+    try:
+        asyncio.run(service.serve(host or '127.0.0.1', int(port)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m recipes',
+                                     description="Build shopping lists in bulk. Reads one selection per line (JSON Lines) "
+                                                 "and writes one aggregated shopping list per line, in the same order.")
+    parser.add_argument('input', nargs='?', default='-', help="JSON Lines file of selections, - for stdin (default)")
+    parser.add_argument('-o', '--output', default='-', help="file to write the shopping lists to, - for stdout (default)")
+    parser.add_argument('-r', '--recipes', default='recipes.json',
+                        help="recipe file, .json or .jsonl, or a directory or manifest.json of shards")
+    parser.add_argument('-w', '--workers', type=int, default=0, help="number of worker processes (default none)")
+    parser.add_argument('-b', '--batch-size', type=int, default=1000, help="selections aggregated per batch")
+    parser.add_argument('--stream', action='store_true', help="stream the recipe file instead of loading it whole")
+    parser.add_argument('--cache', action='store_true', help="use and keep a compiled catalog cache next to the recipe file")
+    parser.add_argument('--lint', action='store_true', help="only lint the recipe file, exits 1 if anything is wrong")
+    parser.add_argument('--fail-fast', action='store_true', help="with --lint, stop at the first recipe with a problem")
+    parser.add_argument('--costs', help="CSV table of prices and nutrients (ingredient,unit,...), adds each list's totals")
+    parser.add_argument('--metrics', help="append load and batch timings and counters to this JSON Lines file")
+    parser.add_argument('--serve', metavar='[HOST:]PORT', help="instead, serve the catalog over a local HTTP API")
+    parser.add_argument('--ttl', type=float, default=1800, help="with --serve, seconds an unused session is kept")
+    args = parser.parse_args(argv)
+
+    if args.lint:
+        return _cli_lint(args)
+    if args.serve:
+        return _cli_serve(args)
+
+    metrics = Metrics(JsonLinesSink(args.metrics)) if args.metrics else Metrics()
+    with metrics.timer('load'):
+        _cli_init(args.recipes, stream=args.stream, cache=args.cache, costs=args.costs)
+    infile = sys.stdin if args.input == '-' else open(args.input, 'r')
+    outfile = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    def batches():
+        batch = []
+        for line in infile:
+            if line.strip():
+                batch.append(line)
+                if len(batch) >= args.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    try:
+        if args.workers > 1:
+            # Workers forked from here share the loaded catalog, others load it once each
+            with concurrent.futures.ProcessPoolExecutor(max_workers=args.workers, initializer=_cli_init,
+                                                        initargs=(args.recipes, args.stream, args.cache, args.costs)) as pool:
+                pending = collections.deque()
+                for batch in batches():
+                    metrics.count('selections', len(batch))
+                    pending.append(pool.submit(_cli_batch, batch))
+                    while len(pending) >= args.workers * 2 or (pending and pending[0].done()):
+                        outfile.write(pending.popleft().result())
+                while pending:
+                    outfile.write(pending.popleft().result())
+        else:
+            for batch in batches():
+                with metrics.timer('batch'):
+                    outfile.write(_cli_batch(batch))
+                metrics.count('selections', len(batch))
+    finally:
+        outfile.flush()
+        for sink in metrics.sinks:
+            sink.close()
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    return 0
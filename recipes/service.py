@@ -0,0 +1,310 @@
+"""
+Local HTTP API over one loaded catalog -- see RecipeService, or run
+python -m recipes --serve PORT
+"""
+import asyncio
+import collections
+import json
+import secrets
+import sys
+import time
+import traceback
+import urllib.parse
+import weakref
+
+from recipes import Renderer, SearchIndex, ShardedCatalog, ShoppingSession, _aggregation_cache
+
+
+def _aggregate_json(aggregator, selections, servings=False):
+    # Serialized where it runs, so an executor hands back one string
+    return json.dumps({'results': [Renderer.aggregate_data(result)
+                                   for result in aggregator.aggregate(selections, servings=servings)]})
+
+
+
+class _Session(object):
+    __slots__ = ('session', 'expires')
+
+    def __init__(self, session, expires):
+        self.session = session
+        self.expires = expires
+
+
+class RecipeService(object):
+    """
+    Local HTTP API over one loaded catalog, built on asyncio and the stdlib.
+
+    Endpoints, JSON in and out:
+        GET    /search?q=...&limit=10&kind=recipe
+        GET    /recipes?category=...&min_rating=...&max_rating=...
+        GET    /recipes/<name>
+        GET    /stats                          sessions and aggregation memo stats
+        POST   /aggregate                      {"selections": [...], "servings": false}
+        POST   /sessions                       -> {"session": id}
+        GET    /sessions/<id>                  the session's shopping list
+        DELETE /sessions/<id>
+        POST   /sessions/<id>/recipes          {"recipe": name, "servings": n}
+        DELETE /sessions/<id>/recipes/<name>
+        POST   /sessions/<id>/items            {"name": ..., "amount": ..., "unit": ...}
+
+    Each session is a ShoppingSession over the one catalog. Sessions are kept
+    in least recently used order, so the ones past their ttl are always at
+    the front and eviction never scans the rest. Batch aggregation runs in
+    an executor (threads by default, or worker processes that each load
+    the catalog once) so the event loop keeps serving while it works.
+    """
+
+    STATUS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+              405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+    MAX_BODY = 1 << 24
+
+    def __init__(self, catalog, ttl=1800, max_sessions=100000, executor=None, aggregate=None):
+        self.catalog = catalog
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.executor = executor
+        # A process pool can't be handed the catalog, its workers use their
+        # own copy. Only a weak reference is kept to the memo, so a sharded
+        # catalog can still evict the merged catalog it belongs to
+        self._batch = None
+        self.aggregate = aggregate or self._aggregate
+        self.sessions = collections.OrderedDict()
+        self._evictor = None
+
+    def _aggregate(self, selections, servings=False):
+        # Built on first use, a sharded catalog is only merged if batches are asked for
+        batch = self.catalog.whole().shared('aggregate', _aggregation_cache)
+        self._batch = weakref.ref(batch)
+        return _aggregate_json(batch, selections, servings=servings)
+
+    # Sessions
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None or session.expires <= time.monotonic():
+            return None
+
+        session.expires = time.monotonic() + self.ttl
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def create_session(self):
+        self.evict()
+        while len(self.sessions) >= self.max_sessions:
+            self.sessions.popitem(last=False)
+
+        session_id = secrets.token_hex(16)
+        self.sessions[session_id] = _Session(ShoppingSession(self.catalog), time.monotonic() + self.ttl)
+        return session_id
+
+    def evict(self):
+        """Drop every session past its ttl, returns how many went"""
+        now = time.monotonic()
+        evicted = 0
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.expires > now:
+                break
+            del self.sessions[session_id]
+            evicted += 1
+
+        return evicted
+
+    async def _evict_forever(self):
+        while True:
+            await asyncio.sleep(min(self.ttl, 60))
+            self.evict()
+
+    # Requests
+    async def dispatch(self, method, target, body):
+        """Returns (status, payload), payload being a JSON-able object or an already encoded JSON string"""
+        url = urllib.parse.urlsplit(target)
+        query = {key: values[-1] for key, values in urllib.parse.parse_qs(url.query).items()}
+        parts = [urllib.parse.unquote(part) for part in url.path.strip('/').split('/') if part]
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError as e:
+            return 400, {'error': f"Invalid JSON: {e}"}
+
+        # Bad input raises KeyError, ValueError or TypeError, anything else
+        # is a bug here and not the client's fault
+        try:
+            return await self._route(method, parts, query, request)
+        except KeyError as e:
+            return 400, {'error': f"Missing {e}"}
+        except (ValueError, TypeError) as e:
+            return 400, {'error': str(e)}
+        except Exception:
+            print(f"Error handling {method} {target}", file=sys.stderr)
+            traceback.print_exc()
+            return 500, {'error': "Internal server error"}
+
+    async def _shared(self, key, build):
+        # Built in a thread the first time, so the event loop keeps serving
+        # other connections meanwhile. Never self.executor, which may be
+        # worker processes that can't be handed the catalog
+        catalog = self.catalog.whole()
+        value = catalog.peek_shared(key)
+        if value is not None:
+            return value
+        return await asyncio.get_running_loop().run_in_executor(None, catalog.shared, key, build)
+
+    async def _route(self, method, parts, query, request):
+        if not parts:
+            return 404, {'error': "Not found"}
+        allowed = None
+
+        if parts == ['search']:
+            allowed = 'GET'
+            if method == 'GET':
+                kinds = query['kind'].split(',') if 'kind' in query else None
+                index = await self._shared('search', SearchIndex)
+                return 200, {'results': index.search(query.get('q', ''), limit=int(query.get('limit', 10)),
+                                                            kinds=kinds)}
+
+        if parts[0] == 'recipes' and len(parts) <= 2:
+            allowed = 'GET'
+            if method == 'GET' and len(parts) == 2:
+                recipe = self.catalog.get(parts[1])
+                if recipe is None:
+                    return 404, {'error': f"{parts[1]} not found in Recipes list!"}
+                return 200, recipe.to_dict()
+            if method == 'GET':
+                if 'category' in query:
+                    found = self.catalog.by_category(query['category'])
+                else:
+                    found = self.catalog.by_rating(float(query.get('min_rating', 0)),
+                                                   float(query['max_rating']) if 'max_rating' in query else None)
+                return 200, {'recipes': [recipe.name for recipe in found]}
+
+        if parts == ['stats']:
+            allowed = 'GET'
+            if method == 'GET':
+                batch = self._batch() if self._batch is not None else None
+                stats = {'sessions': len(self.sessions), 'cache': batch.stats() if batch is not None else {}}
+                if isinstance(self.catalog, ShardedCatalog):
+                    stats['shards'] = self.catalog.stats()
+                return 200, stats
+
+        if parts == ['aggregate']:
+            allowed = 'POST'
+            if method == 'POST':
+                loop = asyncio.get_running_loop()
+                return 200, await loop.run_in_executor(self.executor, self.aggregate, request['selections'],
+                                                       bool(request.get('servings', False)))
+
+        if parts == ['sessions']:
+            allowed = 'POST'
+            if method == 'POST':
+                return 201, {'session': self.create_session()}
+
+        if parts[0] == 'sessions' and len(parts) >= 2:
+            session = self._session(parts[1])
+            if session is None:
+                return 404, {'error': f"No session {parts[1]}"}
+            session = session.session
+
+            if len(parts) == 2:
+                allowed = 'GET, DELETE'
+                if method == 'GET':
+                    return 200, session.shopping_data()
+                if method == 'DELETE':
+                    del self.sessions[parts[1]]
+                    return 200, {'session': parts[1]}
+
+            if parts[2:] == ['recipes']:
+                allowed = 'POST'
+                if method == 'POST':
+                    if request['recipe'] not in self.catalog:
+                        return 404, {'error': f"{request['recipe']} not found in Recipes list!"}
+                    session.select(request['recipe'], request.get('servings'))
+                    try:
+                        return 200, session.shopping_data()
+                    except Exception:
+                        session.unselect(request['recipe'])
+                        raise
+
+            if parts[2:3] == ['recipes'] and len(parts) == 4:
+                allowed = 'DELETE'
+                if method == 'DELETE':
+                    if not session.unselect(parts[3]):
+                        return 404, {'error': f"{parts[3]} is not in the session"}
+                    return 200, session.shopping_data()
+
+            if parts[2:] == ['items']:
+                allowed = 'POST'
+                if method == 'POST':
+                    session.add_item(request['name'], request['amount'], request['unit'])
+                    return 200, session.shopping_data()
+
+        if allowed is None:
+            return 404, {'error': "Not found"}
+        return 405, {'error': f"Use {allowed}"}
+
+    async def handle(self, reader, writer):
+        """One connection, any number of keep-alive requests"""
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+
+                lines = head.decode('latin-1').split('\r\n')
+                request_line = lines[0].split(' ')
+                if len(request_line) != 3:
+                    self._respond(writer, 400, {'error': "Bad request line"}, False)
+                    break
+                method, target, version = request_line
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        key, value = line.split(':', 1)
+                        headers[key.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+                try:
+                    length = int(headers.get('content-length', 0))
+                except ValueError:
+                    length = -1
+                if not 0 <= length <= self.MAX_BODY:
+                    self._respond(writer, 413 if length > 0 else 400, {'error': "Bad Content-Length"}, False)
+                    break
+
+                try:
+                    body = await reader.readexactly(length) if length else b''
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                status, payload = await self.dispatch(method, target, body)
+                self._respond(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, writer, status, payload, keep_alive):
+        body = (payload if isinstance(payload, str) else json.dumps(payload)).encode()
+        writer.write(f"HTTP/1.1 {status} {RecipeService.STATUS[status]}\r\n"
+                     f"Content-Type: application/json\r\n"
+                     f"Content-Length: {len(body)}\r\n"
+                     f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body)
+
+    async def start(self, host='127.0.0.1', port=8080):
+        """Start listening, port 0 picks a free one. Returns the asyncio server"""
+        # A deep backlog so a burst of new connections isn't left retrying SYNs
+        server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        self._evictor = asyncio.get_running_loop().create_task(self._evict_forever())
+        return server
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        server = await self.start(host, port)
+        address = server.sockets[0].getsockname()
+        print(f"Serving {len(self.catalog)} recipes on http://{address[0]}:{address[1]}", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self._evictor.cancel()
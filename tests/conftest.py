@@ -0,0 +1,40 @@
+import json
+import os
+import shutil
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def recipe_entry(name, ingredients, category='american', servings=4, rating=3.0, spices=('salt',)):
+    """A recipes.json entry, ingredients being {name: (amount, unit)} or a list of (name, amount, unit)"""
+    if isinstance(ingredients, dict):
+        ingredients = [(ingredient, amount, unit) for ingredient, (amount, unit) in ingredients.items()]
+    return {'recipe': name,
+            'ingredients': [{ingredient: {'amount': amount, 'unit': unit}} for ingredient, amount, unit in ingredients],
+            'spices': list(spices),
+            'url': f"https://example.com/{name.lower().replace(' ', '-')}",
+            'rating': rating,
+            'category': category,
+            'servings': servings}
+
+
+@pytest.fixture
+def recipe_path(tmp_path):
+    """A copy of the repo's recipes.json"""
+    path = tmp_path / 'recipes.json'
+    shutil.copy(os.path.join(REPO, 'recipes.json'), path)
+    return str(path)
+
+
+@pytest.fixture
+def write_recipes(tmp_path):
+    """write_recipes(entry, ...) writes a recipe file of recipe_entry dicts and returns its path"""
+    def write(*entries, name='recipes.json'):
+        path = tmp_path / name
+        with open(path, 'w') as outfile:
+            json.dump({'recipes': list(entries)}, outfile)
+        return str(path)
+
+    return write
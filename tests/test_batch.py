@@ -0,0 +1,57 @@
+import math
+import random
+
+import pytest
+
+import recipes
+from recipes import ShoppingList
+
+
+def same_lists(expected, actual):
+    assert expected.keys() == actual.keys()
+    for name, value in expected.items():
+        assert value['unit'] == actual[name]['unit'], name
+        assert math.isclose(value['amount'], actual[name]['amount'], rel_tol=1e-12), name
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_prepare_lists_matches_prepare_list(recipe_path, monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(recipes, 'np', None)
+    elif recipes.np is None:
+        pytest.skip("numpy is not installed")
+    shopping = ShoppingList(recipe_path)
+    names = [each.name for each in shopping.catalog]
+    rng = random.Random(0)
+
+    selections = []
+    expected = []
+    for _ in range(100):
+        selection = {name: rng.choice((0.5, 1, 2, 3)) for name in rng.sample(names, rng.randint(1, 5))}
+        shopping.clear()
+        shopping.selected_recipes = set(selection)
+        for name, multiplier in selection.items():
+            shopping.adjust_serving_size(name, shopping.catalog.get(name).servings * multiplier)
+        try:
+            shopping.prepare_list()
+        except Exception:
+            # Units that don't convert are rejected by both
+            with pytest.raises(Exception):
+                shopping.prepare_lists([selection])
+            continue
+        selections.append(selection)
+        expected.append((dict(shopping.convertable_list), dict(shopping.nonconvertable_list), set(shopping.spice_list)))
+
+    assert len(selections) > 50
+    for (convertable, nonconvertable, spices), result in zip(expected, shopping.prepare_lists(selections)):
+        same_lists(convertable, result['convertable'])
+        same_lists(nonconvertable, result['nonconvertable'])
+        assert spices == result['spices']
+
+
+def test_prepare_lists_rejects_bad_multipliers(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    name = next(iter(shopping.catalog)).name
+    for value in (0, -1, 'two', True):
+        with pytest.raises(ValueError):
+            shopping.prepare_lists([{name: value}])
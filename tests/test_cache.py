@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from recipes import RecipeCatalog, ShoppingList
+
+
+def snapshot(catalog):
+    return [recipe.to_dict() for recipe in catalog]
+
+
+@pytest.fixture
+def cached(recipe_path):
+    shopping = ShoppingList(recipe_path, cache=True)
+    with open(recipe_path + '.cache', 'rb') as infile:
+        good = infile.read()
+    return recipe_path, shopping, good
+
+
+def test_round_trip(cached):
+    recipe_path, loaded, _ = cached
+    catalog = RecipeCatalog.load(recipe_path + '.cache', RecipeCatalog.source_key(recipe_path))
+    assert catalog is not None
+    assert snapshot(catalog) == snapshot(loaded.catalog)
+    assert catalog.ingredient_recipes == loaded.catalog.ingredient_recipes
+
+    # A second list is served from the cache and aggregates the same
+    again = ShoppingList(recipe_path, cache=True)
+    selection = [recipe.name for recipe in loaded.catalog][:3]
+    assert again.prepare_lists([selection]) == loaded.prepare_lists([selection])
+
+
+def test_stale_key(cached):
+    recipe_path = cached[0]
+    key = RecipeCatalog.source_key(recipe_path)
+    assert RecipeCatalog.load(recipe_path + '.cache', key[::-1]) is None
+
+    with open(recipe_path, 'a') as outfile:
+        outfile.write('\n')
+    assert RecipeCatalog.source_key(recipe_path) != key
+
+
+def test_truncated(cached):
+    recipe_path, _, good = cached
+    cache_path = recipe_path + '.cache'
+    key = RecipeCatalog.source_key(recipe_path)
+    for cut in range(0, len(good), max(1, len(good) // 300)):
+        with open(cache_path, 'wb') as outfile:
+            outfile.write(good[:cut])
+        assert RecipeCatalog.load(cache_path, key) is None, cut
+
+
+def test_flipped_bytes(cached):
+    recipe_path, loaded, good = cached
+    cache_path = recipe_path + '.cache'
+    key = RecipeCatalog.source_key(recipe_path)
+    expected = snapshot(loaded.catalog)
+    rng = random.Random(0)
+    for _ in range(300):
+        bad = bytearray(good)
+        index = rng.randrange(len(good))
+        bad[index] ^= 1 << rng.randrange(8)
+        with open(cache_path, 'wb') as outfile:
+            outfile.write(bytes(bad))
+        catalog = RecipeCatalog.load(cache_path, key)
+        assert catalog is None or snapshot(catalog) == expected, index
+
+
+def test_corrupt_cache_is_rebuilt(cached):
+    recipe_path, loaded, good = cached
+    with open(recipe_path + '.cache', 'wb') as outfile:
+        outfile.write(good[:len(good) // 2])
+
+    shopping = ShoppingList(recipe_path, cache=True)
+    assert snapshot(shopping.catalog) == snapshot(loaded.catalog)
+    with open(recipe_path + '.cache', 'rb') as infile:
+        assert infile.read() == good
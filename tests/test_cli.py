@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from conftest import recipe_entry
+from recipes import cli
+
+
+@pytest.fixture(autouse=True)
+def fresh_worker(monkeypatch):
+    # The catalog is loaded once per process, each test brings its own
+    monkeypatch.setattr(cli, '_CLI_AGGREGATOR', None)
+    monkeypatch.setattr(cli, '_CLI_COSTS', None)
+
+
+@pytest.fixture
+def menu(write_recipes):
+    return write_recipes(
+        recipe_entry('Pancakes', {'milk': (1, 'cup/liquid'), 'egg': (2, 'single')}, spices=('sugar',)),
+        recipe_entry('Omelette', {'egg': (3, 'single'), 'milk': (2, 'tbsp')}, servings=2),
+    )
+
+
+def run(tmp_path, recipes, requests, *args):
+    infile = tmp_path / 'requests.jsonl'
+    outfile = tmp_path / 'lists.jsonl'
+    infile.write_text(''.join(each if isinstance(each, str) else json.dumps(each) + '\n' for each in requests))
+    assert cli.main([str(infile), '-o', str(outfile), '-r', recipes, *args]) == 0
+    return [json.loads(line) for line in outfile.read_text().splitlines()]
+
+
+def test_batch_in_request_order(tmp_path, menu):
+    outputs = run(tmp_path, menu, [
+        {'id': 'a', 'recipes': ['Pancakes', 'Omelette']},
+        '\n',
+        '"Omelette"\n',
+        {'id': 'b', 'recipes': {'Omelette': 2}, 'servings': False},
+        {'id': 'c', 'recipes': {'Omelette': 4}, 'servings': True},
+    ])
+    assert len(outputs) == 4
+
+    assert outputs[0]['id'] == 'a'
+    assert {item['name']: item['unit'] for item in outputs[0]['items']} == {'egg': 'single', 'milk': 'cup/liquid'}
+    assert [item['amount'] for item in outputs[0]['items'] if item['name'] == 'egg'] == [5]
+    assert outputs[0]['spices'] == ['salt', 'sugar']
+    assert outputs[0]['scale'] == {'Pancakes': 1.0, 'Omelette': 1.0}
+
+    # A bare string is one recipe
+    assert 'id' not in outputs[1]
+    assert outputs[1]['items'] == [{'name': 'egg', 'amount': 3, 'unit': 'single'},
+                                   {'name': 'milk', 'amount': 2, 'unit': 'tbsp'}]
+    # A multiplier, then a serving count
+    assert outputs[2]['scale'] == {'Omelette': 2.0}
+    assert outputs[3]['scale'] == {'Omelette': 2.0}
+    assert outputs[2]['items'] == outputs[3]['items']
+
+
+def test_bad_requests_only_fail_themselves(tmp_path, menu):
+    outputs = run(tmp_path, menu, [
+        'Pancakes\n',
+        '5\n',
+        {'id': 1, 'recipes': ['Waffles']},
+        {'id': 2, 'recipes': {'Pancakes': -1}},
+        {'id': 3, 'recipes': ['Pancakes']},
+    ])
+    assert outputs[0]['error'].startswith("Invalid request")
+    assert outputs[1]['error'].startswith("Invalid request")
+    assert outputs[2]['id'] == 1 and 'Waffles' in outputs[2]['error']
+    assert outputs[3]['id'] == 2 and 'error' in outputs[3]
+    assert outputs[4]['id'] == 3 and 'error' not in outputs[4]
+
+
+def test_workers_match_a_single_process(tmp_path, menu):
+    requests = [{'id': i, 'recipes': ['Pancakes', 'Omelette'][:i % 2 + 1]} for i in range(50)]
+    single = run(tmp_path, menu, requests, '-b', '7')
+    assert run(tmp_path, menu, requests, '-b', '7', '-w', '2') == single
+
+
+def test_lint_exit_code(write_recipes, recipe_path, capsys):
+    assert cli.main(['--lint', '-r', recipe_path]) == 0
+    bad = write_recipes(recipe_entry('Toast', {'bread': (2, 'loaves')}), name='bad.json')
+    assert cli.main(['--lint', '-r', bad]) == 1
+    out = capsys.readouterr().out
+    assert 'loaves' in out
@@ -0,0 +1,127 @@
+import math
+import random
+
+import pytest
+
+from conftest import recipe_entry
+from recipes import UNITS, RecipeCatalog, ShoppingList
+
+
+def same_lists(expected, actual):
+    # Amounts are in the first unit still contributing, which depends on
+    # the order recipes came and went in, so compare them converted. The
+    # conversion table is rounded, a round trip is only good to about 0.1%
+    assert expected.keys() == actual.keys()
+    for name, value in expected.items():
+        if value['unit'] == actual[name]['unit']:
+            assert math.isclose(value['amount'], actual[name]['amount'], rel_tol=1e-9, abs_tol=1e-12), name
+        else:
+            factor = UNITS.factor_by_id(UNITS.unit_ids[actual[name]['unit']], UNITS.unit_ids[value['unit']])
+            assert factor is not None, name
+            assert math.isclose(value['amount'], actual[name]['amount'] * factor, rel_tol=1e-2), name
+
+
+@pytest.fixture
+def duplicates(write_recipes):
+    return write_recipes(recipe_entry('Salty', [('salt', 1, 'tsp'), ('salt', 2, 'tsp'), ('egg', 1, 'single')]),
+                         recipe_entry('Eggs', {'egg': (2, 'single'), 'salt': (1, 'tbsp')}))
+
+
+def test_remove_recipe_listing_an_ingredient_twice(duplicates):
+    shopping = ShoppingList(duplicates)
+    shopping.selected_recipes = {'salty'}
+    shopping.prepare_list()
+    assert shopping.convertable_list == {'salt': {'amount': 3, 'unit': 'tsp'}}
+    shopping.selected_recipes = set()
+    shopping.prepare_list()
+    assert shopping.convertable_list == {} and shopping.nonconvertable_list == {}
+    assert shopping.aggregator.totals == {}
+
+    shopping.selected_recipes = {'salty', 'eggs'}
+    shopping.prepare_list()
+    assert shopping.convertable_list['salt'] == {'amount': 3 + 3, 'unit': 'tsp'}
+
+    shopping.selected_recipes = {'eggs'}
+    shopping.prepare_list()
+    assert shopping.convertable_list == {'salt': {'amount': 1, 'unit': 'tbsp'}}
+    assert shopping.nonconvertable_list == {'egg': {'amount': 2, 'unit': 'single'}}
+
+    shopping.selected_recipes = set()
+    shopping.prepare_list()
+    assert shopping.convertable_list == {} and shopping.nonconvertable_list == {}
+    assert shopping.aggregator.totals == {} and shopping.aggregator.contributions == {}
+
+
+def test_session_unselect_recipe_listing_an_ingredient_twice(duplicates):
+    session = ShoppingList(duplicates).session()
+    session.select('Salty')
+    assert session.shopping_data()['items'][1] == {'name': 'salt', 'amount': 3, 'unit': 'tsp'}
+    session.unselect('Salty')
+    assert session.shopping_data()['items'] == []
+
+
+def test_remove_and_rescale_match_a_fresh_list(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    names = [recipe.name for recipe in shopping.catalog]
+    rng = random.Random(0)
+    checked = 0
+    for _ in range(60):
+        # Change a few recipes at a time, the way the selection loop does
+        for name in rng.sample(names, 3):
+            if rng.random() < 0.5:
+                shopping.selected_recipes.discard(name)
+            else:
+                shopping.selected_recipes.add(name)
+                shopping.adjust_serving_size(name, rng.choice((None, 1, 2, 6)))
+        try:
+            shopping.prepare_list()
+        except ValueError:
+            # Units that don't convert, the change that caused it is undone
+            shopping.selected_recipes.discard(name)
+            continue
+
+        fresh = ShoppingList(shopping.catalog)
+        fresh.selected_recipes = set(shopping.selected_recipes)
+        fresh.serving_sizes = dict(shopping.serving_sizes)
+        fresh.prepare_list()
+        same_lists(fresh.convertable_list, shopping.convertable_list)
+        same_lists(fresh.nonconvertable_list, shopping.nonconvertable_list)
+        assert fresh.spice_list == shopping.spice_list
+        checked += 1
+
+    assert checked > 20
+
+
+def test_only_changed_ingredients_are_recomputed(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    shopping.selected_recipes = {'pizza', 'beef stew'}
+    shopping.prepare_list()
+    before = dict(shopping.convertable_list)
+
+    shopping.add_items(basil='1 tbsp')
+    for name, entry in before.items():
+        if name != 'basil':
+            assert shopping.convertable_list[name] is entry, name
+    assert shopping.convertable_list['basil']['amount'] == before['basil']['amount'] + 1
+    assert shopping.aggregator.conversions == 0
+
+
+def test_added_items_are_kept_per_ingredient_and_unit(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    for _ in range(100):
+        shopping.add_items(flour='1 cup/solid', milk='2 tbsp')
+    shopping.add_items(milk='1 cup/liquid')
+
+    aggregator = shopping.aggregator
+    assert len(aggregator.items) == 3
+    assert all(len(amounts) == 1 for subtotals in aggregator.totals.values() for amounts in subtotals.values())
+    assert shopping.convertable_list['flour'] == {'amount': 100, 'unit': 'cup/solid'}
+    assert shopping.convertable_list['milk'] == {'amount': 216, 'unit': 'tbsp'}
+    assert aggregator.conversions == 1
+
+
+def test_prepare_list_skips_unknown_recipes(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    shopping.selected_recipes = {'pizza', 'no such recipe'}
+    assert shopping.prepare_list()
+    assert set(shopping.aggregator.contributions) == {RecipeCatalog.normalize('Pizza')}
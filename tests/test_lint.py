@@ -0,0 +1,75 @@
+import copy
+import json
+import os
+
+import pytest
+
+from conftest import REPO, recipe_entry
+from recipes import Diagnostic, ShoppingList, lint_file, lint_recipe, lint_recipes, summarize
+
+
+@pytest.fixture(scope='module')
+def flawed():
+    # The real recipes with a problem every few recipes and some duplicates
+    with open(os.path.join(REPO, 'recipes.json')) as infile:
+        entries = json.load(infile)['recipes']
+    flawed = []
+    for copy_ in range(3):
+        for index, entry in enumerate(copy.deepcopy(entries)):
+            # Every third recipe of the later copies keeps its name, a duplicate
+            if copy_ and index % 3:
+                entry['recipe'] = f"{entry['recipe']} {copy_}"
+            if index % 5 == copy_:
+                entry['category'] = entry['category'].upper()
+            if index % 7 == copy_:
+                entry['spices'].append(3)
+            flawed.append(entry)
+    return flawed
+
+
+def key(diagnostics):
+    return [(each.recipe, each.rule, each.field, each.ingredient) for each in diagnostics]
+
+
+def test_parallel_matches_serial(flawed):
+    serial = lint_recipes(flawed)
+    assert {'duplicate-recipe', 'invalid-case', 'invalid-spice'} <= set(summarize(serial))
+    for chunk_size in (1, 4, 50):
+        assert key(lint_recipes(flawed, workers=2, chunk_size=chunk_size)) == key(serial)
+
+
+def test_fail_fast_stops_at_the_first_bad_recipe(flawed):
+    serial = lint_recipes(flawed, fail_fast=True)
+    assert len({each.recipe for each in serial}) == 1
+    for chunk_size in (1, 4, 50):
+        assert key(lint_recipes(flawed, workers=2, fail_fast=True, chunk_size=chunk_size)) == key(serial)
+
+
+def test_clean_file_has_no_diagnostics(recipe_path):
+    assert lint_file(recipe_path) == []
+    assert lint_file(recipe_path, workers=2, stream=True, chunk_size=7) == []
+
+
+@pytest.mark.parametrize('spice', [3, 1.5, None, ['salt']])
+def test_spices_must_be_strings(spice):
+    entry = recipe_entry('Toast', {'bread': (2, 'single')}, spices=['salt', spice])
+    assert key(lint_recipe(entry)) == [('Toast', 'invalid-spice', 'spices', None)]
+
+
+def test_numeric_spice_fails_the_load(write_recipes):
+    path = write_recipes(recipe_entry('Toast', {'bread': (2, 'single')}, spices=[3]))
+    with pytest.raises(Exception, match='Did not pass linting test'):
+        ShoppingList(path, cache=True)
+    assert not os.path.exists(path + '.cache')
+
+
+def test_diagnostics_are_located():
+    entry = recipe_entry('Toast', {'Bread': (2, 'loaves'), 'butter': ('1', 'tbsp')})
+    entry['colour'] = 'brown'
+    diagnostics = lint_recipe(entry)
+    assert key(diagnostics) == [('Toast', 'unknown-key', 'colour', None),
+                                ('Toast', 'invalid-case', None, 'Bread'),
+                                ('Toast', 'invalid-unit', 'unit', 'Bread'),
+                                ('Toast', 'invalid-amount', 'amount', 'butter')]
+    assert all(isinstance(each, Diagnostic) for each in diagnostics)
+    assert str(diagnostics[1]).startswith('Toast / Bread')
@@ -0,0 +1,116 @@
+import json
+import math
+
+import pytest
+
+from conftest import recipe_entry
+from recipes import AggregationCache, BatchAggregator, ShoppingList
+
+
+@pytest.fixture
+def catalog(write_recipes):
+    return ShoppingList.load_catalog(write_recipes(
+        recipe_entry('Pancakes', {'milk': (1, 'cup/liquid'), 'egg': (2, 'single')}),
+        recipe_entry('Omelette', {'egg': (3, 'single'), 'milk': (2, 'tbsp')}),
+        recipe_entry('Toast', {'bread': (2, 'slice'), 'butter': (1, 'tbsp')}),
+    ))
+
+
+def same_result(expected, actual):
+    assert expected['spices'] == actual['spices']
+    assert expected['scale'] == actual['scale']
+    for kind in ('convertable', 'nonconvertable'):
+        assert expected[kind].keys() == actual[kind].keys()
+        for name, value in expected[kind].items():
+            assert value['unit'] == actual[kind][name]['unit']
+            assert math.isclose(value['amount'], actual[kind][name]['amount'], rel_tol=1e-12)
+
+
+@pytest.mark.parametrize('vectorize', [64, 1])
+def test_hits_whichever_way_a_selection_is_spelled(catalog, vectorize):
+    memo = AggregationCache(BatchAggregator(catalog), vectorize=vectorize)
+    selections = [['Pancakes', 'Omelette'], ['omelette', 'PANCAKES'], {'Omelette': 1, 'Pancakes': 1.0},
+                  {'Pancakes': 2}, {'Pancakes': 8}]
+    results = memo.aggregate(selections)
+    expected = BatchAggregator(catalog).aggregate(selections)
+    for each, result in zip(expected, results):
+        same_result(each, result)
+
+    # Asking for 8 servings of a 4 serving recipe is the same as doubling it
+    assert memo.aggregate([{'Pancakes': 8}], servings=True)[0] is results[3]
+    stats = memo.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (3, 3, 3)
+
+
+def test_partial_overlaps_reuse_contributions(catalog):
+    memo = AggregationCache(BatchAggregator(catalog))
+    memo.aggregate([['Pancakes', 'Omelette']])
+    assert memo.stats()['contribution_misses'] == 2
+    memo.aggregate([['Pancakes', 'Toast'], {'Omelette': 3}])
+    stats = memo.stats()
+    assert (stats['contribution_hits'], stats['contribution_misses']) == (2, 3)
+    assert stats['misses'] == 3
+
+
+def test_evicts_least_recently_used(catalog):
+    memo = AggregationCache(BatchAggregator(catalog), max_entries=2)
+    first = memo.aggregate([['Pancakes']])[0]
+    second = memo.aggregate([['Omelette']])[0]
+    assert memo.aggregate([['Pancakes']])[0] is first
+    third = memo.aggregate([['Toast']])[0]
+    assert memo.stats()['evictions'] == 1
+
+    # Omelette was the least recently used
+    assert memo.aggregate([['Pancakes']])[0] is first
+    assert memo.aggregate([['Toast']])[0] is third
+    assert memo.aggregate([['Omelette']])[0] is not second
+    assert memo.stats()['entries'] == 2
+
+
+def test_evicts_by_memory(catalog):
+    memo = AggregationCache(BatchAggregator(catalog))
+    memo.aggregate([['Pancakes', 'Omelette']])
+    one = memo.stats()['bytes']
+    assert one > 0
+
+    memo = AggregationCache(BatchAggregator(catalog), max_bytes=int(one * 1.5))
+    memo.aggregate([['Pancakes', 'Omelette'], ['Toast', 'Omelette']])
+    assert memo.stats()['entries'] == 1 and memo.stats()['bytes'] <= memo.max_bytes
+    # Anything over the limit on its own is never stored
+    memo = AggregationCache(BatchAggregator(catalog), max_bytes=1)
+    memo.aggregate([['Pancakes']])
+    assert memo.stats()['entries'] == 0 and memo.stats()['evictions'] == 0
+
+
+def test_invalidated_when_the_catalog_changes(catalog):
+    memo = AggregationCache(BatchAggregator(catalog))
+    memo.aggregate([['Pancakes'], ['Toast']])
+    assert memo.stats()['entries'] == 2
+
+    catalog.add(recipe_entry('Porridge', {'oats': (1, 'cup/solid'), 'milk': (1, 'cup/liquid')}))
+    result = memo.aggregate([['Pancakes', 'Porridge']])[0]
+    assert result['convertable']['oats']['amount'] == 1
+    stats = memo.stats()
+    assert (stats['entries'], stats['misses'], stats['hits']) == (1, 3, 0)
+
+
+def test_reload_starts_a_fresh_memo(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    name = next(iter(shopping.catalog)).name
+    shopping.prepare_lists([[name], [name]])
+    assert (shopping.cache_stats()['hits'], shopping.cache_stats()['misses']) == (1, 1)
+
+    with open(recipe_path) as infile:
+        data = json.load(infile)
+    ingredient = data['recipes'][0]['ingredients'][0]
+    for value in ingredient.values():
+        value['amount'] *= 2
+    with open(recipe_path, 'w') as outfile:
+        json.dump(data, outfile)
+    assert shopping.reload(force=True)
+
+    assert shopping.cache_stats()['entries'] == 0
+    result = shopping.prepare_lists([[name]])[0]
+    ingredient_name, value = next(iter(ingredient.items()))
+    merged = ShoppingList.merge_lists(result['convertable'], result['nonconvertable'])
+    assert merged[ingredient_name]['amount'] == pytest.approx(value['amount'])
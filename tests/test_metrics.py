@@ -0,0 +1,75 @@
+import json
+
+from conftest import recipe_entry
+from recipes import JsonLinesSink, Metrics, MetricsRegistry, ShoppingList
+
+
+def test_registry_keeps_tags_apart():
+    registry = MetricsRegistry()
+    metrics = Metrics(registry)
+    metrics.count('cache_hits', cache='search')
+    metrics.count('cache_hits', 2, cache='pantry')
+    metrics.count('cache_hits', cache='search')
+    metrics.count('selections', 5)
+    metrics.record('select', 0.5, op='search', shard=1)
+    metrics.record('select', 0.25, shard=1, op='search')
+
+    report = registry.report()
+    assert report['counters'] == {'cache_hits{cache=search}': 2, 'cache_hits{cache=pantry}': 2, 'selections': 5}
+    assert report['timers'] == {'select{op=search,shard=1}': {'calls': 2, 'seconds': 0.75, 'max': 0.5}}
+
+
+def test_no_sinks_is_free():
+    metrics = Metrics()
+    assert not metrics
+    with metrics.timer('load'):
+        metrics.count('selections')
+        metrics.record('lint', 1.0)
+
+
+def test_load_path_lint_is_timed_and_counted(write_recipes):
+    path = write_recipes(recipe_entry('Toast', {'bread': (2, 'single')}),
+                         recipe_entry('Tea', {'tea': (1, 'single'), 'milk': (2, 'tbsp')}))
+    registry = MetricsRegistry()
+    ShoppingList(path, cache=True, metrics=Metrics(registry))
+    report = registry.report()
+    assert report['timers']['lint{stage=load}']['calls'] == 1
+    assert report['counters'] == {'cache_misses{cache=catalog}': 1,
+                                  'recipes_linted{stage=load}': 2,
+                                  'diagnostics{stage=load}': 0,
+                                  'recipes_scanned{stage=load}': 2}
+
+    # Served from the cache, nothing is linted
+    registry = MetricsRegistry()
+    ShoppingList(path, cache=True, metrics=Metrics(registry))
+    assert registry.report()['counters'] == {'cache_hits{cache=catalog}': 1}
+    assert 'lint{stage=load}' not in registry.report()['timers']
+
+
+def test_profile_counts_each_cache(recipe_path):
+    shopping = ShoppingList(recipe_path)
+    with shopping.profile() as registry:
+        shopping.search('chicken')
+        shopping.search('beef')
+        shopping.what_can_i_cook({'egg': '6 single'})
+        shopping.prepare_lists([['pizza'], ['pizza']])
+    report = registry.report()
+    assert report['counters']['cache_misses{cache=search}'] == 1
+    assert report['counters']['cache_hits{cache=search}'] == 1
+    assert report['counters']['cache_misses{cache=pantry}'] == 1
+    assert 'cache_hits{cache=pantry}' not in report['counters']
+    assert report['timers']['select{op=search}']['calls'] == 2
+    assert report['timers']['select{op=pantry}']['calls'] == 1
+
+
+def test_json_lines_sink(tmp_path):
+    path = tmp_path / 'metrics.jsonl'
+    with JsonLinesSink(str(path)) as sink:
+        metrics = Metrics(sink)
+        metrics.count('cache_hits', cache='sort')
+        with metrics.timer('sort'):
+            pass
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(event['kind'], event['name'], event.get('cache')) for event in events] == \
+        [('counter', 'cache_hits', 'sort'), ('timer', 'sort', None)]
+    assert all('time' in event for event in events)
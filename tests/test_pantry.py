@@ -0,0 +1,34 @@
+import pytest
+
+from conftest import recipe_entry
+from recipes import ShoppingList
+
+
+def test_pantry_ranking_after_unit_conversion(write_recipes):
+    path = write_recipes(
+        recipe_entry('Pancakes', {'milk': (1, 'cup/liquid'), 'flour': (1, 'cup/solid'), 'egg': (2, 'single')}),
+        recipe_entry('Crepes', {'milk': (2, 'cup/liquid'), 'flour': (1, 'cup/solid'), 'egg': (2, 'single')}),
+        recipe_entry('Omelette', {'egg': (3, 'single'), 'butter': (1, 'tbsp')}, category='english'),
+    )
+    shopping = ShoppingList(path)
+    # 16 tbsp is a cup and 8 fluid ounces is a cup, so pancakes are covered
+    # and crepes are half a cup of milk short of their two cups
+    pantry = {'milk': '24 tbsp', 'Flour': '8 oz/solid', 'egg': '6 single'}
+
+    results = shopping.what_can_i_cook(pantry, max_missing=1)
+    assert [each['recipe'] for each in results] == ['Pancakes', 'Crepes', 'Omelette']
+    assert results[0]['missing'] == [] and results[0]['shortfall'] == 0
+    assert results[1]['missing'] == [{'ingredient': 'milk', 'amount': pytest.approx(0.5), 'unit': 'cup/liquid'}]
+    assert results[1]['shortfall'] == pytest.approx(0.25)
+    assert results[2]['missing'][0]['ingredient'] == 'butter'
+
+    # At 8 servings the pancakes are short of milk and flour both
+    doubled = shopping.what_can_i_cook(pantry, max_missing=1, servings=8)
+    assert [each['recipe'] for each in doubled] == ['Omelette']
+    # Ranked by how much is short, not by how many ingredients are
+    doubled = shopping.what_can_i_cook(pantry, max_missing=2, servings=8)
+    assert [each['recipe'] for each in doubled] == ['Pancakes', 'Omelette', 'Crepes']
+    assert [each['shortfall'] for each in doubled] == pytest.approx([0.75, 1.0, 1.125])
+
+    assert [each['recipe'] for each in shopping.what_can_i_cook(pantry, category='english')] == ['Omelette']
+    assert [each['recipe'] for each in shopping.what_can_i_cook(pantry, require=[' Butter '])] == ['Omelette']
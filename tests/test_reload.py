@@ -0,0 +1,56 @@
+import json
+import threading
+import time
+
+import pytest
+
+from recipes import RecipeCatalog, ShoppingList
+
+
+def test_reload_under_concurrent_add_items(recipe_path, monkeypatch):
+    shopping = ShoppingList(recipe_path, cache=True)
+    first = next(iter(shopping.catalog)).name
+    shopping.selected_recipes.add(first)
+    shopping.prepare_list()
+
+    # A slow cache write widens the window a reload could lose an add in
+    save = RecipeCatalog.save
+
+    def slow_save(self, *args, **kwargs):
+        time.sleep(0.05)
+        return save(self, *args, **kwargs)
+    monkeypatch.setattr(RecipeCatalog, 'save', slow_save)
+
+    stop = threading.Event()
+    added = []
+    errors = []
+
+    def add():
+        try:
+            while not stop.is_set():
+                shopping.add_items(saffron='1 tsp')
+                added.append(1)
+        except Exception as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=add)
+    thread.start()
+    try:
+        for rating in (1.0, 2.0, 3.0):
+            with open(recipe_path) as infile:
+                data = json.load(infile)
+            data['recipes'][0]['rating'] = rating
+            with open(recipe_path, 'w') as outfile:
+                json.dump(data, outfile)
+            assert shopping.reload(force=True)
+            assert shopping.catalog.get(first).rating == rating
+    finally:
+        stop.set()
+        thread.join()
+
+    assert not errors
+    assert added
+    saffron = shopping.convertable_list['saffron']
+    assert saffron['unit'] == 'tsp' and saffron['amount'] == pytest.approx(len(added))
+    assert RecipeCatalog.normalize(first) in shopping.aggregator.contributions
+    assert RecipeCatalog.load(recipe_path + '.cache', RecipeCatalog.source_key(recipe_path)) is not None
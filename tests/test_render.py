@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+
+import pytest
+
+from conftest import recipe_entry
+from recipes import Diagnostic, Renderer, ShoppingList
+
+
+@pytest.fixture
+def shopping(write_recipes):
+    shopping = ShoppingList(write_recipes(
+        recipe_entry('Pancakes', {'milk': (1, 'cup/liquid'), 'egg': (2, 'single')}, rating=4.5, spices=('sugar',)),
+        recipe_entry('Omelette', {'egg': (3, 'single'), 'cheese': (0.25, 'cup/solid')}, category='english'),
+    ))
+    shopping.selected_recipes = {'pancakes', 'omelette'}
+    shopping.prepare_list()
+    return shopping
+
+
+def test_shopping_list_formats(shopping, capsys):
+    data = shopping.shopping_data()
+    assert data == {'items': [{'name': 'cheese', 'amount': 0.25, 'unit': 'cup/solid'},
+                              {'name': 'egg', 'amount': 5, 'unit': 'single'},
+                              {'name': 'milk', 'amount': 1, 'unit': 'cup/liquid'}],
+                    'spices': ['salt', 'sugar']}
+
+    text = shopping.render()
+    assert text.startswith("MAIN INGREDIENTS / ITEMS\n\n")
+    assert "Egg - 5 single\n" in text
+    assert text.endswith("\nSPICE LIST :D\n\nSalt\nSugar\n")
+    shopping.pprint_shopping_list()
+    assert capsys.readouterr().out == text
+
+    assert json.loads(shopping.render('json')) == data
+    rows = list(csv.reader(io.StringIO(shopping.render('csv'))))
+    assert rows[0] == ['name', 'amount', 'unit']
+    assert ['egg', '5', 'single'] in rows and ['sugar', '', 'spice'] in rows
+
+    markdown = shopping.render('markdown')
+    assert markdown.startswith("## Main ingredients / items\n\n| Ingredient | Amount | Unit |\n|---|---|---|\n")
+    assert "| Egg | 5 | single |\n" in markdown
+    assert markdown.endswith("## Spices\n\n- Salt\n- Sugar\n")
+
+    buffer = io.StringIO()
+    assert shopping.render('csv', file=buffer) is None
+    assert buffer.getvalue() == shopping.render('csv')
+
+    with pytest.raises(Exception):
+        shopping.render('yaml')
+
+
+def test_sorted_list_follows_the_aggregation(shopping):
+    before = shopping.render()
+    assert shopping.render() == before
+    shopping.add_items(butter='2 tbsp')
+    assert "Butter - 2 tbsp\n" in shopping.render()
+    shopping.clear()
+    assert shopping.render() == ''
+
+
+def test_recipe_formats(shopping):
+    catalog = shopping.catalog
+    text = Renderer.recipes(catalog, ingredients=True, verbose=True, fields=['rating'])
+    assert "Recipe: Pancakes\nIngredients:\n    milk\n        amount: 1\n        unit: cup/liquid\n" in text
+    assert "    Rating: 4.5\n" in text
+
+    data = json.loads(Renderer.recipes(catalog, format='json', ingredients=True, verbose=True, fields=['rating']))
+    assert data[0] == {'recipe': 'Pancakes',
+                       'ingredients': [{'name': 'milk', 'amount': 1, 'unit': 'cup/liquid'},
+                                       {'name': 'egg', 'amount': 2, 'unit': 'single'}],
+                       'spices': ['sugar'], 'rating': 4.5}
+
+    # Lists are flattened into one cell
+    rows = list(csv.reader(io.StringIO(Renderer.recipes(catalog, format='csv', ingredients=True,
+                                                        fields=['category']))))
+    assert rows == [['recipe', 'ingredients', 'spices', 'category'],
+                    ['Pancakes', 'milk; egg', 'sugar', 'american'],
+                    ['Omelette', 'egg; cheese', 'salt', 'english']]
+    assert Renderer.recipes(catalog, format='markdown').splitlines() == \
+        ['| recipe |', '|---|', '| Pancakes |', '| Omelette |']
+
+
+def test_diagnostic_formats():
+    diagnostics = [Diagnostic('Toast', 'unit', "Unknown unit loaves", field='unit', ingredient='bread'),
+                   Diagnostic('Toast', 'rating', "Rating out of range", field='rating'),
+                   Diagnostic('Soup', 'case', "Not lower case")]
+    assert Renderer.diagnostics(diagnostics) == ("Recipe: Toast\n"
+                                                 "    Ingredient: bread -- Unknown unit loaves\n"
+                                                 "    Rating out of range\n"
+                                                 "Recipe: Soup\n"
+                                                 "    Not lower case\n")
+    assert json.loads(Renderer.diagnostics(diagnostics, format='json'))[0] == diagnostics[0].to_dict()
+    rows = list(csv.reader(io.StringIO(Renderer.diagnostics(diagnostics, format='csv'))))
+    assert rows[0] == list(Diagnostic.__slots__)
+    assert rows[3] == ['Soup', '', '', 'case', 'Not lower case']
@@ -0,0 +1,101 @@
+import json
+
+import pytest
+
+import recipes
+from conftest import recipe_entry
+from recipes import CostTable, ShoppingList, cli
+
+TABLE = """ingredient,unit,price,calories
+milk,oz/liquid,0.1,20
+Egg,single,0.25,70
+egg,single,9,9
+flour,lbs,0.5,
+"""
+
+
+@pytest.fixture
+def table_path(tmp_path):
+    path = tmp_path / 'costs.csv'
+    path.write_text(TABLE)
+    return str(path)
+
+
+@pytest.fixture
+def shopping(write_recipes):
+    return ShoppingList(write_recipes(
+        recipe_entry('Pancakes', {'milk': (1, 'cup/liquid'), 'egg': (2, 'single'), 'flour': (1, 'cup/solid')}),
+        recipe_entry('Omelette', {'egg': (3, 'single'), 'butter': (1, 'tbsp')}, servings=2),
+    ))
+
+
+def test_load(table_path, tmp_path):
+    table = CostTable.load(table_path)
+    assert table.columns == ('price', 'calories')
+    # The first row for an ingredient in a unit dimension wins
+    assert len(table) == 3
+    assert table.totals([('egg', 2, 'single')]) == ([0.5, 140.0], set())
+    # Priced in any unit the table's unit converts to, a cup of flour is half a pound
+    assert table.totals([('flour', 1, 'cup/solid'), ('milk', 1, 'tbsp')]) == \
+        (pytest.approx([0.25 + 0.05, 10]), set())
+    assert table.totals([('egg', 1, 'cup/solid'), ('salt', 1, 'tsp')])[1] == {'egg', 'salt'}
+
+    for text in ("name,unit,price\n", "", "ingredient,unit,price\nmilk,bucket,1\n", "ingredient,unit,price\nmilk,tsp,one\n"):
+        path = tmp_path / 'bad.csv'
+        path.write_text(text)
+        with pytest.raises(Exception):
+            CostTable.load(str(path))
+
+
+def test_rollup_the_prepared_list(shopping, table_path):
+    table = CostTable.load(table_path)
+    shopping.selected_recipes = {'pancakes', 'omelette'}
+    shopping.adjust_serving_size('Omelette', 4)
+    shopping.prepare_list()
+    shopping.add_items(egg='1 single')
+
+    result = shopping.rollup(table)
+    # Eight eggs from the recipes and one added, which only counts towards the list
+    assert result['totals'] == pytest.approx({'price': 0.8 + 0.25 + 9 * 0.25, 'calories': 160 + 9 * 70})
+    assert result['recipes'] == {'Pancakes': pytest.approx({'price': 0.8 + 0.5 + 0.25, 'calories': 160 + 140}),
+                                 'Omelette': pytest.approx({'price': 1.5, 'calories': 420})}
+    assert result['missing'] == ['butter']
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_rollup_lists_matches_rollup(shopping, table_path, monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(recipes, 'np', None)
+    elif recipes.np is None:
+        pytest.skip("numpy is not installed")
+    table = CostTable.load(table_path)
+    selections = [{'Pancakes': 4}, {'Omelette': 6, 'Pancakes': 2}, {'Omelette': 2}]
+
+    results = shopping.rollup_lists(selections, table, servings=True)
+    assert len(results) == len(selections)
+    for selection, result in zip(selections, results):
+        shopping.clear()
+        shopping.selected_recipes = {name.lower() for name in selection}
+        for name, servings in selection.items():
+            shopping.adjust_serving_size(name, servings)
+        shopping.prepare_list()
+        expected = shopping.rollup(table)
+        assert result['totals'] == pytest.approx(expected['totals'])
+        assert result['recipes'].keys() == expected['recipes'].keys()
+        for name, totals in expected['recipes'].items():
+            assert result['recipes'][name] == pytest.approx(totals)
+        assert result['missing'] == expected['missing']
+
+
+def test_costs_in_the_batch_output(shopping, table_path, tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, '_CLI_AGGREGATOR', None)
+    monkeypatch.setattr(cli, '_CLI_COSTS', None)
+    infile = tmp_path / 'requests.jsonl'
+    infile.write_text('{"id": 1, "recipes": ["Pancakes"]}\n')
+    outfile = tmp_path / 'lists.jsonl'
+    assert cli.main([str(infile), '-o', str(outfile), '-r', shopping.recipe_path, '--costs', table_path]) == 0
+
+    output = json.loads(outfile.read_text())
+    assert output['id'] == 1
+    assert output['costs']['totals'] == pytest.approx({'price': 1.55, 'calories': 300})
+    assert output['costs']['missing'] == []
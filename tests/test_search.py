@@ -0,0 +1,31 @@
+from conftest import recipe_entry
+from recipes import ShoppingList
+
+
+def test_search_ranking(write_recipes):
+    path = write_recipes(
+        recipe_entry('Chicken Curry', {'chicken breast': (1, 'lbs'), 'curry paste': (2, 'tbsp')}),
+        recipe_entry('Honey Garlic Chicken', {'chicken thigh': (2, 'lbs'), 'honey': (0.25, 'cup/liquid')}),
+        recipe_entry('Chicken', {'chicken': (1, 'single')}),
+        recipe_entry('Beef Stew', {'beef': (2, 'lbs'), 'carrot': (3, 'single')}),
+    )
+    shopping = ShoppingList(path)
+
+    results = shopping.search('chicken', limit=20)
+    assert [(each['name'], each['kind'], each['rank']) for each in results] == [
+        ('Chicken', 'recipe', 0),
+        ('chicken', 'ingredient', 0),
+        ('Chicken Curry', 'recipe', 1),
+        ('chicken thigh', 'ingredient', 1),
+        ('chicken breast', 'ingredient', 1),
+        ('Honey Garlic Chicken', 'recipe', 2),
+    ]
+
+    assert [each['name'] for each in shopping.search('chick', limit=2)] == ['Chicken', 'chicken']
+    assert [each['name'] for each in shopping.search('chick', kinds=['recipe'])] == \
+        ['Chicken', 'Chicken Curry', 'Honey Garlic Chicken']
+
+    # One edit, after the exact and prefix ranks
+    assert shopping.search('bef stew') == [{'name': 'Beef Stew', 'kind': 'recipe', 'rank': 4}]
+    assert shopping.search('bef') == [{'name': 'beef', 'kind': 'ingredient', 'rank': 4},
+                                      {'name': 'Beef Stew', 'kind': 'recipe', 'rank': 4}]
@@ -0,0 +1,111 @@
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from recipes import BatchAggregator, Renderer, ShoppingList, ShoppingSession
+from recipes import cli
+from recipes.service import RecipeService
+
+
+@pytest.fixture
+def service(recipe_path):
+    """A RecipeService listening on a free localhost port, in its own event loop thread"""
+    service = RecipeService(ShoppingList.load_catalog(recipe_path), ttl=60)
+    loop = asyncio.new_event_loop()
+    server = loop.run_until_complete(service.start('127.0.0.1', 0))
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    service.port = server.sockets[0].getsockname()[1]
+    yield service
+
+    async def stop():
+        server.close()
+        await server.wait_closed()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    asyncio.run_coroutine_threadsafe(stop(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def call(service, method, path, payload=None, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', service.port, timeout=10)
+    try:
+        if payload is not None:
+            body = json.dumps(payload)
+        connection.request(method, path, body=body, headers={'Content-Type': 'application/json', 'Connection': 'close'})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def test_search_and_recipes(service):
+    status, found = call(service, 'GET', '/search?q=piza&limit=3&kind=recipe')
+    assert status == 200
+    assert found['results'][0]['name'].lower() == 'pizza'
+
+    status, recipe = call(service, 'GET', '/recipes/pizza')
+    assert status == 200
+    assert recipe == service.catalog.get('pizza').to_dict()
+    assert call(service, 'GET', '/recipes/no%20such%20thing')[0] == 404
+
+    status, korean = call(service, 'GET', '/recipes?category=korean')
+    assert status == 200
+    assert korean['recipes'] == [recipe.name for recipe in service.catalog.by_category('korean')]
+
+
+def test_aggregate_matches_the_cli(service, recipe_path, monkeypatch):
+    selections = [['pizza', 'fried rice'], {'beef stew': 2}]
+    status, aggregated = call(service, 'POST', '/aggregate', {'selections': selections})
+    assert status == 200
+    expected = BatchAggregator(service.catalog).aggregate(selections)
+    assert aggregated['results'] == [Renderer.aggregate_data(result) for result in expected]
+
+    # The batch command line writes the very same shape, one line per selection
+    monkeypatch.setattr(cli, '_CLI_AGGREGATOR', None)
+    cli._cli_init(recipe_path)
+    lines = cli._cli_batch([json.dumps(selection) + '\n' for selection in selections]).splitlines()
+    assert [json.loads(line) for line in lines] == aggregated['results']
+
+    status, stats = call(service, 'GET', '/stats')
+    assert status == 200
+    assert stats['cache']['misses'] >= 1
+
+
+def test_session_lifecycle(service):
+    status, created = call(service, 'POST', '/sessions')
+    assert status == 201
+    path = f"/sessions/{created['session']}"
+
+    status, data = call(service, 'POST', path + '/recipes', {'recipe': 'pizza', 'servings': 8})
+    assert status == 200
+    local = ShoppingSession(service.catalog)
+    local.select('pizza', 8)
+    assert data == local.shopping_data()
+
+    status, data = call(service, 'POST', path + '/items', {'name': 'milk', 'amount': 1, 'unit': 'cup/liquid'})
+    assert status == 200
+    assert 'milk' in {item['name'] for item in data['items']}
+    assert call(service, 'GET', path)[1] == data
+
+    assert call(service, 'DELETE', path + '/recipes/pizza')[0] == 200
+    assert call(service, 'DELETE', path + '/recipes/pizza')[0] == 404
+    assert call(service, 'DELETE', path)[0] == 200
+    assert call(service, 'GET', path)[0] == 404
+
+
+def test_errors(service):
+    assert call(service, 'POST', '/aggregate', body='{not json')[0] == 400
+    status, error = call(service, 'POST', '/aggregate', {})
+    assert status == 400 and 'selections' in error['error']
+    assert call(service, 'POST', '/aggregate', {'selections': [['no such recipe']]})[0] == 400
+    assert call(service, 'GET', '/aggregate')[0] == 405
+    assert call(service, 'PUT', '/search')[0] == 405
+    assert call(service, 'GET', '/nowhere')[0] == 404
@@ -0,0 +1,111 @@
+import concurrent.futures
+import random
+import threading
+import tracemalloc
+
+import pytest
+
+from recipes import ShoppingList, ShoppingSession
+
+
+@pytest.fixture
+def shopping(recipe_path):
+    return ShoppingList(recipe_path)
+
+
+def plan(names, seed):
+    rng = random.Random(seed)
+    return [(name, rng.choice((None, 2, 6, 12))) for name in rng.sample(names, rng.randint(1, 6))]
+
+
+def build(catalog, choices):
+    session = ShoppingSession(catalog)
+    for name, servings in choices:
+        session.select(name, servings)
+    session.add_item('Paper Towels', 1, 'single')
+    return session.shopping_data()
+
+
+def test_sessions_on_a_thread_pool(shopping):
+    catalog = shopping.catalog
+    version = catalog.version
+    names = [each.name for each in catalog]
+    plans = [plan(names, seed) for seed in range(200)]
+    # Recipes whose units don't convert are left out of both runs
+    expected = {}
+    for seed, choices in enumerate(plans):
+        try:
+            expected[seed] = build(catalog, choices)
+        except Exception:
+            pass
+    assert len(expected) > 100
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=16) as pool:
+        futures = {seed: pool.submit(build, catalog, plans[seed]) for seed in expected}
+        assert {seed: future.result() for seed, future in futures.items()} == expected
+
+    # Sessions only ever read the shared catalog
+    assert catalog.version == version
+    assert shopping.session().catalog is catalog
+
+
+def test_one_session_from_many_threads(shopping):
+    names = [each.name for each in shopping.catalog][:16]
+    session = shopping.session()
+    barrier = threading.Barrier(8)
+
+    def work(worker):
+        barrier.wait()
+        for turn in range(20):
+            for name in names[worker::8]:
+                session.select(name, 4)
+                session.add_item('napkins', 1, 'single')
+                session.shopping_data()
+                if turn % 2:
+                    session.unselect(name)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(work, worker) for worker in range(8)]:
+            future.result()
+
+    data = session.shopping_data()
+    assert data['scale'] == {}
+    assert {'name': 'napkins', 'amount': 8 * 20 * 2, 'unit': 'single'} in data['items']
+
+    for name in names:
+        session.select(name, 4)
+    serial = ShoppingSession(shopping.catalog)
+    for name in names:
+        serial.select(name, 4)
+    serial.add_item('napkins', 8 * 20 * 2, 'single')
+    assert session.shopping_data() == serial.shopping_data()
+
+
+def test_idle_sessions_are_small(shopping):
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        sessions = [shopping.session() for _ in range(1000)]
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    grown = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    assert len(sessions) == 1000
+    assert grown / len(sessions) < 1024
+
+
+def test_session_input_is_checked(shopping):
+    session = shopping.session()
+    with pytest.raises(ValueError):
+        session.select('no such recipe')
+    name = next(iter(shopping.catalog)).name
+    for servings in (0, -2, 'four'):
+        with pytest.raises(ValueError):
+            session.select(name, servings)
+    with pytest.raises(ValueError):
+        session.add_item('milk', 1, 'bucket')
+    with pytest.raises(TypeError):
+        session.add_item(5, 1, 'single')
+    assert session.unselect(name) is False
+    assert session.shopping_data() == {'items': [], 'spices': [], 'scale': {}}
@@ -0,0 +1,125 @@
+import json
+import os
+import threading
+
+import pytest
+
+from recipes import ShardedCatalog, ShoppingList
+
+
+@pytest.fixture
+def shards(tmp_path, recipe_path):
+    directory = str(tmp_path / 'shards')
+    ShardedCatalog.split(recipe_path, directory)
+    return directory
+
+
+def test_split_matches_single_file(recipe_path, shards):
+    single = ShoppingList(recipe_path)
+    sharded = ShoppingList(shards)
+    assert sharded.catalog.stats()['loaded'] == 0
+    assert len(sharded.catalog) == len(single.catalog)
+
+    names = ['pizza', 'beef stew', 'fried rice']
+    for shopping in (single, sharded):
+        shopping.selected_recipes = set(names)
+        shopping.adjust_serving_size('pizza', 9)
+        shopping.prepare_list()
+    assert sharded.shopping_data() == single.shopping_data()
+    assert sharded.catalog.stats()['loaded'] < len(sharded.catalog.shards)
+    assert [recipe.name for recipe in sharded.catalog.by_category('korean')] == \
+        [recipe.name for recipe in single.catalog.by_category('korean')]
+    # Ties are in catalog order, which splitting by category changes
+    by_rating = sharded.catalog.by_rating(5)
+    assert [recipe.rating for recipe in by_rating] == [recipe.rating for recipe in single.catalog.by_rating(5)]
+    assert {recipe.name for recipe in by_rating} == {recipe.name for recipe in single.catalog.by_rating(5)}
+
+
+def test_reopen_uses_the_manifest(shards, monkeypatch):
+    ShardedCatalog(shards)
+
+    def scan(*args, **kwargs):
+        raise AssertionError("Unchanged shard scanned again")
+    monkeypatch.setattr(ShardedCatalog, '_scan', staticmethod(scan))
+    assert len(ShardedCatalog(shards)) == 41
+    assert len(ShardedCatalog(os.path.join(shards, ShardedCatalog.MANIFEST))) == 41
+
+
+def test_eviction_keeps_to_the_budget(shards):
+    catalog = ShardedCatalog(shards)
+    sizes = [ShardedCatalog._footprint(catalog.shard(index)) for index in range(len(catalog.shards))]
+    budget = max(sizes) * 2
+    catalog = ShardedCatalog(shards, memory_budget=budget)
+    for index in range(len(catalog.shards)):
+        catalog.shard(index)
+        assert catalog.bytes <= budget
+    stats = catalog.stats()
+    assert stats['loads'] == len(catalog.shards) and stats['evictions'] > 0
+    # Least recently used goes first
+    assert list(catalog.loaded)[-1] == len(catalog.shards) - 1
+
+
+def test_whole_is_counted_and_evicted(shards):
+    catalog = ShardedCatalog(shards)
+    merged_size = ShardedCatalog._footprint(catalog.whole())
+    catalog = ShardedCatalog(shards, memory_budget=merged_size)
+
+    merged = catalog.whole()
+    assert len(merged) == len(catalog)
+    assert catalog.bytes == merged_size
+    # Merging reads the shards without keeping them
+    assert list(catalog.loaded) == [ShardedCatalog.WHOLE]
+    assert catalog.whole() is merged
+
+    catalog.get('Pizza')
+    assert ShardedCatalog.WHOLE not in catalog.loaded and catalog.bytes <= merged_size
+    assert catalog.whole() is not merged
+    assert catalog.stats()['merges'] == 2
+
+
+def test_changed_shard_is_an_error(shards):
+    catalog = ShardedCatalog(shards)
+    path = os.path.join(shards, catalog.shards[0]['path'])
+    with open(path) as infile:
+        data = json.load(infile)
+    data['recipes'][0]['rating'] = 1.0
+    with open(path, 'w') as outfile:
+        json.dump(data, outfile)
+
+    with pytest.raises(Exception, match='changed since the catalog was opened'):
+        catalog.shard(0)
+    with pytest.raises(Exception, match='changed since the catalog was opened'):
+        catalog.whole()
+
+
+def test_cold_load_does_not_block_loaded_shards(shards, monkeypatch):
+    catalog = ShardedCatalog(shards)
+    warm = catalog.shards[1]['recipes'][0]
+    catalog.get(warm)
+
+    started = threading.Event()
+    release = threading.Event()
+    load_catalog = ShoppingList.load_catalog
+    loads = []
+
+    def slow_load(path, **kwargs):
+        loads.append(path)
+        started.set()
+        assert release.wait(5)
+        return load_catalog(path, **kwargs)
+    monkeypatch.setattr(ShoppingList, 'load_catalog', staticmethod(slow_load))
+
+    threads = [threading.Thread(target=catalog.shard, args=(0,)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(5)
+    try:
+        # Answered while shard 0 is still loading
+        assert catalog.get(warm).name == warm
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+
+    assert len(loads) == 1
+    assert 0 in catalog.loaded
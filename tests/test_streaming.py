@@ -0,0 +1,82 @@
+import io
+import json
+import os
+
+import pytest
+
+import recipes
+from conftest import REPO, recipe_entry
+from recipes import RecipeCatalog, ShoppingList, iter_recipes
+
+
+def stream(text, chunk_size):
+    return list(recipes._stream_recipe_array(io.StringIO(text), chunk_size))
+
+
+@pytest.fixture(scope='module')
+def entries():
+    with open(os.path.join(REPO, 'recipes.json')) as infile:
+        return json.load(infile)['recipes']
+
+
+def layouts(entries):
+    recipes_json = ' , '.join(json.dumps(entry) for entry in entries)
+    return [
+        json.dumps({'recipes': entries}),
+        json.dumps({'recipes': entries}, indent=4),
+        # A "recipes" key nested in another value or inside a string, and
+        # the real one after more whitespace than any one read
+        '{' + ' ' * 5000 + '"meta": {"recipes": [1, 2]}, "n": 12345, "s": "\\"recipes\\": [", ' + ' ' * 300
+        + '"recipes"' + '\n' * 200 + ':' + ' ' * 100 + '[' + recipes_json + ' ] , "tail": 1}\n',
+        json.dumps({'before': list(range(1000)), 'recipes': [], 'after': 1.5e300}),
+    ]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 64, 1000, 1 << 16])
+def test_stream_matches_json_load(entries, chunk_size):
+    for text in layouts(entries):
+        assert stream(text, chunk_size) == json.loads(text)['recipes']
+
+
+@pytest.mark.parametrize('text', [
+    '[]',
+    '{}',
+    '{"x": 1}',
+    '{"recipes": 5}',
+    '{"recipes": [{"a": 1}',
+    '{"recipes": [{"a": 1}, {"b"',
+    '{"recipes": [{"a":1} {"b":2}]}',
+    '{,,"recipes": [,,{"a":1},,]}',
+    '{"recipes": [{"a": 1},]}',
+    '{"recipes": [{"a": 1}], }',
+    '{"recipes": [1]} garbage',
+    '{"recipes": [1]}}',
+    '{"recipes" [1]}',
+    '{recipes: [1]}',
+])
+def test_stream_rejects_what_json_load_rejects(text):
+    # Not JSON, or not a recipe file
+    with pytest.raises((ValueError, TypeError, KeyError)):
+        json.loads(text)['recipes'][0]
+    for chunk_size in (1, 3, 1 << 16):
+        with pytest.raises(Exception):
+            stream(text, chunk_size)
+
+
+def test_stream_and_jsonl_load_the_same_catalog(tmp_path, recipe_path, entries):
+    jsonl = tmp_path / 'recipes.jsonl'
+    jsonl.write_text('\n'.join(json.dumps(entry) for entry in entries) + '\n\n')
+
+    expected = [recipe.to_dict() for recipe in ShoppingList(recipe_path).catalog]
+    for path, stream_ in ((recipe_path, True), (str(jsonl), False), (str(jsonl), True)):
+        assert [recipe.to_dict() for recipe in ShoppingList(path, stream=stream_).catalog] == expected
+
+
+def test_digest_is_of_the_bytes_parsed(tmp_path, write_recipes):
+    path = write_recipes(recipe_entry('Toast', {'bread': (2, 'single')}))
+    with open(path, 'a') as outfile:
+        outfile.write('\n\n')
+    for stream_ in (False, True):
+        digest = RecipeCatalog.source_digest()
+        assert [entry['recipe'] for entry in iter_recipes(path, stream=stream_, chunk_size=8, digest=digest)] == ['Toast']
+        assert digest.digest() == RecipeCatalog.source_key(path)
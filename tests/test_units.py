@@ -0,0 +1,48 @@
+import pytest
+
+from conftest import recipe_entry
+from recipes import UNITS, ShoppingList, UnitConverter
+
+
+def test_closure_of_a_small_table():
+    converter = UnitConverter({'a': {'b': 2}, 'b': {'c': 3}, 'x': {'y': 5}})
+    assert converter.factor('a', 'c') == 6
+    assert converter.factor('c', 'a') == pytest.approx(1 / 6)
+    assert converter.factor('y', 'x') == pytest.approx(0.2)
+    assert converter.factor('b', 'b') == 1
+    assert converter.canonical_unit('c') == 'a'
+    assert converter.canonical_unit('y') == 'x'
+
+    # Incompatible and unknown units are None, never an exception
+    assert converter.factor('a', 'y') is None
+    assert not converter.compatible('c', 'x')
+    assert converter.convert(1, 'a', 'y') is None
+    assert converter.convert(1, 'a', 'nope') is None
+    assert converter.unit_id('nope') is None
+
+
+def test_table_edges_win_over_inverses():
+    converter = UnitConverter({'tsp': {'tbsp': 0.3333}, 'tbsp': {'tsp': 3}})
+    assert converter.factor('tsp', 'tbsp') == 0.3333
+    assert converter.factor('tbsp', 'tsp') == 3
+
+
+def test_chained_conversions():
+    # Neither pair has a table entry of its own
+    assert UNITS.factor('pint', 'tsp') == pytest.approx(96)
+    assert UNITS.factor('oz/liquid', 'lbs') == pytest.approx(2 * 0.0315)
+    assert UNITS.factor('single', 'tsp') is None
+
+    assert ShoppingList.convert_unit(2, 'lbs', 'oz/solid') == 32
+    assert ShoppingList.convert_unit(1, 'clove', 'tsp') is False
+
+
+def test_gather_through_a_chained_conversion(write_recipes):
+    path = write_recipes(recipe_entry('Glaze', {'butter': (1, 'lbs')}),
+                         recipe_entry('Sauce', {'butter': (4, 'oz/liquid')}))
+    shopping = ShoppingList(path)
+    shopping.selected_recipes = {'glaze', 'sauce'}
+    shopping.prepare_list()
+
+    butter = shopping.convertable_list['butter']
+    assert UNITS.convert(butter['amount'], butter['unit'], 'lbs') == pytest.approx(1 + 4 * 2 * 0.0315, rel=1e-2)